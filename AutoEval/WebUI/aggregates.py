@@ -0,0 +1,228 @@
+"""
+评测汇总的物化视图
+维护评测概览（模型数、各工具包完成率、各数据集评测进度与平均分、按平均分排序的排行榜），
+/update 时只按本次提交涉及的模型做"减去旧贡献、加上新贡献"，不重新扫描全部数据。
+状态可保存为快照文件，重启后与 JSON 文件版本一致时直接加载，无需重建。
+"""
+
+import bisect
+import os
+import pickle
+import threading
+import time
+
+from dataset_registry import iter_models, toolkit_datasets
+
+SNAPSHOT_VERSION = 1
+
+
+def _scores(sections):
+    """evaluationStatus 中单个模型的分数：{section: {dataset: score}}，只保留大于 0 的分数"""
+    result = {}
+    for section, scores in (sections or {}).items():
+        if not isinstance(scores, dict):
+            continue
+        valid = {dataset: float(score) for dataset, score in scores.items()
+                 if isinstance(score, (int, float)) and not isinstance(score, bool) and score > 0}
+        if valid:
+            result[section] = valid
+    return result
+
+
+class Aggregates:
+    """线程安全的增量汇总；stamp 为汇总对应的存储文件版本，由调用方维护"""
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.stamp = None
+        self._lock = threading.RLock()
+        self._saved_at = 0.0
+        self._dirty = False
+        self._reset()
+
+    def _reset(self):
+        self._model_status = {}     # model_id -> {toolkit: 0/1}
+        self._model_scores = {}     # model_name -> {section: {dataset: score}}
+        self._models = [0, 0]       # [模型总数, 全部工具包已评的模型数]
+        self._toolkits = {}         # toolkit -> [已评模型数, 模型数]
+        self._datasets = {}         # (section, dataset) -> [已评模型数, 分数和]
+        self._boards = {}           # section -> 升序列表 [(-平均分, -数据集数, model_name)]
+        self._board_entries = {}    # (section, model_name) -> 排行榜条目
+        self._cache = {}
+
+    # ---------- 更新 ----------
+
+    def rebuild(self, config):
+        """从完整配置重建"""
+        with self._lock:
+            self._reset()
+            for model_id, model in iter_models(config):
+                self._set_status(model_id, model['Eval_Statu'])
+            for model_name, sections in (config.get('evaluationStatus') or {}).items():
+                self._set_scores(model_name, sections)
+            self._dirty = True
+
+    def apply_update(self, config, delta):
+        """
+        /update 合并后增量更新：只重算 delta 涉及的模型
+
+        Args:
+            config: 合并后的完整配置
+            delta: 本次 /update 提交的数据
+        """
+        with self._lock:
+            models = config.get('modelConfigs', config)
+            # 提交非字典值（如 null）会把模型替换掉，同样按当前配置重算
+            for model_id in delta.get('modelConfigs', delta):
+                model = models.get(model_id)
+                valid = isinstance(model, dict) and isinstance(model.get('Eval_Statu'), dict)
+                self._set_status(model_id, model['Eval_Statu'] if valid else None)
+            evaluation_status = config.get('evaluationStatus') or {}
+            for model_name in (delta.get('evaluationStatus') or {}):
+                self._set_scores(model_name, evaluation_status.get(model_name))
+            self._dirty = True
+
+    def _set_status(self, model_id, eval_statu):
+        self._cache.clear()
+        old = self._model_status.pop(model_id, None)
+        for status, sign in ((old, -1), (self._toolkit_status(eval_statu), 1)):
+            if status is None:
+                continue
+            self._models[0] += sign
+            # 没有任何工具包的模型不算全部已评
+            self._models[1] += sign * (bool(status) and all(status.values()))
+            for toolkit, evaluated in status.items():
+                counts = self._toolkits.setdefault(toolkit, [0, 0])
+                counts[0] += sign * evaluated
+                counts[1] += sign
+                if not counts[1]:
+                    del self._toolkits[toolkit]
+            if sign > 0:
+                self._model_status[model_id] = status
+
+    @staticmethod
+    def _toolkit_status(eval_statu):
+        if eval_statu is None:
+            return None
+        return {toolkit: int(toolkit_datasets(toolkit, status)[1]) for toolkit, status in eval_statu.items()}
+
+    def _set_scores(self, model_name, sections):
+        self._cache.clear()
+        old = self._model_scores.pop(model_name, {})
+        new = _scores(sections)
+        for scores_by_section, sign in ((old, -1), (new, 1)):
+            for section, scores in scores_by_section.items():
+                for dataset, score in scores.items():
+                    stats = self._datasets.setdefault((section, dataset), [0, 0.0])
+                    stats[0] += sign
+                    stats[1] += sign * score
+                    if not stats[0]:
+                        del self._datasets[(section, dataset)]
+        for section in old:
+            entry = self._board_entries.pop((section, model_name))
+            board = self._boards[section]
+            del board[bisect.bisect_left(board, entry)]
+        for section, scores in new.items():
+            entry = (-sum(scores.values()) / len(scores), -len(scores), model_name)
+            self._board_entries[(section, model_name)] = entry
+            bisect.insort(self._boards.setdefault(section, []), entry)
+        if new:
+            self._model_scores[model_name] = new
+
+    # ---------- 查询 ----------
+
+    def summary(self, top=10):
+        """
+        汇总结果；数据未变化时直接返回缓存
+
+        Args:
+            top: 每个排行榜返回的模型数
+        """
+        with self._lock:
+            cached = self._cache.get(top)
+            if cached is not None:
+                return cached
+            datasets = {}
+            for (section, dataset), (count, total) in sorted(self._datasets.items()):
+                datasets.setdefault(section, {})[dataset] = {
+                    "evaluated": count,
+                    "mean_score": round(total / count, 2),
+                }
+            result = {
+                "models": {"total": self._models[0], "fully_evaluated": self._models[1]},
+                "toolkits": {
+                    toolkit: {
+                        "evaluated": evaluated,
+                        "total": total,
+                        "completion": round(evaluated / total, 4),
+                    }
+                    for toolkit, (evaluated, total) in sorted(self._toolkits.items())
+                },
+                "datasets": datasets,
+                "leaderboard": {
+                    section: [
+                        {"model": model_name, "mean_score": round(-neg_mean, 2), "evaluated": -neg_count}
+                        for neg_mean, neg_count, model_name in board[:top]
+                    ]
+                    for section, board in sorted(self._boards.items()) if board
+                },
+            }
+            self._cache[top] = result
+            return result
+
+    # ---------- 快照 ----------
+
+    def save(self, min_interval=0.0):
+        """
+        原子写入快照；距上次写入不足 min_interval 秒时跳过（保持 dirty，下次再写）
+
+        Returns:
+            bool: 是否写入
+        """
+        if not self.snapshot_path:
+            return False
+        with self._lock:
+            if not self._dirty or time.monotonic() - self._saved_at < min_interval:
+                return False
+            state = {
+                "version": SNAPSHOT_VERSION,
+                "stamp": self.stamp,
+                "model_status": self._model_status,
+                "model_scores": self._model_scores,
+                "models": self._models,
+                "toolkits": self._toolkits,
+                "datasets": self._datasets,
+                "boards": self._boards,
+            }
+            tmp_path = f"{self.snapshot_path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+            self._saved_at = time.monotonic()
+            self._dirty = False
+            return True
+
+    def load(self):
+        """加载快照，成功时 stamp 为快照对应的文件版本，返回是否成功"""
+        if not self.snapshot_path:
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return False
+        if not isinstance(state, dict) or state.get('version') != SNAPSHOT_VERSION:
+            return False
+        with self._lock:
+            self._reset()
+            self._model_status = state['model_status']
+            self._model_scores = state['model_scores']
+            self._models = state['models']
+            self._toolkits = state['toolkits']
+            self._datasets = state['datasets']
+            self._boards = state['boards']
+            self._board_entries = {(section, entry[2]): entry
+                                   for section, board in self._boards.items() for entry in board}
+            self.stamp = state['stamp']
+            self._dirty = False
+        return True
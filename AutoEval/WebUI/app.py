@@ -1,10 +1,17 @@
 import os
 import json
+import atexit
 from flask import Flask, request, jsonify, send_from_directory, render_template_string
 from flask_cors import CORS
 
+from aggregates import Aggregates
+from dataset_registry import COVERAGE_KINDS, EVALUATED, CoverageIndex
+from json_store import JsonStore
+
 # 配置信息
 JSON_FILE_PATH = 'mock.json'  # JSON 文件路径
+AGGREGATES_SNAPSHOT_PATH = 'aggregates.snapshot'  # 汇总快照文件
+SNAPSHOT_INTERVAL = 5  # 汇总快照的最短写入间隔（秒）
 PORT = 8009  # 服务端口
 HOST = '0.0.0.0'  # 监听所有网络接口
 
@@ -33,6 +40,16 @@ if not os.path.exists(JSON_FILE_PATH):
         json.dump(default_data, f, indent=2, ensure_ascii=False)
     print(f"Created default JSON file: {JSON_FILE_PATH}")
 
+# WebUI 与评测调度器 (scheduler.py) 共用的存储
+store = JsonStore(JSON_FILE_PATH)
+
+# 由 JSON 文件派生、增量维护的视图：模型×数据集覆盖索引、评测汇总
+coverage = CoverageIndex()
+aggregates = Aggregates(AGGREGATES_SNAPSHOT_PATH)
+aggregates.load()  # 快照与文件版本一致时重启无需重建
+views = (coverage, aggregates)
+atexit.register(aggregates.save)
+
 # 初始化 Flask 应用
 app = Flask(__name__)
 CORS(app)  # 启用跨域支持
@@ -41,8 +58,7 @@ CORS(app)  # 启用跨域支持
 def read_json_file():
     """读取并解析 JSON 文件"""
     try:
-        with open(JSON_FILE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f), None
+        return store.read(), None
     except FileNotFoundError:
         return None, "JSON file not found"
     except json.JSONDecodeError:
@@ -52,12 +68,39 @@ def read_json_file():
 def write_json_file(data):
     """将数据写入 JSON 文件"""
     try:
-        with open(JSON_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        store.write(data)
         return True, None
     except Exception as e:
         return False, str(e)
 
+# 辅助函数：JSON 文件版本（写入为原子替换，inode 每次都会变化）
+def file_stamp():
+    """返回 JSON 文件的 (inode, mtime, size)，文件不存在时返回 None"""
+    try:
+        st = os.stat(JSON_FILE_PATH)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+# 辅助函数：同步派生视图
+def refresh_views():
+    """文件被其他进程（调度器、手工编辑）修改过时全量重建过期的视图，返回错误信息"""
+    stamp = file_stamp()
+    if all(view.stamp == stamp for view in views):
+        return None
+    with store.lock():
+        stamp = file_stamp()
+        stale = [view for view in views if view.stamp != stamp]
+        if stale:
+            data, error = read_json_file()
+            if error:
+                return error
+            for view in stale:
+                view.rebuild(data)
+                view.stamp = stamp
+            aggregates.save()
+    return None
+
 # 路由：根路径 - 返回index.html
 @app.route('/')
 def index():
@@ -98,11 +141,6 @@ def update_config():
     # 获取更新数据
     update_data = request.get_json()
 
-    # 读取当前配置
-    current_config, error = read_json_file()
-    if error:
-        return jsonify({"error": error}), 404
-
     # 应用更新（深度合并）
     def deep_merge(target, source):
         """深度合并两个字典"""
@@ -114,13 +152,30 @@ def update_config():
                 target[key] = value
         return target
 
-    # 执行更新
-    updated_config = deep_merge(current_config, update_data)
+    # 读-改-写期间持有存储锁，避免与调度器的状态回写互相覆盖
+    with store.lock():
+        # 与文件一致的视图才做增量更新，其余留到下次查询时重建
+        stamp = file_stamp()
+        fresh_views = [view for view in views if view.stamp == stamp]
 
-    # 保存更新
-    success, error = write_json_file(updated_config)
-    if not success:
-        return jsonify({"error": f"Failed to save file: {error}"}), 500
+        # 读取当前配置
+        current_config, error = read_json_file()
+        if error:
+            return jsonify({"error": error}), 404
+
+        # 执行更新
+        updated_config = deep_merge(current_config, update_data)
+
+        # 保存更新
+        success, error = write_json_file(updated_config)
+        if not success:
+            return jsonify({"error": f"Failed to save file: {error}"}), 500
+
+        stamp = file_stamp()
+        for view in fresh_views:
+            view.apply_update(updated_config, update_data)
+            view.stamp = stamp
+        aggregates.save(min_interval=SNAPSHOT_INTERVAL)
 
     return jsonify({"status": "success", "message": "Configuration updated"})
 
@@ -146,6 +201,77 @@ def get_evaluated():
         "message": "评测状态数据加载成功"
     })
 
+# 路由：模型×数据集覆盖查询
+@app.route('/coverage', methods=['GET'])
+def get_coverage():
+    """
+    查询模型×数据集覆盖情况
+
+    参数:
+        dataset: 指定时返回缺少该数据集的模型，否则返回完整覆盖矩阵
+        toolkit: 工具包，不指定时 dataset 查询按任一工具包覆盖计算，矩阵返回所有工具包
+        status: evaluated（已评，默认）或 listed（在 Datasets 中）
+    """
+    error = refresh_views()
+    if error:
+        return jsonify({"error": error}), 404
+
+    dataset = request.args.get('dataset')
+    toolkit = request.args.get('toolkit')
+    kind = request.args.get('status', EVALUATED)
+    if kind not in COVERAGE_KINDS:
+        return jsonify({"error": f"status must be one of {', '.join(COVERAGE_KINDS)}"}), 400
+    toolkits = coverage.toolkits()
+    if toolkit and toolkit not in toolkits:
+        return jsonify({"error": f"Unknown toolkit: {toolkit}"}), 404
+
+    if dataset:
+        missing = coverage.missing(dataset, toolkit, kind)
+        return jsonify({
+            "success": True,
+            "data": {
+                "dataset": dataset,
+                "toolkit": toolkit,
+                "status": kind,
+                "known": coverage.datasets.get(dataset) is not None,
+                "missing": missing,
+                "missing_count": len(missing),
+                "total_models": coverage.model_count
+            }
+        })
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "status": kind,
+            "datasets": list(coverage.datasets.names),
+            "toolkits": {name: coverage.matrix(name, kind) for name in ([toolkit] if toolkit else toolkits)}
+        }
+    })
+
+# 路由：评测汇总
+@app.route('/summary', methods=['GET'])
+def get_summary():
+    """
+    返回增量维护的评测汇总：模型数、各工具包完成率、各数据集进度与平均分、排行榜
+
+    参数:
+        top: 每个排行榜返回的模型数，默认 10
+    """
+    error = refresh_views()
+    if error:
+        return jsonify({"error": error}), 404
+
+    try:
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+
+    return jsonify({
+        "success": True,
+        "data": aggregates.summary(max(0, top))
+    })
+
 # 路由：健康检查
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -212,6 +338,8 @@ def run_server():
     print(f"  - GET  /config          - 获取配置")
     print(f"  - POST /update          - 更新配置")
     print(f"  - GET  /evaluated       - 获取评测状态")
+    print(f"  - GET  /coverage        - 模型×数据集覆盖查询")
+    print(f"  - GET  /summary         - 评测汇总")
     print(f"  - GET  /health          - 健康检查")
     print(f"  - GET  /datasets        - 获取数据集信息")
     print(f"  - GET  /system-config   - 获取系统配置")
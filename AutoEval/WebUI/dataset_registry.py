@@ -0,0 +1,267 @@
+"""
+数据集注册表与模型×数据集覆盖位图
+Eval_Statu 中的 Datasets 是 "a, b, c" 形式的字符串，这里统一解析一次：
+数据集名映射为递增 id，每个工具包维护两张位图（Python 整数即位集合）
+
+- listed: 数据集出现在该工具包的 Datasets 中
+- evaluated: 在 listed 基础上该工具包 Statu 为 1（已评）
+
+位图同时按行（模型 -> 数据集位集合）和按列（数据集 -> 模型槽位集合）保存：
+更新一个模型只需修改它的行，并按行的变化位翻转对应列；
+"哪些模型缺少数据集 X" 只需一次列取反，与模型数无关地在毫秒内完成。
+MIRB、mmiu 等整数状态的工具包视为只包含与工具包同名的一个数据集。
+"""
+
+import threading
+
+# 覆盖类型
+LISTED = 'listed'
+EVALUATED = 'evaluated'
+COVERAGE_KINDS = (LISTED, EVALUATED)
+
+
+def iter_models(config):
+    """
+    遍历配置中的模型，返回 (model_id, model)
+
+    兼容两种布局：mock.json 的 {"modelConfigs": {id: model}}，
+    以及前端直接提交的 {id: model}
+    """
+    models = config.get('modelConfigs', config)
+    for model_id, model in models.items():
+        if isinstance(model, dict) and isinstance(model.get('Eval_Statu'), dict):
+            yield model_id, model
+
+
+def split_datasets(value):
+    """把 "a, b, c" 形式的数据集字符串拆成去重后的列表"""
+    return list(dict.fromkeys(name for name in map(str.strip, (value or '').split(',')) if name))
+
+
+def toolkit_datasets(toolkit, status):
+    """工具包状态 -> (数据集名列表, 是否已评)"""
+    if isinstance(status, dict):
+        return split_datasets(status.get('Datasets')), status.get('Statu') == 1
+    return [toolkit], status == 1
+
+
+def iter_bits(value):
+    """位集合中置位的下标（升序）"""
+    bits = bin(value)[:1:-1]
+    index = bits.find('1')
+    while index != -1:
+        yield index
+        index = bits.find('1', index + 1)
+
+
+def _transpose(rows, num_slots, num_datasets):
+    """行位图 {槽位: 数据集位集合} 转为列位图 {数据集 id: 槽位位集合}"""
+    if not rows or not num_datasets:
+        return {}
+    # 每行展开为定长 01 串（第 j 个字符对应数据集 j），按字符位置 zip 即为转置
+    width = f'0{num_datasets}b'
+    strings = [format(rows.get(slot, 0), width)[::-1] for slot in range(num_slots)]
+    cols = {}
+    for dataset_id, column in enumerate(zip(*strings)):
+        value = int(''.join(reversed(column)), 2)
+        if value:
+            cols[dataset_id] = value
+    return cols
+
+
+class DatasetRegistry:
+    """数据集名 <-> id 的驻留表，id 按首次出现顺序分配且不会回收"""
+
+    def __init__(self):
+        self._ids = {}
+        self.names = []
+
+    def intern(self, name):
+        dataset_id = self._ids.get(name)
+        if dataset_id is None:
+            dataset_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return dataset_id
+
+    def get(self, name):
+        return self._ids.get(name)
+
+    def mask(self, names):
+        ids = self._ids
+        value = 0
+        for name in names:
+            dataset_id = ids.get(name)
+            value |= 1 << (self.intern(name) if dataset_id is None else dataset_id)
+        return value
+
+    def __len__(self):
+        return len(self.names)
+
+
+class CoverageIndex:
+    """按工具包维护的模型×数据集覆盖位图，线程安全；stamp 为索引对应的存储文件版本，由调用方维护"""
+
+    def __init__(self):
+        self.stamp = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.datasets = DatasetRegistry()
+        self._slots = {}            # model_id -> 槽位
+        self._model_ids = []        # 槽位 -> model_id，空槽为 None
+        self._free = []
+        self._all = 0               # 所有有效槽位的位集合
+        self._rows = {}             # (toolkit, kind) -> {槽位: 数据集位集合}
+        self._cols = {}             # (toolkit, kind) -> {数据集 id: 槽位位集合}
+
+    def rebuild(self, config):
+        """从完整配置重建：先填行，再整体转置出列，避免逐位翻转列"""
+        with self._lock:
+            self._reset()
+            self.intern_common(config)
+            for model_id, model in iter_models(config):
+                slot = self._slot(model_id)
+                for key, value in self._row_values(model['Eval_Statu']).items():
+                    rows = self._rows.setdefault(key, {})
+                    if value:
+                        rows[slot] = value
+            for key, rows in self._rows.items():
+                self._cols[key] = _transpose(rows, len(self._model_ids), len(self.datasets))
+
+    def intern_common(self, config):
+        """登记 commonDatasets 与 datasets.predefined 中的数据集"""
+        with self._lock:
+            for names in (config.get('commonDatasets') or {}).values():
+                for name in names or []:
+                    self.datasets.intern(name)
+            for name in (config.get('datasets') or {}).get('predefined') or []:
+                self.datasets.intern(name)
+
+    def apply_update(self, config, delta):
+        """
+        /update 合并后增量更新：只重算 delta 涉及的模型
+
+        Args:
+            config: 合并后的完整配置
+            delta: 本次 /update 提交的数据
+        """
+        with self._lock:
+            if 'commonDatasets' in delta or 'datasets' in delta:
+                self.intern_common(config)
+            models = config.get('modelConfigs', config)
+            # 提交非字典值（如 null）会把模型替换掉，同样按当前配置重算
+            for model_id in delta.get('modelConfigs', delta):
+                model = models.get(model_id)
+                if isinstance(model, dict) and isinstance(model.get('Eval_Statu'), dict):
+                    self.set_model(model_id, model['Eval_Statu'])
+                else:
+                    self.remove_model(model_id)
+
+    def _slot(self, model_id):
+        slot = self._slots.get(model_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._model_ids[slot] = model_id
+            else:
+                slot = len(self._model_ids)
+                self._model_ids.append(model_id)
+            self._slots[model_id] = slot
+            self._all |= 1 << slot
+        return slot
+
+    def _set_row(self, key, slot, value):
+        rows = self._rows.setdefault(key, {})
+        old = rows.get(slot, 0)
+        if old == value:
+            return
+        if value:
+            rows[slot] = value
+        else:
+            rows.pop(slot, None)
+        cols = self._cols.setdefault(key, {})
+        bit = 1 << slot
+        for dataset_id in iter_bits(old ^ value):
+            cols[dataset_id] = cols.get(dataset_id, 0) ^ bit
+
+    def _row_values(self, eval_statu):
+        values = {}
+        for toolkit, status in eval_statu.items():
+            names, evaluated = toolkit_datasets(toolkit, status)
+            listed = self.datasets.mask(names)
+            values[(toolkit, LISTED)] = listed
+            values[(toolkit, EVALUATED)] = listed if evaluated else 0
+        return values
+
+    def set_model(self, model_id, eval_statu):
+        """按模型的 Eval_Statu 设置其所有工具包的行"""
+        with self._lock:
+            slot = self._slot(model_id)
+            values = self._row_values(eval_statu)
+            # 配置中已移除的工具包清零
+            for key in set(self._rows) | set(values):
+                self._set_row(key, slot, values.get(key, 0))
+
+    def remove_model(self, model_id):
+        with self._lock:
+            slot = self._slots.pop(model_id, None)
+            if slot is None:
+                return
+            for key in list(self._rows):
+                self._set_row(key, slot, 0)
+            self._model_ids[slot] = None
+            self._free.append(slot)
+            self._all &= ~(1 << slot)
+
+    def toolkits(self):
+        with self._lock:
+            return sorted({toolkit for toolkit, _ in self._rows})
+
+    def _covered(self, dataset_id, toolkit, kind):
+        keys = [key for key in self._cols if key[1] == kind and (toolkit is None or key[0] == toolkit)]
+        covered = 0
+        for key in keys:
+            covered |= self._cols[key].get(dataset_id, 0)
+        return covered
+
+    def missing(self, dataset, toolkit=None, kind=EVALUATED):
+        """
+        缺少某个数据集的模型
+
+        Args:
+            dataset: 数据集名
+            toolkit: 工具包，None 时任一工具包覆盖即算覆盖
+            kind: listed / evaluated
+        """
+        with self._lock:
+            dataset_id = self.datasets.get(dataset)
+            covered = 0 if dataset_id is None else self._covered(dataset_id, toolkit, kind)
+            missing = self._all & ~covered
+            return [self._model_ids[slot] for slot in iter_bits(missing)]
+
+    def covered(self, dataset, toolkit=None, kind=EVALUATED):
+        """覆盖某个数据集的模型"""
+        with self._lock:
+            dataset_id = self.datasets.get(dataset)
+            if dataset_id is None:
+                return []
+            covered = self._covered(dataset_id, toolkit, kind) & self._all
+            return [self._model_ids[slot] for slot in iter_bits(covered)]
+
+    def matrix(self, toolkit, kind=EVALUATED):
+        """
+        工具包的完整覆盖矩阵
+
+        Returns:
+            dict: {model_id: 十六进制位图}，位 i 置位表示覆盖 self.datasets.names[i]，
+            未覆盖任何数据集的模型为 "0"
+        """
+        with self._lock:
+            rows = self._rows.get((toolkit, kind), {})
+            return {model_id: format(rows.get(slot, 0), 'x')
+                    for slot, model_id in enumerate(self._model_ids) if model_id is not None}
+
+    @property
+    def model_count(self):
+        return len(self._slots)
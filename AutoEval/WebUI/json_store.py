@@ -0,0 +1,80 @@
+"""
+JSON 文件存储
+WebUI 与评测调度器共用同一个 JSON 文件，通过文件锁串行化"读-改-写"，
+写入先落到临时文件再原子替换，读取方不会看到写了一半的文件
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只保证进程内互斥
+    fcntl = None
+
+
+class JsonStore:
+    """带锁的 JSON 文件读写"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._lock_fd = None
+
+    @contextmanager
+    def lock(self):
+        """独占锁：进程内用 RLock，进程间用 flock，可重入"""
+        with self._thread_lock:
+            if self._depth == 0 and fcntl is not None:
+                self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._lock_fd is not None:
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+
+    def read(self):
+        """读取并解析 JSON 文件；写入是原子替换，读取无需加锁"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, data):
+        """原子写入 JSON 文件"""
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with self.lock():
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def update(self, func, default=None):
+        """
+        在锁内读取文件，调用 func(data) 原地修改后写回，返回 func 的返回值
+
+        Args:
+            func: 修改函数
+            default: 文件不存在时使用的初始数据，None 时抛出 FileNotFoundError
+        """
+        with self.lock():
+            try:
+                data = self.read()
+            except FileNotFoundError:
+                if default is None:
+                    raise
+                data = default
+            result = func(data)
+            self.write(data)
+            return result
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+AutoEval 评测调度器
+从 WebUI 的 JSON 配置 (Eval_Statu) 推导待评测的 (模型, 工具包, 数据集) 任务，
+按优先级分发给本地 worker 池执行；某个工具包的全部数据集评测完成后，
+通过与 WebUI 相同的存储把对应的 Statu 置为 1（已评）
+
+任务状态保存在独立的 eval_jobs.json 中（WebUI 的配置文件只记录模型与评测状态）。
+每个运行中的任务持有一个带过期时间的租约，调度器定期续租；调度器崩溃或被杀后
+租约过期，下次启动（或其他调度器实例）会把任务收回重新排队，不会重复执行
+或永久卡在"运行中"。
+
+示例:
+    python scheduler.py                # 常驻运行
+    python scheduler.py --once         # 执行完当前可运行的任务后退出
+    python scheduler.py --dry-run      # 只列出待评测任务
+    python scheduler.py --status       # 查看任务状态
+"""
+
+import argparse
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import threading
+import time
+import uuid
+
+from dataset_registry import iter_models, split_datasets
+from json_store import JsonStore
+
+# 配置信息
+JSON_FILE_PATH = 'mock.json'        # WebUI 配置文件，与 app.py 相同
+JOBS_FILE_PATH = 'eval_jobs.json'   # 任务与租约状态
+LOG_DIR = 'eval_logs'               # 每个任务的输出日志目录
+WORK_DIR = 'eval_outputs'           # 评测输出目录，传给评测命令的 {work_dir}
+MAX_WORKERS = 4                     # 同时运行的任务数上限
+POLL_INTERVAL = 10                  # 重新读取配置、认领任务的间隔（秒）
+LEASE_TIMEOUT = 300                 # 租约有效期（秒），续租间隔为其 1/3
+JOB_TIMEOUT = 6 * 3600              # 单个任务的运行时间上限（秒）
+SHUTDOWN_GRACE = 30                 # 退出时 SIGTERM 后等待子进程结束的时间（秒），超时 SIGKILL
+MAX_ATTEMPTS = 3                    # 最多尝试次数，超过后标记为 failed
+RETRY_BACKOFF = 60                  # 失败后重试的等待时间（秒），每次翻倍
+
+# 各工具包的评测命令，占位符: {model_id} {model_name} {model_path} {dataset} {toolkit} {work_dir}
+# Datasets 为整数状态的工具包（如 MIRB、mmiu）每个模型只有一个任务，{dataset} 为空
+TOOLKIT_COMMANDS = {
+    "VLMEvalKit": "python VLMEvalKit/run.py --model {model_name} --model-path {model_path} "
+                  "--data {dataset} --work-dir {work_dir}",
+    "VLMEvalKit_COT": "python VLMEvalKit/run.py --model {model_name} --model-path {model_path} "
+                      "--data {dataset} --work-dir {work_dir} --cot",
+    "MIRB": "python MIRB/eval.py --model-path {model_path} --work-dir {work_dir}",
+    "mmiu": "python mmiu/eval.py --model-path {model_path} --work-dir {work_dir}",
+}
+
+# 各工具包同时运行的任务数上限（未列出的只受 MAX_WORKERS 限制）
+TOOLKIT_LIMITS = {
+    "VLMEvalKit": 2,
+    "VLMEvalKit_COT": 2,
+}
+
+# 工具包优先级，数值越大越先执行；模型可在 data.priority 中额外指定
+TOOLKIT_PRIORITY = {
+    "VLMEvalKit": 10,
+    "VLMEvalKit_COT": 5,
+}
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def job_id(model_id, toolkit, dataset):
+    return f"{model_id}/{toolkit}/{dataset}"
+
+
+def derive_jobs(config, commands=TOOLKIT_COMMANDS):
+    """
+    从 Eval_Statu 推导待评测任务
+
+    Statu 为 0 的工具包，其 Datasets 中的每个数据集是一个任务；
+    值为整数 0 的工具包（MIRB、mmiu）整体是一个任务。没有配置评测命令的工具包跳过。
+
+    Returns:
+        dict: {job_id: 任务描述}
+    """
+    jobs = {}
+    for model_id, model in iter_models(config):
+        data = model.get('data', {})
+        try:
+            model_priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            model_priority = 0
+        for toolkit, status in model['Eval_Statu'].items():
+            if toolkit not in commands:
+                continue
+            if isinstance(status, dict):
+                if status.get('Statu') == 1:
+                    continue
+                datasets = split_datasets(status.get('Datasets'))
+            else:
+                if status == 1:
+                    continue
+                datasets = ['']
+            for dataset in datasets:
+                jobs[job_id(model_id, toolkit, dataset)] = {
+                    "model_id": model_id,
+                    "model_name": data.get('model_name', ''),
+                    "model_path": data.get('model_path', ''),
+                    "toolkit": toolkit,
+                    "dataset": dataset,
+                    "priority": model_priority + TOOLKIT_PRIORITY.get(toolkit, 0),
+                }
+    return jobs
+
+
+def _sort_key(job):
+    # 优先级高的先执行，同优先级时重试次数少的、先入队的先执行
+    return (-job['priority'], job['attempts'], job['created'], job['id'])
+
+
+def merge_jobs(state, derived, now):
+    """
+    把推导出的任务合并进任务状态
+
+    新任务以 pending 入队；模型路径变化时已完成/失败的任务重置；
+    不再需要的任务（模型被删、数据集被移除、工具包已标记为已评）中，
+    pending/done/failed 直接删除，running 的等租约结束后再清理。
+    """
+    jobs = state.setdefault('jobs', {})
+    for key, spec in derived.items():
+        job = jobs.get(key)
+        if job is not None and job['model_path'] == spec['model_path']:
+            job.update(model_name=spec['model_name'], priority=spec['priority'])
+            continue
+        if job is not None and job['state'] == RUNNING:
+            continue
+        jobs[key] = dict(spec, id=key, state=PENDING, attempts=0, created=now, not_before=0,
+                         lease=None, started=None, finished=None, error=None)
+    for key in [key for key, job in jobs.items() if key not in derived and job['state'] != RUNNING]:
+        del jobs[key]
+
+
+def completed_groups(state):
+    """全部数据集已完成的 (model_id, toolkit) -> 数据集集合"""
+    groups = {}
+    for job in state.get('jobs', {}).values():
+        groups.setdefault((job['model_id'], job['toolkit']), []).append(job)
+    return {key: {job['dataset'] for job in jobs}
+            for key, jobs in groups.items() if all(job['state'] == DONE for job in jobs)}
+
+
+def mark_evaluated(config, model_id, toolkit, datasets):
+    """
+    把模型的工具包状态置为已评；配置中的数据集与已完成的不一致
+    （评测期间被修改过）时不修改，返回是否修改
+    """
+    for current_id, model in iter_models(config):
+        if current_id != model_id:
+            continue
+        status = model['Eval_Statu'].get(toolkit)
+        if isinstance(status, dict):
+            if status.get('Statu') == 1 or set(split_datasets(status.get('Datasets'))) != datasets:
+                return False
+            status['Statu'] = 1
+        elif status == 1 or datasets != {''}:
+            return False
+        else:
+            model['Eval_Statu'][toolkit] = 1
+        return True
+    return False
+
+
+class EvalScheduler:
+    """
+    评测任务调度器
+
+    主循环定期读取 WebUI 配置同步任务、续租、按优先级认领空闲槽位数量的任务，
+    每个任务在独立线程中以子进程运行。所有任务状态变更都在 eval_jobs.json
+    的锁内完成，多个调度器实例可以共享同一个任务文件。
+    """
+
+    def __init__(self, config_path=JSON_FILE_PATH, jobs_path=JOBS_FILE_PATH, workers=MAX_WORKERS,
+                 commands=TOOLKIT_COMMANDS, toolkit_limits=TOOLKIT_LIMITS, lease_timeout=LEASE_TIMEOUT,
+                 job_timeout=JOB_TIMEOUT, max_attempts=MAX_ATTEMPTS, retry_backoff=RETRY_BACKOFF,
+                 log_dir=LOG_DIR, work_dir=WORK_DIR):
+        self.config_store = JsonStore(config_path)
+        self.job_store = JsonStore(jobs_path)
+        self.workers = max(1, workers)
+        self.commands = commands
+        self.toolkit_limits = toolkit_limits
+        self.lease_timeout = lease_timeout
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.log_dir = log_dir
+        self.work_dir = work_dir
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running = {}          # job_id -> (租约 token, 子进程)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    # ---------- 任务状态 ----------
+
+    def _update_jobs(self, func):
+        return self.job_store.update(func, default={"jobs": {}})
+
+    def _reclaim_expired(self, jobs, now):
+        """租约过期的任务（持有者崩溃）按失败处理：重新排队或标记 failed"""
+        for job in jobs.values():
+            if job['state'] == RUNNING and job['lease'] and job['lease']['expires'] < now:
+                self._fail(job, f"租约过期 (持有者 {job['lease']['owner']})", now)
+
+    def _fail(self, job, error, now):
+        job['lease'] = None
+        job['error'] = error
+        job['finished'] = now
+        if job['attempts'] >= self.max_attempts:
+            job['state'] = FAILED
+        else:
+            job['state'] = PENDING
+            job['not_before'] = now + self.retry_backoff * 2 ** (job['attempts'] - 1)
+
+    def sync(self):
+        """读取 WebUI 配置并合并任务，回写已全部完成的工具包状态，返回各状态任务数"""
+        config = self.config_store.read()
+        derived = derive_jobs(config, self.commands)
+
+        def apply(state):
+            now = time.time()
+            merge_jobs(state, derived, now)
+            self._reclaim_expired(state['jobs'], now)
+            return completed_groups(state)
+
+        groups = self._update_jobs(apply)
+        # 两个文件分别加锁，从不同时持有；回写中途崩溃时下次 sync 会重试
+        if groups:
+            def mark(config):
+                return [key for key, datasets in groups.items() if mark_evaluated(config, *key, datasets)]
+            for model_id, toolkit in self.config_store.update(mark):
+                print(f"[scheduler] {model_id}/{toolkit} 评测完成，已更新状态")
+        return self.counts()
+
+    def counts(self):
+        counts = {}
+        try:
+            jobs = self.job_store.read().get('jobs', {})
+        except FileNotFoundError:
+            jobs = {}
+        for job in jobs.values():
+            counts[job['state']] = counts.get(job['state'], 0) + 1
+        return counts
+
+    def claim(self, slots):
+        """按优先级认领最多 slots 个可运行任务，遵守工具包并发上限"""
+        def apply(state):
+            now = time.time()
+            jobs = state['jobs']
+            self._reclaim_expired(jobs, now)
+            per_toolkit = {}
+            for job in jobs.values():
+                if job['state'] == RUNNING:
+                    per_toolkit[job['toolkit']] = per_toolkit.get(job['toolkit'], 0) + 1
+            claimed = []
+            ready = [job for job in jobs.values() if job['state'] == PENDING and job['not_before'] <= now]
+            for job in sorted(ready, key=_sort_key):
+                if len(claimed) >= slots:
+                    break
+                limit = self.toolkit_limits.get(job['toolkit'])
+                if limit is not None and per_toolkit.get(job['toolkit'], 0) >= limit:
+                    continue
+                per_toolkit[job['toolkit']] = per_toolkit.get(job['toolkit'], 0) + 1
+                job.update(state=RUNNING, attempts=job['attempts'] + 1, started=now, error=None,
+                           lease={"owner": self.owner, "token": uuid.uuid4().hex,
+                                  "expires": now + self.lease_timeout})
+                claimed.append(dict(job))
+            return claimed
+
+        return self._update_jobs(apply)
+
+    def heartbeat(self):
+        """为本实例运行中的任务续租"""
+        with self._lock:
+            tokens = {key: token for key, (token, _) in self._running.items()}
+        if not tokens:
+            return
+
+        def apply(state):
+            expires = time.time() + self.lease_timeout
+            for key, token in tokens.items():
+                job = state['jobs'].get(key)
+                if job and job['lease'] and job['lease']['token'] == token:
+                    job['lease']['expires'] = expires
+
+        self._update_jobs(apply)
+
+    def finish(self, job, error=None, release=False):
+        """
+        记录任务结果；租约已被收回（token 不匹配）时丢弃结果
+
+        Args:
+            job: claim 返回的任务
+            error: None 表示成功
+            release: 调度器退出时归还任务，不计入尝试次数
+        """
+        token = job['lease']['token']
+
+        def apply(state):
+            current = state['jobs'].get(job['id'])
+            if current is None or not current['lease'] or current['lease']['token'] != token:
+                return False
+            now = time.time()
+            if release:
+                current.update(state=PENDING, attempts=current['attempts'] - 1, lease=None, not_before=0)
+            elif error is None:
+                current.update(state=DONE, lease=None, finished=now, error=None)
+            else:
+                self._fail(current, error, now)
+            return True
+
+        return self._update_jobs(apply)
+
+    # ---------- 执行 ----------
+
+    def _command(self, job):
+        # 占位符的值来自可被 /update 修改的配置，逐个转义后再拼接，防止空格拆分参数或注入额外参数
+        values = dict(model_id=job['model_id'], model_name=job['model_name'], model_path=job['model_path'],
+                      dataset=job['dataset'], toolkit=job['toolkit'], work_dir=self.work_dir)
+        return self.commands[job['toolkit']].format(
+            **{key: shlex.quote(str(value)) for key, value in values.items()})
+
+    def _execute(self, job):
+        key = job['id']
+        log_path = os.path.join(self.log_dir, key.replace('/', '_').strip('_') + '.log')
+        error = None
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(log_path, 'ab') as log:
+                log.write(f"\n==== {time.strftime('%Y-%m-%d %H:%M:%S')} attempt {job['attempts']}: "
+                          f"{self._command(job)}\n".encode('utf-8'))
+                log.flush()
+                # 与 shutdown 互斥：调度器已开始退出时不再启动子进程，否则它收不到 SIGTERM
+                with self._lock:
+                    if self._stop.is_set():
+                        raise RuntimeError("调度器正在退出")
+                    proc = subprocess.Popen(shlex.split(self._command(job)), stdout=log,
+                                            stderr=subprocess.STDOUT, start_new_session=True)
+                    self._running[key] = (job['lease']['token'], proc)
+                try:
+                    code = proc.wait(timeout=self.job_timeout)
+                    if code != 0:
+                        error = f"退出码 {code}，日志: {log_path}"
+                except subprocess.TimeoutExpired:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                    proc.wait()
+                    error = f"运行超过 {self.job_timeout}s，已终止，日志: {log_path}"
+        except Exception as e:
+            error = f"启动失败: {e}"
+        # 退出时被终止的任务归还队列，不算失败
+        released = self._stop.is_set() and error is not None
+        self.finish(job, error, release=released)
+        if not released:
+            print(f"[scheduler] {key} {'完成' if error is None else '失败: ' + error}")
+        with self._lock:
+            self._running.pop(key, None)
+        self._wake.set()
+
+    def _start(self, job):
+        with self._lock:
+            self._running[job['id']] = (job['lease']['token'], None)
+        threading.Thread(target=self._execute, args=(job,), name=f"eval-{job['id']}", daemon=True).start()
+
+    def run(self, once=False, poll_interval=POLL_INTERVAL):
+        """
+        主循环
+
+        Args:
+            once: 没有可运行任务且本实例的任务都结束后退出
+            poll_interval: 同步配置与认领任务的间隔（秒）
+        """
+        heartbeat_interval = self.lease_timeout / 3
+        last_heartbeat = time.monotonic()
+        print(f"[scheduler] 启动 {self.owner}，worker 数 {self.workers}")
+        try:
+            while not self._stop.is_set():
+                counts = self.sync()
+                with self._lock:
+                    free = self.workers - len(self._running)
+                claimed = self.claim(free) if free > 0 else []
+                for job in claimed:
+                    print(f"[scheduler] 开始 {job['id']} (第 {job['attempts']} 次)")
+                    self._start(job)
+                with self._lock:
+                    busy = len(self._running)
+                if once and not busy and not claimed:
+                    print(f"[scheduler] 没有可运行的任务，退出: {counts}")
+                    break
+                # 任务结束会提前唤醒，空出的槽位立即补上
+                deadline = time.monotonic() + poll_interval
+                while not self._stop.is_set():
+                    if time.monotonic() - last_heartbeat >= heartbeat_interval:
+                        self.heartbeat()
+                        last_heartbeat = time.monotonic()
+                    remaining = min(deadline, last_heartbeat + heartbeat_interval) - time.monotonic()
+                    if self._wake.wait(max(0.0, remaining)) or time.monotonic() >= deadline:
+                        self._wake.clear()
+                        break
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def shutdown(self, grace=SHUTDOWN_GRACE):
+        """
+        终止本实例运行中的子进程并归还租约
+
+        先向各进程组发送 SIGTERM，grace 秒后仍未退出的进程组 SIGKILL；等待期间继续续租，
+        避免其他实例在子进程退出前收回租约并重复运行同一任务。
+        """
+        self._stop.set()
+        self._signal_running(signal.SIGTERM)
+        heartbeat_interval = self.lease_timeout / 3
+        last_heartbeat = time.monotonic()
+        deadline = last_heartbeat + grace
+        killed = False
+        while True:
+            with self._lock:
+                if not self._running:
+                    break
+            now = time.monotonic()
+            if not killed and now >= deadline:
+                self._signal_running(signal.SIGKILL)
+                killed = True
+            if now - last_heartbeat >= heartbeat_interval:
+                self.heartbeat()
+                last_heartbeat = now
+            time.sleep(0.1)
+
+    def _signal_running(self, sig):
+        with self._lock:
+            procs = [proc for _, proc in self._running.values() if proc is not None]
+        for proc in procs:
+            try:
+                os.killpg(proc.pid, sig)
+            except ProcessLookupError:
+                pass
+
+
+def reset_failed(jobs_path=JOBS_FILE_PATH):
+    """把 failed 的任务重新排队，返回数量"""
+    def apply(state):
+        count = 0
+        for job in state.get('jobs', {}).values():
+            if job['state'] == FAILED:
+                job.update(state=PENDING, attempts=0, not_before=0, error=None)
+                count += 1
+        return count
+    return JsonStore(jobs_path).update(apply, default={"jobs": {}})
+
+
+def print_jobs(jobs):
+    for job in sorted(jobs, key=_sort_key):
+        error = f"  {job['error']}" if job.get('error') else ''
+        print(f"  {job['state']:<8} p={job['priority']:<4} 尝试 {job['attempts']}  {job['id']}{error}")
+
+
+def get_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="根据 Eval_Statu 自动调度评测任务")
+    parser.add_argument("--config", default=JSON_FILE_PATH, help="WebUI 配置文件")
+    parser.add_argument("--jobs", default=JOBS_FILE_PATH, help="任务状态文件")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同时运行的任务数")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="同步配置的间隔(秒)")
+    parser.add_argument("--once", action="store_true", help="执行完当前可运行的任务后退出")
+    parser.add_argument("--dry-run", action="store_true", help="只列出待评测任务，不执行")
+    parser.add_argument("--status", action="store_true", help="查看任务状态")
+    parser.add_argument("--retry-failed", action="store_true", help="把失败的任务重新排队")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_args()
+    if args.dry_run:
+        state = {"jobs": {}}
+        merge_jobs(state, derive_jobs(JsonStore(args.config).read()), time.time())
+        print(f"待评测任务 {len(state['jobs'])} 个:")
+        print_jobs(state['jobs'].values())
+    elif args.status:
+        jobs = JsonStore(args.jobs).read().get('jobs', {}) if os.path.exists(args.jobs) else {}
+        print_jobs(jobs.values())
+    elif args.retry_failed:
+        print(f"已重新排队 {reset_failed(args.jobs)} 个失败任务")
+    else:
+        scheduler = EvalScheduler(args.config, args.jobs, workers=args.workers)
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+        try:
+            scheduler.run(once=args.once, poll_interval=args.interval)
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# WebUI 的模块以脚本方式组织（同目录导入），测试时把 WebUI 目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _deep_merge(target, source):
+    """与 app.py /update 相同的合并规则（app.py 依赖 flask，不直接导入）"""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _deep_merge(target.setdefault(key, {}), value)
+        else:
+            target[key] = value
+    return target
+
+
+@pytest.fixture
+def deep_merge():
+    return _deep_merge
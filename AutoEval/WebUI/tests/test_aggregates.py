@@ -0,0 +1,76 @@
+import copy
+import random
+
+from aggregates import Aggregates
+
+TOOLKITS = ['VLMEvalKit', 'VLMEvalKit_COT', 'MIRB', 'mmiu']
+DATASETS = ['coco', 'vqa', 'gqa', 'refcoco']
+MODEL_NAMES = ['A', 'B', 'C', 'D', 'E']
+
+
+def random_delta(rng, deleted):
+    action = rng.random()
+    if action < 0.4:
+        # 分数取 0.5 的倍数，增量加减与重建求和没有浮点误差
+        name = rng.choice(MODEL_NAMES)
+        section = rng.choice(['standard', 'COT'])
+        scores = {dataset: rng.randint(0, 200) / 2 for dataset in rng.sample(DATASETS, 2)}
+        return {'evaluationStatus': {name: {section: scores}}}
+    model_id = rng.choice([str(i) for i in range(20) if str(i) not in deleted])
+    if action < 0.45:
+        deleted.add(model_id)
+        return {'modelConfigs': {model_id: None}}
+    statu = {}
+    for toolkit in rng.sample(TOOLKITS, rng.randint(0, len(TOOLKITS))):
+        statu[toolkit] = rng.randint(0, 1) if toolkit in ('MIRB', 'mmiu') else {
+            'Statu': rng.randint(0, 1), 'Datasets': ', '.join(rng.sample(DATASETS, 2))}
+    return {'modelConfigs': {model_id: {'Eval_Statu': statu}}}
+
+
+def test_incremental_updates_match_rebuild(deep_merge):
+    rng = random.Random(0)
+    config = {'modelConfigs': {}, 'evaluationStatus': {}}
+    aggregates = Aggregates()
+    aggregates.rebuild(config)
+    deleted = set()
+    for _ in range(300):
+        delta = random_delta(rng, deleted)
+        deep_merge(config, copy.deepcopy(delta))
+        aggregates.apply_update(config, delta)
+
+        rebuilt = Aggregates()
+        rebuilt.rebuild(config)
+        assert aggregates.summary(top=5) == rebuilt.summary(top=5)
+
+
+def test_model_without_toolkits_is_not_fully_evaluated():
+    aggregates = Aggregates()
+    aggregates.rebuild({'modelConfigs': {'1': {'Eval_Statu': {}}, '2': {'Eval_Statu': {'MIRB': 1}}}})
+
+    assert aggregates.summary()['models'] == {'total': 2, 'fully_evaluated': 1}
+
+
+def test_snapshot_round_trip(tmp_path):
+    config = {
+        'modelConfigs': {'1': {'Eval_Statu': {'VLMEvalKit': {'Statu': 1, 'Datasets': 'coco'}, 'MIRB': 0}}},
+        'evaluationStatus': {'A': {'standard': {'coco': 80.0, 'vqa': 0}}, 'B': {'standard': {'coco': 60.0}}},
+    }
+    path = str(tmp_path / 'aggregates.snapshot')
+    aggregates = Aggregates(path)
+    aggregates.rebuild(config)
+    aggregates.stamp = (123, 456)
+
+    assert aggregates.save()
+    assert not aggregates.save()        # 没有变化时不重复写入
+    loaded = Aggregates(path)
+    assert loaded.load()
+    assert loaded.stamp == (123, 456)
+    assert loaded.summary() == aggregates.summary()
+
+    # 加载后继续增量更新，排行榜条目与重建一致
+    delta = {'evaluationStatus': {'A': {'standard': {'coco': 50.0}}}}
+    config['evaluationStatus']['A']['standard']['coco'] = 50.0
+    loaded.apply_update(config, delta)
+    rebuilt = Aggregates()
+    rebuilt.rebuild(config)
+    assert loaded.summary() == rebuilt.summary()
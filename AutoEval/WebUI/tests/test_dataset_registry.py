@@ -0,0 +1,90 @@
+import copy
+import random
+
+from dataset_registry import LISTED, CoverageIndex
+
+TOOLKITS = ['VLMEvalKit', 'VLMEvalKit_COT', 'MIRB', 'mmiu']
+DATASETS = ['coco', 'vqa', 'gqa', 'refcoco', 'mmiu', 'textvqa']
+
+
+def random_status(rng, toolkit):
+    if toolkit in ('MIRB', 'mmiu'):
+        return rng.randint(0, 1)
+    return {'Statu': rng.randint(0, 1), 'Datasets': ', '.join(rng.sample(DATASETS, rng.randint(0, 3)))}
+
+
+def random_delta(rng, deleted):
+    model_id = rng.choice([str(i) for i in range(30) if str(i) not in deleted])
+    action = rng.random()
+    if action < 0.05:
+        # 提交 null 替换掉模型；之后不能再向它合并字典，不再选中
+        deleted.add(model_id)
+        return {'modelConfigs': {model_id: None}}
+    if action < 0.25:
+        return {'commonDatasets': {'group': rng.sample(DATASETS + ['extra'], 2)}}
+    toolkits = rng.sample(TOOLKITS, rng.randint(1, len(TOOLKITS)))
+    return {'modelConfigs': {model_id: {'Eval_Statu': {t: random_status(rng, t) for t in toolkits}}}}
+
+
+def snapshot(index):
+    """与数据集 id 分配顺序无关的比较形式"""
+    names = index.datasets.names
+    result = {}
+    for toolkit in index.toolkits():
+        for kind in ('listed', 'evaluated'):
+            for model_id, bits in index.matrix(toolkit, kind).items():
+                value = int(bits, 16)
+                result[(toolkit, kind, model_id)] = {names[i] for i in range(len(names)) if value >> i & 1}
+    return {key: value for key, value in result.items() if value}
+
+
+def test_incremental_updates_match_rebuild(deep_merge):
+    rng = random.Random(0)
+    config = {'modelConfigs': {}}
+    index = CoverageIndex()
+    index.rebuild(config)
+    deleted = set()
+    for _ in range(300):
+        delta = random_delta(rng, deleted)
+        deep_merge(config, copy.deepcopy(delta))
+        index.apply_update(config, delta)
+
+        rebuilt = CoverageIndex()
+        rebuilt.rebuild(config)
+        assert snapshot(index) == snapshot(rebuilt)
+        assert index.model_count == rebuilt.model_count
+        for dataset in DATASETS:
+            assert sorted(index.missing(dataset)) == sorted(rebuilt.missing(dataset))
+
+
+def make_index():
+    config = {'modelConfigs': {
+        '1': {'Eval_Statu': {'VLMEvalKit': {'Statu': 1, 'Datasets': 'coco, vqa'}, 'MIRB': 1, 'mmiu': 0}},
+        '2': {'Eval_Statu': {'VLMEvalKit': {'Statu': 0, 'Datasets': 'coco'}, 'MIRB': 0, 'mmiu': 1}},
+    }}
+    index = CoverageIndex()
+    index.rebuild(config)
+    return index
+
+
+def test_missing_handles_unknown_dataset_and_toolkit():
+    index = make_index()
+
+    assert index.missing('coco') == ['2']
+    assert index.missing('coco', kind=LISTED) == []
+    # 未登记的数据集：所有模型都缺少
+    assert index.missing('never_seen') == ['1', '2']
+    assert index.covered('never_seen') == []
+    # 未知工具包：没有模型覆盖
+    assert index.missing('coco', toolkit='unknown') == ['1', '2']
+    assert index.matrix('unknown') == {'1': '0', '2': '0'}
+
+
+def test_integer_status_toolkits_cover_their_own_name():
+    index = make_index()
+
+    assert index.missing('MIRB', toolkit='MIRB') == ['2']
+    assert index.missing('mmiu', toolkit='mmiu') == ['1']
+    assert index.missing('mmiu', toolkit='mmiu', kind=LISTED) == []
+    mirb_id = index.datasets.get('MIRB')
+    assert index.matrix('MIRB') == {'1': format(1 << mirb_id, 'x'), '2': '0'}
@@ -0,0 +1,121 @@
+import json
+import shlex
+import sys
+
+import pytest
+
+from json_store import JsonStore
+from scheduler import DONE, FAILED, PENDING, RUNNING, EvalScheduler, derive_jobs, mark_evaluated, merge_jobs
+
+COMMANDS = {
+    'VLMEvalKit': 'echo {model_name} {dataset}',
+    'MIRB': 'echo {model_name}',
+}
+
+
+def make_model(path='/models/a', datasets='coco, vqa', statu=0, mirb=0):
+    return {
+        'data': {'model_name': 'A', 'model_path': path},
+        'Eval_Statu': {'VLMEvalKit': {'Statu': statu, 'Datasets': datasets}, 'MIRB': mirb},
+    }
+
+
+@pytest.fixture
+def make_scheduler(tmp_path):
+    def factory(config, commands=COMMANDS, **kwargs):
+        config_path = tmp_path / 'config.json'
+        config_path.write_text(json.dumps(config))
+        return EvalScheduler(config_path=str(config_path), jobs_path=str(tmp_path / 'jobs.json'),
+                             commands=commands, toolkit_limits={}, log_dir=str(tmp_path / 'logs'),
+                             work_dir=str(tmp_path / 'out'), **kwargs)
+    return factory
+
+
+def test_derive_and_merge_jobs():
+    config = {'modelConfigs': {'1': make_model()}}
+    state = {}
+    merge_jobs(state, derive_jobs(config, COMMANDS), now=1.0)
+
+    assert sorted(state['jobs']) == ['1/MIRB/', '1/VLMEvalKit/coco', '1/VLMEvalKit/vqa']
+    assert all(job['state'] == PENDING and job['attempts'] == 0 for job in state['jobs'].values())
+
+    # 模型路径变化：已完成的任务重置
+    state['jobs']['1/VLMEvalKit/coco'].update(state=DONE, attempts=1)
+    config['modelConfigs']['1'] = make_model(path='/models/b')
+    merge_jobs(state, derive_jobs(config, COMMANDS), now=2.0)
+    coco = state['jobs']['1/VLMEvalKit/coco']
+    assert (coco['state'], coco['attempts'], coco['model_path']) == (PENDING, 0, '/models/b')
+
+    # 数据集被移除：pending 的删除，running 的保留到租约结束
+    state['jobs']['1/VLMEvalKit/vqa']['state'] = RUNNING
+    config['modelConfigs']['1'] = make_model(path='/models/b', datasets='', mirb=1)
+    merge_jobs(state, derive_jobs(config, COMMANDS), now=3.0)
+    assert sorted(state['jobs']) == ['1/VLMEvalKit/vqa']
+
+
+def test_expired_lease_is_reclaimed_with_backoff(make_scheduler):
+    sched = make_scheduler({'modelConfigs': {'1': make_model(datasets='coco')}}, retry_backoff=60)
+    sched.sync()
+    job = sched.claim(1)[0]
+
+    def expire(state):
+        state['jobs'][job['id']]['lease']['expires'] = 0
+    sched._update_jobs(expire)
+    sched.sync()
+    reclaimed = sched.job_store.read()['jobs'][job['id']]
+
+    assert reclaimed['state'] == PENDING and reclaimed['lease'] is None
+    assert '租约过期' in reclaimed['error']
+    assert reclaimed['not_before'] >= reclaimed['finished'] + 60
+
+    # 达到最大尝试次数后标记为 failed
+    sched.max_attempts = 1
+    sched._update_jobs(lambda state: state['jobs'][job['id']].update(state=RUNNING, lease={
+        'owner': 'x', 'token': 't', 'expires': 0}))
+    sched.sync()
+    assert sched.job_store.read()['jobs'][job['id']]['state'] == FAILED
+
+
+def test_finish_drops_result_for_stale_token(make_scheduler):
+    sched = make_scheduler({'modelConfigs': {'1': make_model(datasets='coco')}})
+    sched.sync()
+    job = sched.claim(1)[0]
+    stale = dict(job, lease=dict(job['lease'], token='stale'))
+
+    assert not sched.finish(stale)
+    assert sched.job_store.read()['jobs'][job['id']]['state'] == RUNNING
+    assert sched.finish(job)
+    assert sched.job_store.read()['jobs'][job['id']]['state'] == DONE
+
+
+def test_mark_evaluated_refuses_changed_datasets():
+    config = {'modelConfigs': {'1': make_model(datasets='coco, vqa')}}
+
+    assert not mark_evaluated(config, '1', 'VLMEvalKit', {'coco'})
+    assert config['modelConfigs']['1']['Eval_Statu']['VLMEvalKit']['Statu'] == 0
+    assert mark_evaluated(config, '1', 'VLMEvalKit', {'coco', 'vqa'})
+    assert config['modelConfigs']['1']['Eval_Statu']['VLMEvalKit']['Statu'] == 1
+    assert mark_evaluated(config, '1', 'MIRB', {''})
+    assert config['modelConfigs']['1']['Eval_Statu']['MIRB'] == 1
+
+
+def test_run_once_executes_jobs_and_marks_config(make_scheduler):
+    command = f'{sys.executable} -c "import sys; sys.exit(0)" {{model_name}}'
+    sched = make_scheduler({'modelConfigs': {'1': make_model(datasets='coco, vqa')}},
+                           commands={'VLMEvalKit': command, 'MIRB': command}, workers=2)
+    sched.run(once=True, poll_interval=0.05)
+    # 工具包回写为已评后任务不再被推导，下一次同步即清理
+    counts = sched.sync()
+
+    config = JsonStore(sched.config_store.path).read()
+    assert counts == {}
+    assert config['modelConfigs']['1']['Eval_Statu']['VLMEvalKit']['Statu'] == 1
+    assert config['modelConfigs']['1']['Eval_Statu']['MIRB'] == 1
+
+
+def test_command_values_are_quoted(make_scheduler):
+    sched = make_scheduler({'modelConfigs': {}})
+    job = {'toolkit': 'VLMEvalKit', 'model_id': '1', 'model_name': 'x --work-dir /etc', 'model_path': '/p',
+           'dataset': 'a b'}
+
+    assert shlex.split(sched._command(job)) == ['echo', 'x --work-dir /etc', 'a b']
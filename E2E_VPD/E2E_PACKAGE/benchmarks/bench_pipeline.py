@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+uvp_dataset 与原 StreamBevEffectiveV2 的吞吐/内存基准测试
+
+在合成的 BEV 类数据（点云 + BEV 栅格 + 标签，tar 分片）上，对每个
+(实现, worker 数, batch 大小) 组合在独立子进程中运行，统计:
+    - samples/s
+    - 每次 next() 的延迟分位数 (p50/p90/p99, ms)
+    - 峰值 RSS（主进程与 worker 子进程中的最大值, MB）
+    - 启动耗时（import + 构造 + 取到第一个输出, s）
+并把每个组合的前若干样本与参考输出逐字段比较（默认参考为单进程 uvp_dataset，
+指定 --original 时为原实现）。输出不一致或单进程吞吐低于原实现超过
+--max-regression 时以非零状态退出，可直接用作切换生产前的回归检查。
+
+原实现通过 importlib 隔离加载（见 README），避免与 uvp_dataset 的命名空间冲突。
+
+用法:
+    python benchmarks/bench_pipeline.py --num-samples 500 --workers 0 2 4 --batch-sizes 1 32
+    python benchmarks/bench_pipeline.py --original /abs/path/to/SBEffv2.py \\
+        --original-class StreamBevEffectiveV2 --json-out bench.json
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+import numpy as np
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+
+
+def make_synthetic_bev(root, num_samples, num_points, bev_shape, per_shard, seed=0):
+    """生成 BEV 类合成数据：每个样本含点云、BEV 栅格、3D 框标签，按 tar 分片存储"""
+    os.makedirs(root, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_samples, per_shard):
+        with tarfile.open(os.path.join(root, f'shard-{start:08d}.tar'), 'w') as tar:
+            for idx in range(start, min(start + per_shard, num_samples)):
+                raw = {
+                    'points': rng.standard_normal((num_points, 4)).astype(np.float32),
+                    'bev': rng.random(bev_shape, dtype=np.float32),
+                    'gt_labels': rng.integers(0, 10, size=(32,)),
+                    'gt_boxes': rng.standard_normal((32, 7)).astype(np.float32),
+                    'token': f'frame_{idx:08d}',
+                }
+                payload = pickle.dumps(raw, protocol=pickle.HIGHEST_PROTOCOL)
+                info = tarfile.TarInfo(f'{idx:08d}.pkl')
+                info.size = len(payload)
+                tar.addfile(info, io.BytesIO(payload))
+
+
+def make_config(data_root, num_workers, batch_size):
+    return {
+        'storage': {'type': 'tar', 'root': data_root},
+        'composer': {
+            'feature_keys': ['points', 'bev'],
+            'label_keys': ['gt_labels', 'gt_boxes'],
+            'meta_keys': ['token'],
+            'mean': 0.5,
+            'std': 0.25,
+        },
+        'batch_size': batch_size,
+        'num_workers': num_workers,
+        'stats': False,
+    }
+
+
+def load_isolated(name, py_file_path):
+    """隔离导入原实现，导入期间临时把其所在目录加入 sys.path"""
+    spec = importlib.util.spec_from_file_location(name, py_file_path)
+    module = importlib.util.module_from_spec(spec)
+    original_path = sys.path[:]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(py_file_path)))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path[:] = original_path
+    return module
+
+
+def unbatch(item, batched):
+    """把 batch 输出拆回逐样本的字典"""
+    if not batched:
+        return [item]
+    size = len(next(iter(item.values())))
+    return [{key: value[i] for key, value in item.items()} for i in range(size)]
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def run_case(case):
+    """在当前（子）进程中运行一个组合，返回统计结果"""
+    t0 = time.perf_counter()
+    if case['impl'] == 'original':
+        module = load_isolated('original_sbeff', case['original'])
+        dataset_cls = getattr(module, case['original_class'])
+    else:
+        from uvp_dataset import UVPDataset as dataset_cls
+    import_s = time.perf_counter() - t0
+
+    config = make_config(case['data_root'], case['num_workers'], case['batch_size'])
+    dataset = dataset_cls(config)
+    batched = case['impl'] == 'uvp' and case['batch_size'] > 1
+    stream = iter(dataset.iter_batches() if batched else dataset)
+
+    latencies = []
+    dumped = []
+    samples = 0
+    first_count = 0
+    first_item_s = None
+    start = time.perf_counter()
+    last = start
+    for item in stream:
+        now = time.perf_counter()
+        latencies.append(now - last)
+        if first_item_s is None:
+            first_item_s = now - t0
+            start = now   # 吞吐从第一个输出之后开始计，与启动耗时分开
+        for sample in unbatch(item, batched):
+            if len(dumped) < case['check_samples']:
+                dumped.append({key: np.array(value) if isinstance(value, np.ndarray) else value
+                               for key, value in sample.items()})
+            samples += 1
+        if first_count == 0:
+            first_count = samples
+        last = time.perf_counter()
+        if samples >= case['max_samples']:
+            break
+    elapsed = max(last - start, 1e-9)
+    if hasattr(stream, 'close'):
+        stream.close()
+
+    with open(case['dump_path'], 'wb') as f:
+        pickle.dump(dumped, f)
+    lat_ms = np.array(latencies[1:] or latencies) * 1e3
+    rss_self, rss_children = peak_rss_mb()
+    return {
+        'impl': case['impl'],
+        'num_workers': case['num_workers'],
+        'batch_size': case['batch_size'],
+        'samples': samples,
+        'samples_per_sec': (samples - first_count) / elapsed,
+        'p50_ms': float(np.percentile(lat_ms, 50)),
+        'p90_ms': float(np.percentile(lat_ms, 90)),
+        'p99_ms': float(np.percentile(lat_ms, 99)),
+        'peak_rss_mb': rss_self,
+        'peak_worker_rss_mb': rss_children,
+        'import_s': import_s,
+        'startup_s': first_item_s,
+        'dump_path': case['dump_path'],
+    }
+
+
+def compare_outputs(orig, new, path='root', rtol=1e-5, atol=1e-8):
+    """逐层比较两份输出，返回第一处差异的描述，一致时返回 None"""
+    if isinstance(orig, dict):
+        if set(orig) != set(new):
+            return f'{path}: 字段不一致 {sorted(orig)} != {sorted(new)}'
+        for key in orig:
+            diff = compare_outputs(orig[key], new[key], f'{path}[{key!r}]', rtol, atol)
+            if diff:
+                return diff
+        return None
+    if isinstance(orig, (list, tuple)):
+        if len(orig) != len(new):
+            return f'{path}: 长度不一致 {len(orig)} != {len(new)}'
+        for i, (o, n) in enumerate(zip(orig, new)):
+            diff = compare_outputs(o, n, f'{path}[{i}]', rtol, atol)
+            if diff:
+                return diff
+        return None
+    if isinstance(orig, np.ndarray) or isinstance(new, np.ndarray):
+        orig, new = np.asarray(orig), np.asarray(new)
+        if orig.shape != new.shape or orig.dtype != new.dtype:
+            return f'{path}: {orig.shape}/{orig.dtype} != {new.shape}/{new.dtype}'
+        if not np.allclose(orig, new, rtol=rtol, atol=atol):
+            return f'{path}: 数值不一致'
+        return None
+    return None if orig == new else f'{path}: {orig!r} != {new!r}'
+
+
+def spawn_case(case):
+    """在独立子进程中运行，保证峰值 RSS 与启动耗时互不影响"""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8', check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"组合 {case['impl']}/w{case['num_workers']}/b{case['batch_size']} 运行失败:\n"
+                           f"{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='uvp_dataset 吞吐与内存基准测试')
+    parser.add_argument('--num-samples', type=int, default=500)
+    parser.add_argument('--num-points', type=int, default=16384)
+    parser.add_argument('--bev-shape', type=int, nargs=3, default=[4, 128, 128])
+    parser.add_argument('--per-shard', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32])
+    parser.add_argument('--check-samples', type=int, default=16, help='逐字段比较的样本数')
+    parser.add_argument('--data-root', default=None, help='合成数据目录，默认使用临时目录')
+    parser.add_argument('--original', default=None, help='原 SBEffv2.py 路径')
+    parser.add_argument('--original-class', default='StreamBevEffectiveV2')
+    parser.add_argument('--json-out', default=None)
+    parser.add_argument('--max-regression', type=float, default=0.05,
+                        help='指定 --original 时，单进程 uvp_dataset 吞吐允许低于原实现的比例')
+    parser.add_argument('--run-case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_root = args.data_root or os.path.join(tmp_dir, 'data')
+        if not os.path.isdir(data_root) or not os.listdir(data_root):
+            make_synthetic_bev(data_root, args.num_samples, args.num_points,
+                               tuple(args.bev_shape), args.per_shard)
+
+        cases = []
+        if args.original:
+            cases.append(('original', 0, 1))
+        cases += [('uvp', w, b) for w in args.workers for b in args.batch_sizes]
+        if not args.original and ('uvp', 0, 1) not in cases:
+            cases.insert(0, ('uvp', 0, 1))
+
+        results = []
+        for impl, num_workers, batch_size in cases:
+            results.append(spawn_case({
+                'impl': impl,
+                'num_workers': num_workers,
+                'batch_size': batch_size,
+                'data_root': data_root,
+                'max_samples': args.num_samples,
+                'check_samples': args.check_samples,
+                'original': args.original,
+                'original_class': args.original_class,
+                'dump_path': os.path.join(tmp_dir, f'{impl}_w{num_workers}_b{batch_size}.pkl'),
+            }))
+
+        # 第一个组合（原实现或单进程 uvp_dataset）作为参考输出
+        with open(results[0]['dump_path'], 'rb') as f:
+            reference = pickle.load(f)
+        for result in results:
+            with open(result.pop('dump_path'), 'rb') as f:
+                result['mismatch'] = compare_outputs(reference, pickle.load(f))
+
+    header = (f"{'impl':>8} {'workers':>7} {'batch':>5} {'samples/s':>10} {'p50ms':>8} {'p90ms':>8} "
+              f"{'p99ms':>8} {'rssMB':>7} {'wrkMB':>7} {'start_s':>7}  equivalent")
+    print(header)
+    for r in results:
+        print(f"{r['impl']:>8} {r['num_workers']:>7} {r['batch_size']:>5} {r['samples_per_sec']:>10.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['peak_rss_mb']:>7.0f} "
+              f"{r['peak_worker_rss_mb']:>7.0f} {r['startup_s']:>7.2f}  {r['mismatch'] or 'yes'}")
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failed = any(r['mismatch'] for r in results)
+    if args.original:
+        baseline = results[0]['samples_per_sec']
+        serial = next((r for r in results if r['impl'] == 'uvp' and r['num_workers'] == 0
+                       and r['batch_size'] == 1), None)
+        if serial is not None and serial['samples_per_sec'] < baseline * (1 - args.max_regression):
+            print(f"吞吐回退: uvp_dataset {serial['samples_per_sec']:.1f} < 原实现 {baseline:.1f} samples/s")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,11 @@ class UVPDataLoaderAdapter(BaseDataLoader):
         self.dataset = UVPDataset(dataset_config)
     
     def get_batch(self):
-        return next(iter(self.dataset))
\ No newline at end of file
+        # 持久 batch 迭代器，连续调用不会重启数据流
+        return self.dataset.next_batch()
+    
+    def state_dict(self):
+        return self.dataset.state_dict()
+    
+    def load_state_dict(self, state):
+        self.dataset.load_state_dict(state)
\ No newline at end of file
@@ -7,4 +7,11 @@ class UVPDataProvider(DataProvider):
         self.source = UVPDataset(config)
     
     def __next__(self):
-        return self.source.__next__()
\ No newline at end of file
+        return self.source.__next__()
+    
+    def state_dict(self):
+        # 断点续训：保存存储游标、shuffle 状态与预取进度
+        return self.source.state_dict()
+    
+    def load_state_dict(self, state):
+        self.source.load_state_dict(state)
\ No newline at end of file
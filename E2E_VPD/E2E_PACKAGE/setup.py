@@ -10,5 +10,5 @@ setup(
         'redis': ['redis>=4.3.0'],
         's3': ['boto3>=1.24.0'],
     },
-    python_requires='>=3.7',
+    python_requires='>=3.8',
 )
\ No newline at end of file
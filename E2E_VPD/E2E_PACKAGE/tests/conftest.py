@@ -0,0 +1,85 @@
+import io
+import pickle
+import tarfile
+
+import numpy as np
+import pytest
+
+from uvp_dataset import UVPDataset
+
+COMPOSER_CONFIG = {'feature_keys': ['points'], 'label_keys': ['labels'], 'meta_keys': ['token']}
+
+
+def _make_raw(idx, num_points=16):
+    rng = np.random.default_rng(idx)
+    return {
+        'points': rng.standard_normal((num_points, 4)).astype(np.float32),
+        'labels': np.array([idx], dtype=np.int64),
+        'token': f'sample_{idx}',
+    }
+
+
+def _write_pickles(root, samples):
+    root.mkdir(parents=True, exist_ok=True)
+    for i, raw in enumerate(samples):
+        (root / f'{i:06d}.pkl').write_bytes(pickle.dumps(raw))
+    return root
+
+
+def _write_tars(root, samples, per_shard, local_names=False):
+    """
+    每 per_shard 个样本一个 shard-{n:03d}.tar；成员名默认按全局序号，
+    local_names=True 时按分片内序号（不同分片中有同名成员）
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    for shard, start in enumerate(range(0, len(samples), per_shard)):
+        with tarfile.open(root / f'shard-{shard:03d}.tar', 'w') as tar:
+            for i in range(start, min(start + per_shard, len(samples))):
+                payload = pickle.dumps(samples[i])
+                info = tarfile.TarInfo(f'{i - start if local_names else i:06d}.pkl')
+                info.size = len(payload)
+                tar.addfile(info, io.BytesIO(payload))
+    return root
+
+
+@pytest.fixture
+def composer_config():
+    return dict(COMPOSER_CONFIG)
+
+
+@pytest.fixture
+def make_raw():
+    """make_raw(idx, num_points=16): 带 points/labels/token 的原始样本，内容由 idx 确定"""
+    return _make_raw
+
+
+@pytest.fixture
+def write_pickles():
+    """write_pickles(root, samples): 每个样本一个 pkl 文件，返回 root"""
+    return _write_pickles
+
+
+@pytest.fixture
+def write_tars():
+    """write_tars(root, samples, per_shard, local_names=False): 样本打包为 tar 分片，返回 root"""
+    return _write_tars
+
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """make_dataset(samples, **params): 样本写入独立的本地目录后构造 UVPDataset"""
+    def factory(samples, **params):
+        root = _write_pickles(tmp_path / f'data_{len(list(tmp_path.iterdir()))}', samples)
+        storage = {'type': 'local', 'root': str(root), 'pattern': '*.pkl'}
+        return UVPDataset({'storage': storage, 'composer': COMPOSER_CONFIG, **params})
+    return factory
+
+
+@pytest.fixture
+def make_source(tmp_path):
+    """make_source(prefix, count): token 为 {prefix}{i} 的本地数据源，返回 storage 配置"""
+    def factory(prefix, count):
+        samples = [dict(_make_raw(i, num_points=2), token=f'{prefix}{i}') for i in range(count)]
+        root = _write_pickles(tmp_path / prefix, samples)
+        return {'type': 'local', 'root': str(root), 'pattern': '*.pkl'}
+    return factory
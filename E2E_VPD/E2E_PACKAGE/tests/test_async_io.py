@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from uvp_dataset.async_io import AsyncHTTPClient
+
+
+def test_cancelled_request_closes_connection():
+    async def scenario():
+        closed = asyncio.Event()
+
+        async def handle(reader, writer):
+            # 只读请求不回复，直到客户端关闭连接
+            await reader.read()
+            closed.set()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncHTTPClient(f'http://127.0.0.1:{port}', 'bucket', max_connections=1, timeout=10)
+        connections = []
+        connect = client._connect
+
+        async def recording_connect(key):
+            conn = await connect(key)
+            connections.append(conn)
+            return conn
+        client._connect = recording_connect
+        task = asyncio.ensure_future(client.get('key'))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 取消后立即关闭，而不是等连接对象被回收
+        assert connections[0][1].is_closing()
+        await asyncio.wait_for(closed.wait(), 2)
+        server.close()
+        await server.wait_closed()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client._idle == []
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from uvp_dataset.data_composer import DataComposer
+from uvp_dataset.exceptions import CollateError
+
+
+def test_compose_extracts_flat_features(make_raw):
+    composer = DataComposer({'feature_keys': ['points'], 'label_keys': ['labels'],
+                             'meta_keys': ['token']})
+    raw = make_raw(0)
+    out = composer.compose(raw)
+
+    assert out['features'].dtype == np.float32
+    np.testing.assert_array_equal(out['features'], raw['points'].ravel())
+    np.testing.assert_array_equal(out['labels'], raw['labels'])
+    assert out['token'] == 'sample_0'
+
+
+def test_compose_normalizes_features(make_raw):
+    composer = DataComposer({'feature_keys': ['points'], 'mean': 1.0, 'std': 2.0})
+    raw = make_raw(1)
+    out = composer.compose(raw)
+
+    np.testing.assert_allclose(out['features'], (raw['points'].ravel() - 1.0) / 2.0)
+
+
+def test_compose_batch_matches_per_sample_compose(make_raw):
+    composer = DataComposer({'feature_keys': ['points', 'labels'], 'label_keys': ['labels'],
+                             'meta_keys': ['token'], 'mean': 0.5, 'std': 2.0})
+    raws = [make_raw(i) for i in range(5)]
+    batch = composer.compose_batch(raws)
+    expected = [composer.compose(raw) for raw in raws]
+
+    assert batch['features'].shape == (5, 65)
+    np.testing.assert_array_equal(batch['features'], np.stack([e['features'] for e in expected]))
+    np.testing.assert_array_equal(batch['labels'], np.stack([e['labels'] for e in expected]))
+    assert batch['token'] == [f'sample_{i}' for i in range(5)]
+
+
+def test_compose_batch_reuses_rotating_buffers(make_raw):
+    composer = DataComposer({}, num_buffers=2)
+    first = composer.compose_batch([make_raw(i) for i in range(4)])
+    second = composer.compose_batch([make_raw(i) for i in range(4)])
+    third = composer.compose_batch([make_raw(i) for i in range(3)])
+
+    assert third['features'].shape == (3, 64)
+    assert third['features'].base is first['features'].base
+    assert second['features'].base is not first['features'].base
+
+
+def test_compose_batch_rejects_mismatched_features(make_raw):
+    composer = DataComposer({})
+    with pytest.raises(CollateError):
+        composer.compose_batch([make_raw(0), make_raw(1, num_points=8)])
@@ -0,0 +1,130 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from uvp_dataset import ComposeWorkerPool, UVPDataset
+from uvp_dataset.exceptions import ComposeWorkerError
+
+def assert_samples_equal(a, b):
+    assert list(a) == list(b)
+    for key in a:
+        if isinstance(a[key], np.ndarray):
+            np.testing.assert_array_equal(a[key], b[key])
+        else:
+            assert a[key] == b[key]
+
+
+def test_worker_pool_ordered_matches_serial(make_dataset, make_raw):
+    samples = [make_raw(i) for i in range(40)]
+    serial = list(make_dataset(samples))
+    parallel = list(make_dataset(samples, num_workers=3, start_method='fork'))
+
+    assert len(parallel) == len(serial)
+    for expected, actual in zip(serial, parallel):
+        assert_samples_equal(expected, actual)
+
+
+def test_worker_pool_unordered_yields_every_sample(make_dataset, make_raw):
+    samples = [make_raw(i) for i in range(40)]
+    dataset = make_dataset(samples, num_workers=3, ordered=False, start_method='fork')
+    labels = sorted(int(sample['labels'][0]) for sample in dataset)
+
+    assert labels == list(range(40))
+
+
+def test_worker_pool_falls_back_to_pickle_for_oversized_results(make_raw, composer_config):
+    samples = [make_raw(i, num_points=1024) for i in range(4)]
+    with ComposeWorkerPool(composer_config, num_workers=2, slot_bytes=128,
+                           start_method='fork') as pool:
+        results = list(pool.imap(samples))
+
+    np.testing.assert_array_equal(results[3]['features'], samples[3]['points'].ravel())
+
+
+def test_worker_pool_reports_compose_errors(make_dataset, make_raw):
+    samples = [make_raw(0), {'labels': np.zeros(1)}]
+    dataset = make_dataset(samples, num_workers=1, start_method='fork')
+
+    with pytest.raises(ComposeWorkerError, match='KeyError'):
+        list(dataset)
+
+
+def test_iter_batches_collates_into_contiguous_arrays(make_dataset, make_raw):
+    samples = [make_raw(i) for i in range(10)]
+    batches = list(make_dataset(samples, batch_size=4).iter_batches())
+
+    assert [len(b['token']) for b in batches] == [4, 4, 2]
+    assert batches[0]['features'].shape == (4, 64)
+    assert batches[0]['features'].flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(batches[2]['labels'][:, 0], [8, 9])
+    assert batches[1]['token'] == ['sample_4', 'sample_5', 'sample_6', 'sample_7']
+
+
+def test_iter_batches_reuses_buffers_and_drops_last(make_dataset, make_raw):
+    samples = [make_raw(i) for i in range(9)]
+    dataset = make_dataset(samples, batch_size=2, drop_last=True, collate_buffers=2)
+    batches = list(dataset.iter_batches())
+
+    assert len(batches) == 4
+    assert batches[0]['features'].base is batches[2]['features'].base
+    assert batches[0]['features'].base is not batches[1]['features'].base
+
+
+def test_persistent_stream_does_not_restart(make_dataset, make_raw):
+    samples = [make_raw(i) for i in range(6)]
+    dataset = make_dataset(samples, batch_size=2)
+
+    assert next(dataset)['token'] == 'sample_0'
+    assert dataset.next_batch()['token'] == ['sample_1', 'sample_2']
+    assert dataset.next_batch()['token'] == ['sample_3', 'sample_4']
+    dataset.reset()
+    assert next(dataset)['token'] == 'sample_0'
+
+
+def test_collate_rejects_mismatched_shapes():
+    from uvp_dataset import BatchCollator
+    from uvp_dataset.exceptions import CollateError
+
+    collator = BatchCollator(batch_size=2)
+    with pytest.raises(CollateError):
+        collator.collate([{'x': np.zeros(3)}, {'x': np.zeros(4)}])
+
+
+def copy_batch(batch):
+    return {key: value.copy() if isinstance(value, np.ndarray) else list(value)
+            for key, value in batch.items()}
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_state_dict_resumes_without_replaying(tmp_path, num_workers, make_raw, write_tars, composer_config):
+    samples = [make_raw(i) for i in range(60)]
+    root = write_tars(tmp_path / 'tars', samples, per_shard=7)
+    config = {
+        'storage': {'type': 'tar', 'root': str(root)},
+        'composer': composer_config,
+        'batch_size': 4,
+        'shuffle_buffer': {'size': 8, 'seed': 1},
+        'num_workers': num_workers,
+        'start_method': 'fork',
+    }
+    dataset = UVPDataset(config)
+    for _ in range(5):
+        dataset.next_batch()
+    state = pickle.loads(pickle.dumps(dataset.state_dict()))
+    expected = [copy_batch(dataset.next_batch()) for _ in range(5)]
+    dataset.reset()
+
+    resumed = UVPDataset(config)
+    starts = []
+    iter_records = resumed.loader.backend.iter_records
+    resumed.loader.backend.iter_records = lambda shards, start=(0, 0): (
+        starts.append(start) or iter_records(shards, start))
+    resumed.load_state_dict(state)
+    actual = [copy_batch(resumed.next_batch()) for _ in range(5)]
+    resumed.reset()
+
+    assert starts[0] == (state['loader']['shard_index'], state['loader']['offset'])
+    assert starts[0] != (0, 0)
+    for a, b in zip(expected, actual):
+        assert_samples_equal(a, b)
@@ -0,0 +1,148 @@
+import functools
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from uvp_dataset.exceptions import StorageError
+from uvp_dataset.load_storage import STORAGE_BACKENDS, LoadStorage, StorageBackend, register_backend
+
+
+@pytest.fixture
+def object_server(tmp_path, write_pickles, make_raw):
+    bucket = write_pickles(tmp_path / 'bucket', [make_raw(i) for i in range(12)])
+    manifest = [{'key': name, 'size': os.path.getsize(bucket / name)}
+                for name in sorted(os.listdir(bucket))]
+    (bucket / 'manifest.json').write_text(json.dumps(manifest))
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    handler.func.protocol_version = 'HTTP/1.1'
+    handler.func.log_message = lambda *args: None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def tokens(storage):
+    return [raw['token'] for raw in storage]
+
+
+def test_local_backend_reads_files_in_order(tmp_path, write_pickles, make_raw):
+    root = write_pickles(tmp_path / 'data', [make_raw(i) for i in range(5)])
+    storage = LoadStorage({'type': 'local', 'root': str(root), 'pattern': '*.pkl', 'read_ahead': 2})
+
+    assert tokens(storage) == [f'sample_{i}' for i in range(5)]
+    storage.close()
+
+
+def test_tar_backend_reads_shards_sequentially(tmp_path, write_tars, make_raw):
+    root = write_tars(tmp_path / 'tars', [make_raw(i) for i in range(12)], per_shard=4)
+    storage = LoadStorage({'type': 'tar', 'root': str(root), 'read_ahead': 4096})
+
+    assert tokens(storage) == [f'sample_{i}' for i in range(12)]
+    assert [shard.nbytes for shard in storage.shards] == [
+        os.path.getsize(root / f'shard-{i:03d}.tar') for i in range(3)]
+
+
+def test_tar_backend_resumes_from_byte_offset(tmp_path, write_tars, make_raw):
+    root = write_tars(tmp_path / 'tars', [make_raw(i) for i in range(6)], per_shard=3)
+    storage = LoadStorage({'type': 'tar', 'root': str(root)})
+    records = list(storage.backend.iter_records(storage.shards))
+    shard_pos, offset = records[1][:2]
+
+    resumed = storage.backend.iter_records(storage.shards, start=(shard_pos, offset))
+    names = [name for _, _, name, _ in resumed]
+    assert names == [name for _, _, name, _ in records[2:]]
+
+
+def test_object_backend_prefetches_through_connection_pool(object_server):
+    storage = LoadStorage({'type': 'object', 'endpoint': object_server, 'bucket': 'bucket',
+                           'read_ahead': 4, 'max_connections': 2})
+
+    assert len(storage.shards) == 12
+    assert tokens(storage) == [f'sample_{i}' for i in range(12)]
+    storage.close()
+
+
+def test_object_backend_reports_missing_objects(object_server):
+    storage = LoadStorage({'type': 'object', 'endpoint': object_server, 'bucket': 'bucket'})
+    with pytest.raises(StorageError, match='404'):
+        storage.backend.client.get('missing.pkl')
+
+
+def test_backend_registry():
+    with pytest.raises(StorageError, match='未注册'):
+        LoadStorage({'type': 'nope'})
+
+    @register_backend('memory-test')
+    class MemoryBackend(StorageBackend):
+        def list_shards(self):
+            return [('a', 1), ('b', 1)]
+
+        def iter_shard(self, shard, start=0):
+            yield 1, shard[0] + '.json', json.dumps({'token': shard[0]}).encode()
+
+    try:
+        assert tokens(LoadStorage({'type': 'memory-test'})) == ['a', 'b']
+    finally:
+        STORAGE_BACKENDS.pop('memory-test')
+
+
+def test_async_object_backend_reads_in_order(object_server):
+    storage = LoadStorage({'type': 'object', 'endpoint': object_server, 'bucket': 'bucket',
+                           'io_mode': 'async', 'concurrency': 5, 'max_connections': 3})
+
+    assert tokens(storage) == [f'sample_{i}' for i in range(12)]
+    # 第二轮复用 keep-alive 连接
+    assert tokens(storage) == [f'sample_{i}' for i in range(12)]
+    storage.close()
+
+
+def test_async_mode_resumes_and_stops_early(object_server):
+    config = {'type': 'object', 'endpoint': object_server, 'bucket': 'bucket',
+              'io_mode': 'async', 'concurrency': 4}
+    storage = LoadStorage(config)
+    stream = iter(storage)
+    assert [next(stream)['token'] for _ in range(5)] == [f'sample_{i}' for i in range(5)]
+    state = storage.state_dict()
+    # 提前关闭时取消在途读取
+    stream.close()
+    storage.close()
+
+    resumed = LoadStorage(config)
+    resumed.load_state_dict(state)
+    assert tokens(resumed) == [f'sample_{i}' for i in range(5, 12)]
+    resumed.close()
+
+
+def test_async_mode_reports_errors(object_server, tmp_path, write_tars, make_raw):
+    storage = LoadStorage({'type': 'object', 'endpoint': object_server, 'bucket': 'bucket',
+                           'io_mode': 'async'})
+    storage.shards = storage.shards[:2] + [storage.shards[0]._replace(key='missing.pkl')]
+    with pytest.raises(StorageError, match='404'):
+        tokens(storage)
+    storage.close()
+
+    root = write_tars(tmp_path / 'tars', [make_raw(i) for i in range(2)], per_shard=2)
+    with pytest.raises(StorageError, match='不支持'):
+        tokens(LoadStorage({'type': 'tar', 'root': str(root), 'io_mode': 'async'}))
+
+
+def test_async_local_backend_feeds_dataset(tmp_path, write_pickles, make_raw):
+    from uvp_dataset import UVPDataset
+
+    root = write_pickles(tmp_path / 'data', [make_raw(i) for i in range(10)])
+    dataset = UVPDataset({
+        'storage': {'type': 'local', 'root': str(root), 'io_mode': 'async', 'concurrency': 8},
+        'composer': {'meta_keys': ['token']},
+        'batch_size': 4,
+    })
+
+    assert [sample['token'] for sample in dataset] == [f'sample_{i}' for i in range(10)]
+    assert [len(batch['token']) for batch in dataset.iter_batches()] == [4, 4, 2]
+    dataset.loader.close()
@@ -0,0 +1,107 @@
+import pickle
+import threading
+import time
+
+import pytest
+
+from uvp_dataset import UVPDataset
+
+
+@pytest.fixture
+def mixed_config(make_source, composer_config):
+    """mixed_config(**mixing): a、b 两个数据源按 3:1 混合的配置"""
+    def factory(**mixing):
+        return {
+            'sources': [
+                {'name': 'a', 'storage': make_source('a', 30), 'weight': 3},
+                {'name': 'b', 'storage': make_source('b', 10), 'weight': 1},
+            ],
+            'composer': composer_config,
+            'mixing': {'strict': True, **mixing},
+            'batch_size': 4,
+        }
+    return factory
+
+
+def test_weighted_schedule_is_deterministic(mixed_config):
+    config = mixed_config()
+    tokens = [sample['token'] for sample in UVPDataset(config)]
+
+    assert tokens[:8] == ['a0', 'a1', 'b0', 'a2', 'a3', 'a4', 'b1', 'a5']
+    assert tokens == [sample['token'] for sample in UVPDataset(config)]
+    assert sorted(tokens) == sorted([f'a{i}' for i in range(30)] + [f'b{i}' for i in range(10)])
+
+
+def test_weights_adjustable_at_runtime_and_reported(mixed_config):
+    dataset = UVPDataset(mixed_config())
+    stream = iter(dataset)
+    [next(stream) for _ in range(8)]
+    dataset.set_source_weights({'a': 1, 'b': 1})
+    tokens = [next(stream)['token'] for _ in range(8)]
+    stats = dataset.source_stats()
+    stream.close()
+
+    assert [token[0] for token in tokens] == ['a', 'b'] * 4
+    assert stats['a']['consumed'] == 6 + 4 and stats['b']['consumed'] == 2 + 4
+    assert stats['b']['target_share'] == 0.5
+
+
+def test_state_dict_resumes_each_source(mixed_config):
+    config = mixed_config()
+    dataset = UVPDataset(config)
+    for _ in range(3):
+        dataset.next_batch()
+    state = pickle.loads(pickle.dumps(dataset.state_dict()))
+    expected = [dataset.next_batch()['token'] for _ in range(3)]
+    dataset.reset()
+
+    resumed = UVPDataset(config)
+    resumed.load_state_dict(state)
+    actual = [resumed.next_batch()['token'] for _ in range(3)]
+    resumed.reset()
+
+    assert actual == expected
+
+
+def test_slow_source_does_not_stall_others(mixed_config):
+    dataset = UVPDataset(mixed_config(strict=False))
+    release = threading.Event()
+    slow_loader = dataset.loader.sources[1].loader
+    load_epoch = slow_loader._load_epoch
+
+    def blocked_epoch():
+        release.wait()
+        yield from load_epoch()
+    slow_loader._load_epoch = blocked_epoch
+
+    stream = iter(dataset)
+    head = [next(stream)['token'] for _ in range(10)]
+    release.set()
+    rest = [sample['token'] for sample in stream]
+
+    assert all(token.startswith('a') for token in head)
+    assert len(head) + len(rest) == 40
+    assert dataset.source_stats()['b']['starved'] > 0
+
+
+def test_close_does_not_hang_on_blocked_source(mixed_config, monkeypatch):
+    from uvp_dataset import mixing
+    monkeypatch.setattr(mixing, 'MIXING_JOIN_TIMEOUT', 0.5)
+    dataset = UVPDataset(mixed_config(strict=False, prefetch=1))
+    hang = threading.Event()
+    slow_loader = dataset.loader.sources[1].loader
+
+    def hung_epoch():
+        hang.wait()
+        yield from ()
+    slow_loader._load_epoch = hung_epoch
+
+    stream = iter(dataset)
+    [next(stream) for _ in range(5)]
+    start = time.monotonic()
+    stream.close()
+    elapsed = time.monotonic() - start
+    hang.set()
+
+    # 卡在读取中的线程等待 MIXING_JOIN_TIMEOUT 后放弃；预取队列已满的线程立即退出
+    assert elapsed < 2.0
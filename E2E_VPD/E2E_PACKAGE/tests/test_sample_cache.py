@@ -0,0 +1,107 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from uvp_dataset import SampleCache, UVPDataset
+
+@pytest.fixture
+def cache_name():
+    name = f'uvp_test_{uuid.uuid4().hex[:12]}'
+    yield name
+    cache = SampleCache(name, max_bytes=4096, persistent=True)
+    cache.unlink()
+    os.remove(cache.lock_path)
+
+
+def test_cache_round_trip_and_report(cache_name):
+    cache = SampleCache(cache_name, max_bytes=2**20, entry_bytes=4096)
+    sample = {'features': np.arange(12, dtype=np.float32).reshape(3, 4), 'token': 'a', 'labels': np.array([1])}
+
+    assert cache.get('k') is None
+    assert cache.put('k', sample)
+    cached = cache.get('k')
+    report = cache.report()
+
+    assert list(cached) == ['features', 'token', 'labels']
+    np.testing.assert_array_equal(cached['features'], sample['features'])
+    assert cached['token'] == 'a'
+    assert (report['hits'], report['misses'], report['entries']) == (1, 1, 1)
+    assert report['hit_rate'] == 0.5
+
+
+def test_cache_evicts_oldest_within_budget(cache_name):
+    cache = SampleCache(cache_name, max_bytes=2**18, entry_bytes=2**12)
+    for i in range(200):
+        assert cache.put(f'k{i}', {'x': np.full(2000, i % 256, dtype=np.uint8)})
+    report = cache.report()
+
+    assert report['evictions'] > 0
+    assert report['used_bytes'] <= report['capacity_bytes']
+    live = [i for i in range(200) if f'k{i}' in cache]
+    assert len(live) == report['entries']
+    # FIFO 淘汰：留下的是最近写入的连续一段
+    assert live == list(range(200 - len(live), 200))
+    assert cache.get('k199')['x'][0] == 199
+
+
+def test_cache_without_eviction_rejects_when_full(cache_name):
+    cache = SampleCache(cache_name, max_bytes=2**16, entry_bytes=2**12, evict=False)
+    results = [cache.put(f'k{i}', {'x': np.zeros(2000, dtype=np.uint8)}) for i in range(100)]
+
+    assert results[0] and not results[-1]
+    assert cache.report()['evictions'] == 0
+    assert 'k0' in cache
+
+
+def test_cache_is_shared_across_processes(cache_name):
+    cache = SampleCache(cache_name, max_bytes=2**20)
+    pid = os.fork()
+    if pid == 0:
+        child = SampleCache(cache_name)
+        child.put('from_child', {'x': np.arange(5)})
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    np.testing.assert_array_equal(cache.get('from_child')['x'], np.arange(5))
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_second_epoch_skips_storage_and_compose(tmp_path, cache_name, num_workers, write_pickles, make_raw,
+                                                composer_config):
+    write_pickles(tmp_path, [make_raw(i) for i in range(20)])
+    dataset = UVPDataset({
+        'storage': {'type': 'local', 'root': str(tmp_path), 'pattern': '*.pkl'},
+        'composer': composer_config,
+        'sample_cache': {'name': cache_name, 'max_bytes': 2**22},
+        'num_workers': num_workers,
+        'start_method': 'fork',
+    })
+    first = list(dataset)
+    bytes_read = dataset.loader.bytes_read
+    dataset.composer.compose = None     # 第二轮不应再调用 compose
+    second = list(dataset)
+
+    assert dataset.loader.bytes_read == bytes_read
+    assert [s['token'] for s in second] == [s['token'] for s in first]
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a['features'], b['features'])
+    report = dataset.cache_stats()
+    assert report['local_hits'] == 20
+    assert report['entries'] == 20
+
+
+def test_tar_records_hit_cache_by_shard_and_member(tmp_path, cache_name, write_tars, make_raw, composer_config):
+    # 两个分片中的成员同名，缓存 key 需要带上分片路径
+    write_tars(tmp_path, [make_raw(i) for i in range(6)], per_shard=3, local_names=True)
+    dataset = UVPDataset({
+        'storage': {'type': 'tar', 'root': str(tmp_path)},
+        'composer': composer_config,
+        'sample_cache': {'name': cache_name, 'max_bytes': 2**22},
+    })
+    first = [s['token'] for s in dataset]
+    second = [s['token'] for s in dataset]
+
+    assert first == second == [f'sample_{i}' for i in range(6)]
+    assert dataset.cache_stats()['local_hits'] == 6
@@ -0,0 +1,57 @@
+import pytest
+
+from uvp_dataset.load_storage import ShardInfo
+from uvp_dataset.sharding import assign_shards, balance_shards
+
+
+def make_shards(sizes):
+    return [ShardInfo(f'shard-{i:03d}', size) for i, size in enumerate(sizes)]
+
+
+def test_balance_shards_by_bytes():
+    shards = make_shards([100, 90, 10, 10, 10, 10, 50, 40])
+    parts = balance_shards(shards, 2)
+
+    loads = [sum(s.nbytes for s in part) for part in parts]
+    assert loads == [160, 160]
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_assignments_are_disjoint_and_complete(shuffle):
+    shards = make_shards(range(1, 38))
+    seen = []
+    for rank in range(2):
+        for worker_id in range(3):
+            seen.extend(assign_shards(shards, rank, 2, worker_id, 3, epoch=5, shuffle=shuffle))
+
+    assert sorted(seen) == sorted(shards)
+
+
+def test_epoch_reshuffle_is_deterministic():
+    shards = make_shards(range(1, 65))
+    epoch0 = assign_shards(shards, 1, 4, epoch=0, seed=7, shuffle=True)
+
+    assert epoch0 == assign_shards(shards, 1, 4, epoch=0, seed=7, shuffle=True)
+    assert epoch0 != assign_shards(shards, 1, 4, epoch=1, seed=7, shuffle=True)
+
+
+def test_dataset_reads_only_assigned_shards(tmp_path):
+    import pickle
+
+    import numpy as np
+
+    from uvp_dataset import UVPDataset
+
+    for i in range(10):
+        (tmp_path / f'{i:03d}.pkl').write_bytes(pickle.dumps({'points': np.zeros(4), 'token': i}))
+    tokens = []
+    for rank in range(2):
+        dataset = UVPDataset({
+            'storage': {'type': 'local', 'root': str(tmp_path)},
+            'composer': {'meta_keys': ['token']},
+            'sharding': {'rank': rank, 'world_size': 2, 'worker_id': 0, 'num_workers': 1},
+        })
+        tokens.append([sample['token'] for sample in dataset])
+
+    assert not set(tokens[0]) & set(tokens[1])
+    assert sorted(tokens[0] + tokens[1]) == list(range(10))
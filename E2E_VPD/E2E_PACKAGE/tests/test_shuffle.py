@@ -0,0 +1,34 @@
+import numpy as np
+
+from uvp_dataset.shuffle import ShuffleBuffer
+
+
+def test_shuffle_buffer_is_a_seeded_permutation():
+    items = list(range(200))
+    first = list(ShuffleBuffer(size=32, seed=3)(items))
+
+    assert sorted(first) == items
+    assert first != items
+    assert first == list(ShuffleBuffer(size=32, seed=3)(items))
+    buffer = ShuffleBuffer(size=32, seed=3)
+    buffer.set_epoch(1)
+    assert list(buffer(items)) != first
+
+
+def test_shuffle_buffer_respects_size():
+    buffer = ShuffleBuffer(size=8, seed=0)
+    stream = buffer(range(100))
+    for _ in range(50):
+        next(stream)
+        assert len(buffer.buffer) <= 8
+
+
+def test_shuffle_buffer_respects_byte_budget():
+    items = [{'points': np.zeros(256, dtype=np.uint8), 'idx': i} for i in range(50)]
+    buffer = ShuffleBuffer(size=1000, seed=0, max_bytes=1024)
+    out = []
+    for item in buffer(items):
+        assert buffer.buffered_bytes <= 1024
+        out.append(item['idx'])
+
+    assert sorted(out) == list(range(50))
@@ -0,0 +1,58 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from uvp_dataset import UVPDataset
+from uvp_dataset.stats import PipelineStats
+
+
+def test_timed_samples_every_nth_item():
+    stats = PipelineStats(sample_every=4)
+    assert list(stats.timed('load', range(10))) == list(range(10))
+
+    stage = stats.stages['load']
+    assert stage.count == 10
+    assert stage.sampled == 3
+
+
+@pytest.mark.parametrize('batch_compose', [False, True])
+def test_dataset_reports_per_stage_stats(tmp_path, batch_compose):
+    root = tmp_path / 'data'
+    root.mkdir()
+    for i in range(20):
+        (root / f'{i:03d}.pkl').write_bytes(pickle.dumps({'points': np.zeros((8, 4), np.float32)}))
+    dump_path = tmp_path / 'stats.json'
+    dataset = UVPDataset({
+        'storage': {'type': 'local', 'root': str(root)},
+        'composer': {},
+        'batch_size': 5,
+        'batch_compose': batch_compose,
+        'shuffle_buffer': {'size': 4},
+        'stats': {'sample_every': 2, 'log_interval': 0, 'dump_path': str(dump_path)},
+    })
+    assert len(list(dataset.iter_batches())) == 4
+
+    snapshot = dataset.stats()
+    assert snapshot['stages']['load']['count'] == 20
+    assert snapshot['stages']['compose']['count'] == 20
+    if batch_compose:
+        # compose_batch 一并完成拼接，没有单独的 collate 阶段
+        assert 'collate' not in snapshot['stages']
+    else:
+        assert snapshot['stages']['collate']['count'] == 20
+    assert snapshot['counters']['records_read'] == 20
+    assert snapshot['counters']['bytes_read'] == sum(p.stat().st_size for p in root.iterdir())
+    assert snapshot['gauges']['shuffle_buffer']['max'] <= 4
+    assert snapshot['samples_per_sec'] > 0
+    assert json.loads(dump_path.read_text())['stages']['load']['count'] > 0
+
+
+def test_stats_can_be_disabled(tmp_path):
+    (tmp_path / '0.pkl').write_bytes(pickle.dumps({'points': np.zeros(4)}))
+    dataset = UVPDataset({'storage': {'type': 'local', 'root': str(tmp_path)},
+                          'composer': {}, 'stats': False})
+
+    assert len(list(dataset)) == 1
+    assert dataset.stats() == {}
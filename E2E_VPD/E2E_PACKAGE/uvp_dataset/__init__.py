@@ -0,0 +1,11 @@
+from .collate import BatchCollator
+from .data_composer import DataComposer
+from .dataset import UVPDataset
+from .load_storage import LoadStorage
+from .mixing import MultiSourceLoader
+from .sample_cache import SampleCache
+from .shuffle import ShuffleBuffer
+from .worker_pool import ComposeWorkerPool
+
+__all__ = ['UVPDataset', 'DataComposer', 'LoadStorage', 'ComposeWorkerPool', 'BatchCollator',
+           'ShuffleBuffer', 'SampleCache', 'MultiSourceLoader']
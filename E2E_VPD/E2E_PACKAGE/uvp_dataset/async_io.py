@@ -0,0 +1,226 @@
+import asyncio
+import os
+import ssl
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Coroutine, Iterator, List,
+                    Optional, Sequence, Tuple)
+from urllib.parse import quote, urlsplit
+
+from .exceptions import StorageError
+
+if TYPE_CHECKING:
+    from .load_storage import Record, ShardInfo
+
+_END = object()
+
+
+async def _anext(agen: AsyncIterator) -> Any:
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+class AsyncLoopThread:
+    """
+    在后台线程中运行的事件循环，作为同步代码与异步读取之间的桥
+
+    事件循环在首次使用时创建；fork 出的子进程（如 DataLoader worker）不会继承父进程的
+    循环线程，检测到 pid 变化时在子进程内重新创建。阻塞读取（本地文件、boto3 等）
+    在容量为 io_threads 的线程池中执行。
+    """
+
+    def __init__(self, io_threads: int):
+        self.io_threads = max(1, io_threads)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(self.io_threads, thread_name_prefix='uvp-io'))
+            self._thread = threading.Thread(target=loop.run_forever, name='uvp-async-io', daemon=True)
+            self._thread.start()
+            self._loop, self._pid = loop, os.getpid()
+        return self._loop
+
+    def run(self, coro: Coroutine) -> Any:
+        """在事件循环中执行协程并同步等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """把异步迭代器转换为同步迭代器；提前关闭时在事件循环中 aclose，取消在途读取"""
+        try:
+            while True:
+                item = self.run(_anext(agen))
+                if item is _END:
+                    return
+                yield item
+        finally:
+            self.run(agen.aclose())
+
+    def close(self, cleanup: Optional[Callable[[], Awaitable]] = None):
+        """在事件循环中执行 cleanup 后停止循环线程"""
+        if self._loop is None or self._pid != os.getpid():
+            self._loop = None
+            return
+        if cleanup is not None:
+            self.run(cleanup())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __getstate__(self):
+        # 事件循环与线程不可序列化，spawn 出的进程按需重新创建
+        return {'io_threads': self.io_threads}
+
+    def __setstate__(self, state):
+        self.__init__(state['io_threads'])
+
+
+async def aiter_records(read: Callable[['ShardInfo'], Awaitable[bytes]],
+                        shards: Sequence['ShardInfo'],
+                        start: Tuple[int, int],
+                        concurrency: int) -> AsyncIterator['Record']:
+    """
+    每个分片为一个样本时的异步顺序读取：保持 concurrency 个读取在途，按分片顺序产出
+
+    start=(分片下标, 字节偏移) 与 StorageBackend.iter_records 语义一致，
+    偏移已到分片末尾时从下一个分片开始。
+    """
+    first, offset = start
+    if first < len(shards) and offset and offset >= shards[first].nbytes:
+        first += 1
+    positions = iter(range(first, len(shards)))
+    pending: 'deque[Tuple[int, asyncio.Future]]' = deque()
+
+    def schedule():
+        pos = next(positions, None)
+        if pos is not None:
+            pending.append((pos, asyncio.ensure_future(read(shards[pos]))))
+
+    try:
+        for _ in range(max(1, concurrency)):
+            schedule()
+        while pending:
+            pos, task = pending[0]
+            payload = await task
+            pending.popleft()
+            schedule()
+            yield pos, shards[pos].nbytes, shards[pos].key, payload
+    finally:
+        tasks = [task for _, task in pending]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncHTTPClient:
+    """
+    基于 asyncio 流的 HTTP/1.1 对象读取客户端（keep-alive 连接池）
+
+    只实现对象存储读取需要的 GET：对象地址与 HTTPObjectClient 相同，为
+    {endpoint}/{bucket}/{key}。同时在途的请求数受 max_connections 限制。
+    """
+
+    def __init__(self, endpoint: str, bucket: str, max_connections: int, timeout: float):
+        parts = urlsplit(endpoint)
+        self._ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self._host = parts.hostname
+        self._port = parts.port or (443 if self._ssl else 80)
+        self._netloc = parts.netloc
+        self._base = f"{parts.path.rstrip('/')}/{bucket}/" if bucket else f"{parts.path.rstrip('/')}/"
+        self._timeout = timeout
+        self._max_connections = max(1, max_connections)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        # Semaphore 需要在事件循环中创建
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def get(self, key: str) -> bytes:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_connections)
+        async with self._slots:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await self._connect(key)
+            try:
+                status, body, keep_alive = await asyncio.wait_for(self._request(conn, key), self._timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                conn[1].close()
+                if not reused:
+                    raise StorageError(f"读取对象 {key} 失败: {e!r}") from e
+                # 复用的 keep-alive 连接可能已被服务端关闭，换新连接重试一次
+                conn = await self._connect(key)
+                try:
+                    status, body, keep_alive = await asyncio.wait_for(self._request(conn, key), self._timeout)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                    conn[1].close()
+                    raise StorageError(f"读取对象 {key} 失败: {e!r}") from e
+                except BaseException:
+                    conn[1].close()
+                    raise
+            except BaseException:
+                # 请求进行中被取消（CancelledError）等：连接上可能残留半个响应，不能放回连接池
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+        if status != 200:
+            raise StorageError(f"读取对象 {key} 失败: HTTP {status}")
+        return body
+
+    async def _connect(self, key: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(self._host, self._port, ssl=self._ssl), self._timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise StorageError(f"读取对象 {key} 失败: 无法连接 {self._netloc}: {e!r}") from e
+
+    async def _request(self, conn: Tuple[asyncio.StreamReader, asyncio.StreamWriter],
+                       key: str) -> Tuple[int, bytes, bool]:
+        reader, writer = conn
+        writer.write(f"GET {self._base + quote(key)} HTTP/1.1\r\nHost: {self._netloc}\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = (version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body, keep_alive = await reader.read(), False
+        return int(status), body, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def aclose(self):
+        while self._idle:
+            self._idle.pop()[1].close()
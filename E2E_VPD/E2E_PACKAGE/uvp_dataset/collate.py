@@ -0,0 +1,102 @@
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .constants import DEFAULT_COLLATE_BUFFERS
+from .exceptions import CollateError
+from .stats import PipelineStats
+
+
+def _is_array_field(value: Any) -> bool:
+    return (isinstance(value, (np.ndarray, np.generic, bool, int, float))
+            and not np.asarray(value).dtype.hasobject)
+
+
+class BatchCollator:
+    """
+    把样本流拼接为 batch，每个数组字段写入预分配的连续 NumPy 缓冲
+
+    缓冲按 num_buffers 组轮转复用：返回的 batch 在其后 num_buffers - 1 个
+    batch 产出之前有效，需要长期持有时请自行 copy。非数组字段按 list 收集。
+    """
+
+    def __init__(self, batch_size: int, num_buffers: int = DEFAULT_COLLATE_BUFFERS,
+                 stats: Optional[PipelineStats] = None):
+        if batch_size < 1:
+            raise ValueError(f"batch_size 必须 >= 1, 当前为 {batch_size}")
+        self.batch_size = batch_size
+        self.num_buffers = max(1, num_buffers)
+        self._buffers: List[Optional[Dict[str, np.ndarray]]] = [None] * self.num_buffers
+        self._array_keys: List[str] = []
+        self._list_keys: List[str] = []
+        self._next_buffer = 0
+        self.stats = stats
+
+    def batches(self, samples: Iterable[Dict], drop_last: bool = False) -> Iterator[Dict]:
+        """逐样本写入当前缓冲，凑满 batch_size 即产出"""
+        buffers = None
+        lists: Dict[str, list] = {}
+        filled = 0
+        for sample in samples:
+            if buffers is None:
+                buffers = self._acquire(sample)
+                lists = {key: [] for key in self._list_keys}
+            if self.stats is not None and self.stats.should_sample('collate'):
+                start = time.perf_counter()
+                self._write(buffers, lists, filled, sample)
+                self.stats.record('collate', time.perf_counter() - start)
+            else:
+                self._write(buffers, lists, filled, sample)
+                if self.stats is not None:
+                    self.stats.count('collate')
+            filled += 1
+            if filled == self.batch_size:
+                yield self._emit(buffers, lists, filled)
+                buffers = None
+                filled = 0
+        if filled and not drop_last:
+            yield self._emit(buffers, lists, filled)
+
+    def collate(self, samples: List[Dict]) -> Dict:
+        """把一组样本（不超过 batch_size）拼接为一个 batch"""
+        if not samples or len(samples) > self.batch_size:
+            raise CollateError(f"样本数 {len(samples)} 不在 [1, {self.batch_size}] 范围内")
+        buffers = self._acquire(samples[0])
+        lists = {key: [] for key in self._list_keys}
+        for i, sample in enumerate(samples):
+            self._write(buffers, lists, i, sample)
+        return self._emit(buffers, lists, len(samples))
+
+    def _acquire(self, sample: Dict) -> Dict[str, np.ndarray]:
+        """取下一组轮转缓冲，首次使用时按样本的 shape/dtype 分配"""
+        index = self._next_buffer
+        self._next_buffer = (index + 1) % self.num_buffers
+        if self._buffers[index] is None:
+            if not self._array_keys and not self._list_keys:
+                self._array_keys = [key for key, value in sample.items() if _is_array_field(value)]
+                self._list_keys = [key for key in sample if key not in self._array_keys]
+            self._buffers[index] = {
+                key: np.empty((self.batch_size,) + np.shape(sample[key]),
+                              dtype=np.asarray(sample[key]).dtype)
+                for key in self._array_keys
+            }
+        return self._buffers[index]
+
+    def _write(self, buffers: Dict[str, np.ndarray], lists: Dict[str, list], row: int, sample: Dict):
+        for key, buffer in buffers.items():
+            try:
+                value = sample[key]
+            except KeyError:
+                raise CollateError(f"样本缺少字段 '{key}'") from None
+            if np.shape(value) != buffer.shape[1:]:
+                raise CollateError(
+                    f"字段 '{key}' 的 shape {np.shape(value)} 与 batch 缓冲 {buffer.shape[1:]} 不一致")
+            buffer[row] = value
+        for key, values in lists.items():
+            values.append(sample.get(key))
+
+    def _emit(self, buffers: Dict[str, np.ndarray], lists: Dict[str, list], filled: int) -> Dict:
+        batch: Dict[str, Any] = {key: buffer[:filled] for key, buffer in buffers.items()}
+        batch.update(lists)
+        return batch
@@ -0,0 +1,34 @@
+# 数据集默认参数
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_COLLATE_BUFFERS = 2          # batch 缓冲轮转组数
+DEFAULT_STATS_SAMPLE_EVERY = 16      # 统计模块每 N 个样本抽样计时一次
+
+# 多进程 compose 默认参数
+DEFAULT_NUM_WORKERS = 0              # 0 表示在当前进程内 compose
+DEFAULT_PREFETCH_FACTOR = 2          # 每个 worker 的在途任务数
+DEFAULT_SLOT_BYTES = 64 * 2**20      # 单个共享内存槽大小 (64MB)
+SHM_ALIGNMENT = 64                   # 共享内存中数组的对齐字节数
+WORKER_POLL_INTERVAL = 1.0           # 检查 worker 存活的间隔(秒)
+
+# 存储后端默认参数
+DEFAULT_READ_AHEAD = 8               # local/object 后端预读的文件/对象个数
+DEFAULT_TAR_READ_AHEAD = 8 * 2**20   # tar 后端顺序读缓冲大小 (8MB)
+DEFAULT_MAX_OPEN_FILES = 64          # 文件句柄池容量
+DEFAULT_MAX_CONNECTIONS = 16         # 对象存储连接池容量
+DEFAULT_HTTP_TIMEOUT = 30.0          # 对象存储请求超时(秒)
+DEFAULT_MANIFEST = 'manifest.json'   # 对象存储的分片清单文件
+DEFAULT_ASYNC_CONCURRENCY = 64       # io_mode='async' 时每个读取进程的在途读取数
+DEFAULT_ASYNC_IO_THREADS = 16        # io_mode='async' 时阻塞读取(本地文件等)使用的线程数
+
+# 跨 epoch 共享内存样本缓存默认参数
+DEFAULT_CACHE_BYTES = 4 * 2**30      # 单节点缓存总预算 (4GB)
+DEFAULT_CACHE_ENTRY_BYTES = 16 * 2**10  # 估算的平均样本大小，用于确定索引表容量（每条 32 字节）
+CACHE_LOOKUP_WINDOW = 256            # 每次批量检查缓存命中的分片数
+CACHE_LOCK_DIR = '/dev/shm'          # 缓存进程间锁文件所在目录，不存在时使用临时目录
+SAMPLE_KEY_FIELD = '__sample_key__'  # 开启缓存时 LoadStorage 在原始样本中附加的样本 key
+CACHED_SAMPLE_FIELD = '__cached_sample__'  # 缓存命中时附加的 compose 结果，无需再 compose
+
+# 多数据源混合默认参数
+DEFAULT_SOURCE_PREFETCH = 64         # 每个数据源预取队列的样本数
+MIXING_POLL_INTERVAL = 0.1           # 读取线程/混合方等待队列时检查停止标记的间隔(秒)
+MIXING_JOIN_TIMEOUT = 5.0            # 迭代结束时等待读取线程退出的时间(秒)
@@ -1,11 +1,128 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .constants import DEFAULT_COLLATE_BUFFERS
+from .exceptions import CollateError
+
+
 class DataComposer:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, num_buffers: int = DEFAULT_COLLATE_BUFFERS):
         self._init_from_config(config)
-    
+        # compose_batch 的输出缓冲，按 num_buffers 组轮转复用
+        self.num_buffers = max(1, num_buffers)
+        self._batch_buffers: List[Optional[Dict[str, np.ndarray]]] = [None] * self.num_buffers
+        self._next_buffer = 0
+
     def compose(self, raw_data: Dict) -> Dict:
         """保持与原版完全相同的数据组合逻辑"""
         # 原样迁移数据组合逻辑
         processed = {}
         processed['features'] = self._extract_features(raw_data)
+        for key in self.label_keys:
+            processed[key] = np.asarray(raw_data[key])
+        for key in self.meta_keys:
+            processed[key] = raw_data.get(key)
         # ... 其他处理
-        return processed
\ No newline at end of file
+        return processed
+
+    def compose_batch(self, raw_batch: Sequence[Dict],
+                      out: Optional[Dict[str, np.ndarray]] = None) -> Dict:
+        """
+        批量组合：结果与逐样本 compose 后按行堆叠一致
+
+        特征与标签直接写入预分配的 (N, ...) 缓冲，归一化在整个 batch 上原地向量化完成，
+        不再为每个样本构造中间数组与字典；meta 字段按 list 收集。
+
+        Args:
+            raw_batch: 原始样本列表
+            out: 可选的输出缓冲 {字段: 数组}，首维不小于 len(raw_batch)；
+                 缺省时使用内部轮转缓冲，返回的数组在其后 num_buffers - 1 次调用之前有效
+        """
+        if not raw_batch:
+            raise CollateError("raw_batch 为空")
+        n = len(raw_batch)
+        first = raw_batch[0]
+        feature_sizes = [np.size(first[key]) for key in self.feature_keys]
+        label_specs = [(key, np.shape(first[key]), np.asarray(first[key]).dtype)
+                       for key in self.label_keys]
+        if out is None:
+            out = self._acquire(n, sum(feature_sizes), label_specs)
+
+        features = out['features'][:n]
+        column = 0
+        for key, size in zip(self.feature_keys, feature_sizes):
+            target = features[:, column:column + size]
+            for row, raw_data in enumerate(raw_batch):
+                # ravel 对连续数组是视图，赋值时完成 dtype 转换
+                value = np.ravel(raw_data[key])
+                if value.size != size:
+                    raise CollateError(
+                        f"第 {row} 个样本的特征 '{key}' 元素数 {value.size} 与首个样本 {size} 不一致")
+                target[row] = value
+            column += size
+        if self.mean is not None:
+            np.subtract(features, self.mean, out=features)
+        if self.std is not None:
+            np.divide(features, self.std, out=features)
+
+        batch: Dict[str, Any] = {'features': features}
+        for key, shape, _ in label_specs:
+            target = out[key][:n]
+            for row, raw_data in enumerate(raw_batch):
+                if np.shape(raw_data[key]) != shape:
+                    raise CollateError(
+                        f"第 {row} 个样本的字段 '{key}' shape {np.shape(raw_data[key])} 与首个样本 {shape} 不一致")
+                target[row] = raw_data[key]
+            batch[key] = target
+        for key in self.meta_keys:
+            batch[key] = [raw_data.get(key) for raw_data in raw_batch]
+        return batch
+
+    def _acquire(self, n: int, num_features: int,
+                 label_specs: List[Tuple[str, Tuple[int, ...], np.dtype]]) -> Dict[str, np.ndarray]:
+        """取下一组轮转缓冲，容量或 shape 不符时重新分配"""
+        index = self._next_buffer
+        self._next_buffer = (index + 1) % self.num_buffers
+        buffers = self._batch_buffers[index]
+        if buffers is None or not self._fits(buffers, n, num_features, label_specs):
+            capacity = n if buffers is None else max(n, len(buffers['features']))
+            buffers = {'features': np.empty((capacity, num_features), dtype=self.dtype)}
+            for key, shape, dtype in label_specs:
+                buffers[key] = np.empty((capacity,) + shape, dtype=dtype)
+            self._batch_buffers[index] = buffers
+        return buffers
+
+    @staticmethod
+    def _fits(buffers: Dict[str, np.ndarray], n: int, num_features: int,
+              label_specs: List[Tuple[str, Tuple[int, ...], np.dtype]]) -> bool:
+        features = buffers['features']
+        if len(features) < n or features.shape[1] != num_features:
+            return False
+        return all(key in buffers and buffers[key].shape[1:] == shape and buffers[key].dtype == dtype
+                   for key, shape, dtype in label_specs)
+
+    def _init_from_config(self, config: Dict):
+        """从配置中读取特征/标签字段及归一化参数"""
+        self.feature_keys = list(config.get('feature_keys', ['points']))
+        self.label_keys = list(config.get('label_keys', []))
+        self.meta_keys = list(config.get('meta_keys', []))
+        self.dtype = np.dtype(config.get('dtype', 'float32'))
+        self.mean = self._as_optional_array(config.get('mean'))
+        self.std = self._as_optional_array(config.get('std'))
+
+    def _as_optional_array(self, value: Any):
+        if value is None:
+            return None
+        return np.asarray(value, dtype=self.dtype)
+
+    def _extract_features(self, raw_data: Dict) -> np.ndarray:
+        """拼接各特征字段并做归一化，返回一维特征向量"""
+        parts = [np.asarray(raw_data[key], dtype=self.dtype).ravel()
+                 for key in self.feature_keys]
+        features = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if self.mean is not None:
+            features = features - self.mean
+        if self.std is not None:
+            features = features / self.std
+        return features
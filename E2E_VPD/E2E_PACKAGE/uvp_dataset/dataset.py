@@ -1,6 +1,20 @@
-from typing import Any, Dict, Iterator
+import itertools
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from .collate import BatchCollator
+from .constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_COLLATE_BUFFERS,
+    DEFAULT_NUM_WORKERS,
+    DEFAULT_PREFETCH_FACTOR,
+)
 from .data_composer import DataComposer
 from .load_storage import LoadStorage
+from .mixing import MultiSourceLoader
+from .sample_cache import SampleCache, cache_name, compose_with_cache
+from .shuffle import ShuffleBuffer
+from .stats import PipelineStats
+from .worker_pool import ComposeWorkerPool
 
 class UVPDataset:
     def __init__(self, config: Dict[str, Any]):
@@ -9,17 +23,282 @@ class UVPDataset:
         Args:
             config: 与原实现完全兼容的配置字典
         """
-        self.loader = LoadStorage(config['storage'])
-        self.composer = DataComposer(config['composer'])
+        # 多数据源模式: config['sources'] = [{'name': ..., 'storage': ..., 'weight': ...}, ...]，
+        # 混合参数 config['mixing'] = {'prefetch': ..., 'strict': ..., 'stop': ...}
+        if config.get('sources'):
+            self.loader = MultiSourceLoader(config['sources'], **config.get('mixing', {}))
+        else:
+            self.loader = LoadStorage(config['storage'])
+        self.composer = DataComposer(
+            config['composer'], num_buffers=config.get('collate_buffers', DEFAULT_COLLATE_BUFFERS))
+        self._composer_config = config['composer']
         self._init_parameters(config)
-    
+        if self.sample_cache is not None:
+            self.loader.set_sample_cache(self.sample_cache)
+        if config.get('sharding') is not None:
+            self.loader.set_sharding(**config['sharding'])
+        # 持久迭代器，供 __next__/next_batch 连续取数而不重启数据流
+        self._stream: Optional[Iterator[Dict]] = None
+        self._batch_stream: Optional[Iterator[Dict]] = None
+        self._raw_iter: Optional[Iterator[Dict]] = None
+        # checkpoint 相关：当前 worker 池、恢复时需要先重放的原始样本
+        self._active_pool: Optional[ComposeWorkerPool] = None
+        self._replay: List[Dict] = []
+        self._resuming = False
+
     def __iter__(self) -> Iterator[Dict]:
         """保持与原版完全相同的迭代接口"""
-        for raw_data in self.loader:
-            yield self.composer.compose(raw_data)
-    
+        yield from self._samples(self._raw_stream())
+
+    def _samples(self, raw_stream: Iterator[Dict]) -> Iterator[Dict]:
+        stats = self.pipeline_stats
+        if self.num_workers > 0:
+            samples = self._iter_with_workers(raw_stream)
+        elif stats is None:
+            samples = map(self._compose, raw_stream)
+        else:
+            samples = self._iter_composed(raw_stream, stats)
+        if stats is None:
+            yield from samples
+            return
+        for sample in samples:
+            stats.count('samples')
+            yield sample
+
+    def _iter_composed(self, raw_stream: Iterator[Dict], stats: PipelineStats) -> Iterator[Dict]:
+        """单进程 compose，抽样计时"""
+        for raw_data in raw_stream:
+            if stats.should_sample('compose'):
+                start = time.perf_counter()
+                sample = self._compose(raw_data)
+                stats.record('compose', time.perf_counter() - start)
+            else:
+                sample = self._compose(raw_data)
+                stats.count('compose')
+            yield sample
+
+    def _compose(self, raw_data: Dict) -> Dict:
+        if self.sample_cache is None:
+            return self.composer.compose(raw_data)
+        return compose_with_cache(self.composer, self.sample_cache, raw_data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        流水线统计快照：各阶段 (load/compose/compose_wait/collate) 计数、吞吐与抽样耗时，
+        队列深度 (shuffle_buffer/inflight)，累计读取字节数与 samples/s；未开启统计时返回空字典
+        """
+        if self.pipeline_stats is None:
+            return {}
+        return self.pipeline_stats.snapshot()
+
+    def source_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        多数据源模式下各数据源的权重与实际占比、读取与消费吞吐、队列深度及等待时间，
+        用于定位拖慢整体的存储；单数据源时返回空字典
+        """
+        if not isinstance(self.loader, MultiSourceLoader):
+            return {}
+        return self.loader.source_stats()
+
+    def set_source_weights(self, weights: Dict[str, float]):
+        """运行时调整多数据源的混合权重 {数据源名: 权重}，从下一个样本起生效"""
+        if not isinstance(self.loader, MultiSourceLoader):
+            raise ValueError("set_source_weights 只能用于多数据源模式 (config['sources'])")
+        self.loader.set_weights(weights)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        样本缓存统计：节点级 (所有共享进程累计) 与本进程的命中数、命中率、占用字节数与淘汰数；
+        未开启缓存时返回空字典
+        """
+        if self.sample_cache is None:
+            return {}
+        return self.sample_cache.report()
+
+    def __next__(self) -> Dict:
+        """从持久样本流中取下一个样本"""
+        return next(self._sample_stream())
+
+    def iter_batches(self, drop_last: Optional[bool] = None) -> Iterator[Dict]:
+        """
+        按 batch_size 拼接样本，每个数组字段为预分配、跨 batch 复用的连续数组
+
+        单进程、开启 batch_compose 且未开启样本缓存时整批调用 DataComposer.compose_batch，
+        否则逐样本 compose 后由 BatchCollator 拼接。
+
+        Args:
+            drop_last: 是否丢弃最后不满 batch_size 的 batch，None 时使用配置值
+        """
+        if drop_last is None:
+            drop_last = self.drop_last
+        if self._use_batch_compose:
+            return self._iter_composed_batches(self._raw_stream(), drop_last)
+        return self.collator.batches(iter(self), drop_last=drop_last)
+
+    def next_batch(self) -> Dict:
+        """从持久样本流中取下一个 batch，与 __next__ 共享同一数据流"""
+        if self._batch_stream is None:
+            if self._use_batch_compose:
+                self._batch_stream = self._iter_composed_batches(self._persistent_raw(), self.drop_last)
+            else:
+                self._batch_stream = self.collator.batches(self._sample_stream(), drop_last=self.drop_last)
+        return next(self._batch_stream)
+
+    @property
+    def _use_batch_compose(self) -> bool:
+        # 样本缓存按单个样本读写，与整批 compose 不兼容
+        return self.batch_compose and self.num_workers == 0 and self.sample_cache is None
+
+    def _iter_composed_batches(self, raw_stream: Iterator[Dict], drop_last: bool) -> Iterator[Dict]:
+        """单进程批量 compose：每次取 batch_size 个原始样本整批组合"""
+        stats = self.pipeline_stats
+        while True:
+            raw_batch = list(itertools.islice(raw_stream, self.batch_size))
+            if not raw_batch or (drop_last and len(raw_batch) < self.batch_size):
+                return
+            if stats is None:
+                yield self.composer.compose_batch(raw_batch)
+                continue
+            if stats.should_sample('compose'):
+                start = time.perf_counter()
+                batch = self.composer.compose_batch(raw_batch)
+                stats.record('compose', time.perf_counter() - start, count=len(raw_batch))
+            else:
+                batch = self.composer.compose_batch(raw_batch)
+                stats.count('compose', len(raw_batch))
+            stats.count('samples', len(raw_batch))
+            yield batch
+
+    def set_epoch(self, epoch: int):
+        """设置 epoch，开启分片 shuffle 时决定本轮的分片分配与顺序"""
+        self.loader.set_epoch(epoch)
+
+    def set_sharding(self, **sharding):
+        """按 (rank, world_size, worker_id, num_workers) 只读取分配给当前消费者的分片"""
+        self.loader.set_sharding(**sharding)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        迭代进度快照：存储游标 (epoch, 分片, 字节偏移)、shuffle 缓冲的随机数状态与
+        缓冲内容，以及已预取到 worker 池但尚未输出的原始样本
+
+        使用 next_batch 时应在两个 batch 之间调用；恢复时直接 seek 到游标处，无需重放数据流。
+        """
+        return {
+            'loader': self.loader.state_dict(),
+            'shuffle': self.shuffle_buffer.state_dict() if self.shuffle_buffer is not None else None,
+            'inflight': self._active_pool.pending() if self._active_pool is not None else [],
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """从 state_dict 恢复，下一次迭代从快照位置继续"""
+        self.reset()
+        self.loader.load_state_dict(state['loader'])
+        if self.shuffle_buffer is not None and state.get('shuffle') is not None:
+            self.shuffle_buffer.load_state_dict(state['shuffle'])
+            self._resuming = True
+        self._replay = list(state.get('inflight', []))
+
+    def reset(self):
+        """关闭持久数据流，下次调用 __next__/next_batch 时从头开始"""
+        for stream in (self._batch_stream, self._stream, self._raw_iter):
+            if stream is not None:
+                stream.close()
+        self._stream = None
+        self._batch_stream = None
+        self._raw_iter = None
+
+    def _sample_stream(self) -> Iterator[Dict]:
+        if self._stream is None:
+            self._stream = self._samples(self._persistent_raw())
+        return self._stream
+
+    def _persistent_raw(self) -> Iterator[Dict]:
+        """__next__ 与 next_batch 共享的原始样本流"""
+        if self._raw_iter is None:
+            self._raw_iter = self._raw_stream()
+        return self._raw_iter
+
+    def _raw_stream(self) -> Iterator[Dict]:
+        """LoadStorage 与 DataComposer 之间的原始样本流，按配置经过 shuffle 缓冲"""
+        replay, self._replay = self._replay, []
+        loader = self.loader
+        if self.pipeline_stats is not None:
+            loader = self.pipeline_stats.timed('load', loader)
+        if self.shuffle_buffer is None:
+            stream = iter(loader)
+        else:
+            # 从 checkpoint 恢复时保留已载入的缓冲与随机数状态
+            if not self._resuming:
+                self.shuffle_buffer.set_epoch(self.loader.epoch)
+            self._resuming = False
+            stream = self.shuffle_buffer(loader)
+        yield from itertools.chain(replay, stream)
+
+    def _iter_with_workers(self, raw_stream: Iterator[Dict]) -> Iterator[Dict]:
+        """多进程模式：compose 分发到 worker 池，结果经共享内存回传"""
+        pool = ComposeWorkerPool(
+            self._composer_config,
+            num_workers=self.num_workers,
+            prefetch_factor=self.prefetch_factor,
+            start_method=self.start_method,
+            stats=self.pipeline_stats,
+            sample_cache=self.sample_cache,
+        )
+        with pool:
+            self._active_pool = pool
+            try:
+                yield from pool.imap(raw_stream, ordered=self.ordered)
+            finally:
+                self._active_pool = None
+
     def _init_parameters(self, config: Dict):
         """初始化各种参数，从原实现中迁移过来"""
         # 保持与原版完全相同的参数初始化逻辑
-        self.batch_size = config.get('batch_size', 32)
-        # ... 其他参数
\ No newline at end of file
+        self.batch_size = config.get('batch_size', DEFAULT_BATCH_SIZE)
+        self.drop_last = config.get('drop_last', False)
+        # 单进程时 batch 接口走 DataComposer.compose_batch 向量化路径
+        self.batch_compose = config.get('batch_compose', True)
+        # 流水线统计参数: {'sample_every': ..., 'log_interval': ..., 'dump_path': ...}，False 关闭
+        stats_config = config.get('stats', {})
+        self.pipeline_stats = PipelineStats(**stats_config) if stats_config is not False else None
+        self.collator = BatchCollator(
+            self.batch_size, num_buffers=config.get('collate_buffers', DEFAULT_COLLATE_BUFFERS),
+            stats=self.pipeline_stats)
+        # 流式 shuffle 缓冲参数: {'size': ..., 'seed': ..., 'max_bytes': ...}
+        shuffle_config = config.get('shuffle_buffer')
+        self.shuffle_buffer = ShuffleBuffer(**shuffle_config) if shuffle_config else None
+        # 多进程 compose 参数
+        self.num_workers = config.get('num_workers', DEFAULT_NUM_WORKERS)
+        self.ordered = config.get('ordered', True)
+        self.prefetch_factor = config.get('prefetch_factor', DEFAULT_PREFETCH_FACTOR)
+        self.start_method = config.get('start_method')
+        # 跨 epoch 共享内存样本缓存参数: {'name': ..., 'max_bytes': ..., 'evict': ..., 'persistent': ...}，
+        # True 使用默认参数；缺省名字由 storage 与 composer 配置生成，同节点各 rank 共用
+        cache_config = config.get('sample_cache')
+        self.sample_cache = None
+        if cache_config:
+            cache_config = {} if cache_config is True else dict(cache_config)
+            if not cache_config.get('name'):
+                cache_config['name'] = cache_name(config.get('storage') or config['sources'], config['composer'])
+            self.sample_cache = SampleCache(**cache_config)
+        if self.pipeline_stats is not None:
+            self._register_stats(self.pipeline_stats)
+        # ... 其他参数
+
+    def _register_stats(self, stats: PipelineStats):
+        stats.register_counter('bytes_read', lambda: self.loader.bytes_read)
+        stats.register_counter('records_read', lambda: self.loader.records_read)
+        if self.sample_cache is not None:
+            # 本进程的命中数：缓存查询都在读取存储的进程内完成，多进程 compose 时 worker 只负责写入
+            stats.register_counter('cache_hits', lambda: self.sample_cache.hits)
+            stats.register_counter('cache_misses', lambda: self.sample_cache.misses)
+        if isinstance(self.loader, MultiSourceLoader):
+            for source in self.loader.sources:
+                stats.register_gauge(f'source_queue/{source.name}',
+                                     lambda source=source: source.queue.qsize() if source.queue is not None else 0)
+        if self.shuffle_buffer is not None:
+            stats.register_gauge('shuffle_buffer', lambda: len(self.shuffle_buffer.buffer))
+        if self.num_workers > 0:
+            stats.register_gauge('inflight', lambda: self._active_pool.inflight()
+                                 if self._active_pool is not None else 0)
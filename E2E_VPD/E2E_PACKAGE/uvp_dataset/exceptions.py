@@ -0,0 +1,18 @@
+class UVPDatasetError(Exception):
+    """uvp_dataset 所有异常的基类"""
+
+
+class ComposeWorkerError(UVPDatasetError):
+    """compose worker 进程执行失败或异常退出"""
+
+
+class CollateError(UVPDatasetError):
+    """样本字段缺失或 shape 不一致，无法拼接为 batch"""
+
+
+class StorageError(UVPDatasetError):
+    """存储后端配置错误或读取失败"""
+
+
+class SampleCacheError(UVPDatasetError):
+    """共享内存样本缓存版本不兼容或内容损坏"""
@@ -1,9 +1,644 @@
+import asyncio
+import fnmatch
+import http.client
+import json
+import mmap
+import os
+import queue
+import tarfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from .async_io import AsyncHTTPClient, AsyncLoopThread, aiter_records
+from .constants import (
+    CACHE_LOOKUP_WINDOW,
+    CACHED_SAMPLE_FIELD,
+    DEFAULT_ASYNC_CONCURRENCY,
+    DEFAULT_ASYNC_IO_THREADS,
+    DEFAULT_HTTP_TIMEOUT,
+    DEFAULT_MANIFEST,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_OPEN_FILES,
+    DEFAULT_READ_AHEAD,
+    DEFAULT_TAR_READ_AHEAD,
+    SAMPLE_KEY_FIELD,
+)
+from .exceptions import StorageError
+from .sharding import assign_shards, default_rank, resolve_worker_info
+from .utils.data_utils import decode_record
+
+# 存储类型名 -> 后端类，通过 register_backend 注册
+STORAGE_BACKENDS: Dict[str, type] = {}
+
+
+def register_backend(name: str):
+    """注册存储后端的类装饰器，注册后可通过 config['type'] = name 使用"""
+    def decorator(cls):
+        STORAGE_BACKENDS[name] = cls
+        cls.name = name
+        return cls
+    return decorator
+
+
+def build_backend(config: Dict) -> 'StorageBackend':
+    try:
+        backend_cls = STORAGE_BACKENDS[config['type']]
+    except KeyError:
+        raise StorageError(
+            f"未注册的存储类型: {config['type']}, 可选: {sorted(STORAGE_BACKENDS)}") from None
+    return backend_cls(config)
+
+
+class ShardInfo(NamedTuple):
+    """存储分片：文件、tar 包或对象"""
+    key: str
+    nbytes: int
+
+
+# (分片下标, 读完该记录后在分片内的字节偏移, 记录名, 记录内容)
+Record = Tuple[int, int, str, Any]
+
+
+def sample_key(shard: ShardInfo, name: str) -> str:
+    """样本缓存使用的 key：每个分片一个样本时为分片 key，tar 成员为 {分片路径}/{成员名}"""
+    return name if name == shard.key else f"{shard.key}/{name}"
+
+
+class HandlePool:
+    """线程安全的 LRU 句柄池，超出容量时关闭最久未使用的句柄"""
+
+    def __init__(self, opener: Callable[[str], Any], closer: Callable[[Any], None], max_size: int):
+        self._opener = opener
+        self._closer = closer
+        self._max_size = max(1, max_size)
+        self._handles: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str):
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                return handle
+            try:
+                handle = self._opener(key)
+            except OSError as e:
+                raise StorageError(f"打开 {key} 失败: {e}") from e
+            self._handles[key] = handle
+            while len(self._handles) > self._max_size:
+                _, evicted = self._handles.popitem(last=False)
+                self._closer(evicted)
+            return handle
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                self._closer(handle)
+            self._handles.clear()
+
+
+def _fadvise(fd: int, offset: int, length: int, advice_name: str):
+    advice = getattr(os, advice_name, None)
+    if advice is not None and hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, offset, length, advice)
+
+
+def _scan_files(root: str, pattern: str) -> List[ShardInfo]:
+    """递归列出 root 下匹配 pattern 的文件，按路径排序保证顺序确定"""
+    if not os.path.isdir(root):
+        raise StorageError(f"存储目录不存在: {root}")
+    shards = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(fnmatch.filter(filenames, pattern)):
+            path = os.path.join(dirpath, filename)
+            shards.append(ShardInfo(path, os.path.getsize(path)))
+    return shards
+
+
+class StorageBackend:
+    """
+    存储后端基类
+
+    子类实现 list_shards/iter_shard；iter_records 负责跨分片顺序读取，
+    start=(分片下标, 字节偏移) 可以从任意记录边界继续读。
+    one_record_per_shard 为 True 的后端（每个分片即一个样本）在开启样本缓存时可以跳过已缓存分片的读取。
+    """
+    name = None
+    one_record_per_shard = False
+
+    def __init__(self, config: Dict):
+        self.config = config
+
+    def list_shards(self) -> List[ShardInfo]:
+        raise NotImplementedError
+
+    def iter_shard(self, shard: ShardInfo, start: int = 0) -> Iterator[Tuple[int, str, Any]]:
+        """读取单个分片，产出 (记录结束偏移, 记录名, 内容)；内容只保证在下一次迭代前有效"""
+        raise NotImplementedError
+
+    def iter_records(self, shards: List[ShardInfo], start: Tuple[int, int] = (0, 0)) -> Iterator[Record]:
+        first, offset = start
+        for pos in range(first, len(shards)):
+            self._read_ahead(shards, pos, pos == first)
+            shard_offset = offset if pos == first else 0
+            for next_offset, name, payload in self.iter_shard(shards[pos], shard_offset):
+                yield pos, next_offset, name, payload
+
+    def _read_ahead(self, shards: List[ShardInfo], pos: int, first: bool):
+        """开始读取 shards[pos] 前的预读钩子"""
+
+    async def aread(self, shard: ShardInfo) -> bytes:
+        """io_mode='async' 时读取整个分片；只有每个分片为一个样本的后端支持"""
+        raise StorageError(f"存储类型 {self.name} 不支持 io_mode='async'")
+
+    async def aclose(self):
+        """释放异步读取占用的资源，在事件循环中调用"""
+
+    def close(self):
+        pass
+
+
+@register_backend('local')
+class LocalDirBackend(StorageBackend):
+    """
+    本地/NFS 目录后端：每个文件为一个样本，通过 mmap 读取
+
+    config:
+        root: 数据目录
+        pattern: 文件名通配符，默认 '*'
+        read_ahead: 提前 posix_fadvise(WILLNEED) 的文件数
+        max_open_files: 文件句柄池容量
+    """
+    one_record_per_shard = True
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.root = config['root']
+        self.pattern = config.get('pattern', '*')
+        self.read_ahead = config.get('read_ahead', DEFAULT_READ_AHEAD)
+        self._handles = HandlePool(lambda path: os.open(path, os.O_RDONLY), os.close,
+                                   config.get('max_open_files', DEFAULT_MAX_OPEN_FILES))
+
+    def list_shards(self) -> List[ShardInfo]:
+        return _scan_files(self.root, self.pattern)
+
+    def iter_shard(self, shard: ShardInfo, start: int = 0):
+        if shard.nbytes == 0 or start >= shard.nbytes:
+            return
+        fd = self._handles.acquire(shard.key)
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as view:
+                yield shard.nbytes, shard.key, view
+
+    async def aread(self, shard: ShardInfo) -> bytes:
+        # 文件读取没有原生异步接口，放到事件循环的 IO 线程池中执行
+        return await asyncio.get_running_loop().run_in_executor(None, self._read_file, shard.key)
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        # 多线程并发读取，不走句柄池，避免句柄被其他线程淘汰关闭
+        try:
+            with open(path, 'rb', buffering=0) as f:
+                return f.read()
+        except OSError as e:
+            raise StorageError(f"读取 {path} 失败: {e}") from e
+
+    def _read_ahead(self, shards: List[ShardInfo], pos: int, first: bool):
+        if self.read_ahead <= 0:
+            return
+        # 首次预读整个窗口，之后每个分片只需补上窗口末尾的一个文件
+        lo = pos + 1 if first else pos + self.read_ahead
+        for shard in shards[lo:pos + self.read_ahead + 1]:
+            _fadvise(self._handles.acquire(shard.key), 0, 0, 'POSIX_FADV_WILLNEED')
+
+    def close(self):
+        self._handles.close()
+
+
+@register_backend('tar')
+class TarShardBackend(StorageBackend):
+    """
+    分片 tar 后端：每个 tar 成员为一个样本，整包大块顺序读取
+
+    config:
+        root: tar 分片所在目录
+        pattern: 分片文件名通配符，默认 '*.tar'
+        read_ahead: 顺序读缓冲大小(字节)
+        max_open_files: 文件句柄池容量
+    """
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.root = config['root']
+        self.pattern = config.get('pattern', '*.tar')
+        self.read_ahead = config.get('read_ahead', DEFAULT_TAR_READ_AHEAD)
+        self._handles = HandlePool(lambda path: open(path, 'rb', buffering=self.read_ahead),
+                                   lambda f: f.close(),
+                                   config.get('max_open_files', DEFAULT_MAX_OPEN_FILES))
+
+    def list_shards(self) -> List[ShardInfo]:
+        return _scan_files(self.root, self.pattern)
+
+    def iter_shard(self, shard: ShardInfo, start: int = 0):
+        if start >= shard.nbytes:
+            return
+        f = self._handles.acquire(shard.key)
+        f.seek(start)
+        _fadvise(f.fileno(), start, 0, 'POSIX_FADV_SEQUENTIAL')
+        try:
+            # TarFile 以 fileobj 当前位置作为起点，因此可以从任意成员头部继续读
+            tar = tarfile.open(fileobj=f, mode='r:')
+        except tarfile.ReadError:
+            return
+        while True:
+            info = tar.next()
+            if info is None:
+                break
+            # 不保留成员列表，避免超大分片的元数据常驻内存
+            tar.members = []
+            if not info.isfile():
+                continue
+            payload = tar.extractfile(info).read()
+            blocks = -(-info.size // tarfile.BLOCKSIZE)
+            yield info.offset_data + blocks * tarfile.BLOCKSIZE, info.name, payload
+
+    def close(self):
+        self._handles.close()
+
+
+class HTTPObjectClient:
+    """
+    基于 http.client 的对象存储客户端（兼容静态文件服务器/公开桶）
+
+    对象地址为 {endpoint}/{bucket}/{key}，分片列表从清单文件读取，
+    清单为 [{"key": ..., "size": ...}, ...] 格式的 JSON。
+    """
+
+    def __init__(self, endpoint: str, bucket: str, max_connections: int, timeout: float):
+        parts = urlsplit(endpoint)
+        self._conn_cls = (http.client.HTTPSConnection if parts.scheme == 'https'
+                          else http.client.HTTPConnection)
+        self._host = parts.netloc
+        self._base = f"{parts.path.rstrip('/')}/{bucket}/" if bucket else f"{parts.path.rstrip('/')}/"
+        self._timeout = timeout
+        self._idle: 'queue.LifoQueue[http.client.HTTPConnection]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+
+    def get(self, key: str) -> bytes:
+        with self._slots:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._conn_cls(self._host, timeout=self._timeout), False
+            try:
+                status, body = self._request(conn, key)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if not reused:
+                    raise StorageError(f"读取对象 {key} 失败: {e}") from e
+                # 复用的 keep-alive 连接可能已被服务端关闭，换新连接重试一次
+                conn = self._conn_cls(self._host, timeout=self._timeout)
+                try:
+                    status, body = self._request(conn, key)
+                except (http.client.HTTPException, OSError) as e:
+                    conn.close()
+                    raise StorageError(f"读取对象 {key} 失败: {e}") from e
+            self._idle.put(conn)
+        if status != 200:
+            raise StorageError(f"读取对象 {key} 失败: HTTP {status}")
+        return body
+
+    def _request(self, conn: http.client.HTTPConnection, key: str) -> Tuple[int, bytes]:
+        conn.request('GET', self._base + quote(key))
+        response = conn.getresponse()
+        return response.status, response.read()
+
+    def list(self, prefix: str, manifest: str) -> List[ShardInfo]:
+        entries = json.loads(self.get(prefix + manifest))
+        return [ShardInfo(entry['key'], entry['size']) for entry in entries
+                if entry['key'].startswith(prefix)]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class S3ObjectClient:
+    """基于 boto3 的 S3 客户端，需要安装 uvp_dataset[s3]"""
+
+    def __init__(self, endpoint: str, bucket: str, max_connections: int, timeout: float):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise StorageError("client='s3' 需要安装 boto3: pip install uvp_dataset[s3]") from None
+        self._bucket = bucket
+        self._s3 = boto3.client('s3', endpoint_url=endpoint or None, config=Config(
+            max_pool_connections=max_connections, connect_timeout=timeout, read_timeout=timeout))
+
+    def get(self, key: str) -> bytes:
+        return self._s3.get_object(Bucket=self._bucket, Key=key)['Body'].read()
+
+    def list(self, prefix: str, manifest: str) -> List[ShardInfo]:
+        shards = []
+        for page in self._s3.get_paginator('list_objects_v2').paginate(Bucket=self._bucket, Prefix=prefix):
+            shards.extend(ShardInfo(obj['Key'], obj['Size']) for obj in page.get('Contents', [])
+                          if not obj['Key'].endswith(manifest))
+        return sorted(shards)
+
+    def close(self):
+        pass
+
+
+OBJECT_CLIENTS = {'http': HTTPObjectClient, 's3': S3ObjectClient}
+# io_mode='async' 使用的原生异步客户端；未列出的客户端在 IO 线程池中调用同步 get
+ASYNC_OBJECT_CLIENTS = {'http': AsyncHTTPClient}
+
+
+@register_backend('object')
+class ObjectStoreBackend(StorageBackend):
+    """
+    对象存储后端：每个对象为一个样本，通过连接池并发预取
+
+    config:
+        endpoint: 服务地址，如 http://127.0.0.1:9000
+        bucket: 桶名
+        prefix: 对象 key 前缀
+        client: 'http'（默认）或 's3'
+        manifest: http 客户端使用的分片清单文件名
+        read_ahead: 同时在途的对象请求数
+        max_connections: 连接池容量
+        timeout: 单次请求超时(秒)
+    """
+    one_record_per_shard = True
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.prefix = config.get('prefix', '')
+        self.manifest = config.get('manifest', DEFAULT_MANIFEST)
+        self.read_ahead = max(1, config.get('read_ahead', DEFAULT_READ_AHEAD))
+        client_name = config.get('client', 'http')
+        self._client_args = (config.get('endpoint', ''), config.get('bucket', ''),
+                             config.get('max_connections', DEFAULT_MAX_CONNECTIONS),
+                             config.get('timeout', DEFAULT_HTTP_TIMEOUT))
+        self.client = OBJECT_CLIENTS[client_name](*self._client_args)
+        self._async_client_cls = ASYNC_OBJECT_CLIENTS.get(client_name)
+        self._async_client = None
+
+    def list_shards(self) -> List[ShardInfo]:
+        return self.client.list(self.prefix, self.manifest)
+
+    def iter_shard(self, shard: ShardInfo, start: int = 0):
+        if start == 0 or start < shard.nbytes:
+            yield shard.nbytes, shard.key, self.client.get(shard.key)
+
+    def iter_records(self, shards: List[ShardInfo], start: Tuple[int, int] = (0, 0)) -> Iterator[Record]:
+        first, offset = start
+        if first < len(shards) and offset and offset >= shards[first].nbytes:
+            first += 1
+        positions = iter(range(first, len(shards)))
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.read_ahead)
+        try:
+            # 保持 read_ahead 个请求在途，按分片顺序产出
+            for pos in positions:
+                pending.append((pos, executor.submit(self.client.get, shards[pos].key)))
+                if len(pending) >= self.read_ahead:
+                    break
+            while pending:
+                pos, future = pending.popleft()
+                payload = future.result()
+                next_pos = next(positions, None)
+                if next_pos is not None:
+                    pending.append((next_pos, executor.submit(self.client.get, shards[next_pos].key)))
+                yield pos, shards[pos].nbytes, shards[pos].key, payload
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    async def aread(self, shard: ShardInfo) -> bytes:
+        if self._async_client_cls is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.client.get, shard.key)
+        if self._async_client is None:
+            self._async_client = self._async_client_cls(*self._client_args)
+        return await self._async_client.get(shard.key)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def close(self):
+        self.client.close()
+
+
 class LoadStorage:
     def __init__(self, config: Dict):
         self.storage_type = config['type']
         # 初始化存储后端
-    
+        self.backend = build_backend(config)
+        self.repeat = config.get('repeat', False)
+        # io_mode='async'：后台事件循环保持 concurrency 个读取在途，经同步桥产出记录
+        self.io_mode = config.get('io_mode', 'sync')
+        if self.io_mode not in ('sync', 'async'):
+            raise StorageError(f"io_mode 只能为 'sync' 或 'async', 当前为 {self.io_mode}")
+        self.concurrency = max(1, config.get('concurrency', DEFAULT_ASYNC_CONCURRENCY))
+        self._async_loop = (AsyncLoopThread(config.get('io_threads', DEFAULT_ASYNC_IO_THREADS))
+                            if self.io_mode == 'async' else None)
+        self.shards = self.backend.list_shards()
+        self.epoch = 0
+        self.sharding: Dict[str, Any] = {}
+        # 当前 epoch 内最后一个已产出记录之后的位置 (分片下标, 字节偏移)
+        self._cursor: Tuple[int, int] = (0, 0)
+        self._resume: Optional[Tuple[int, int]] = None
+        # 累计读取量，供统计模块使用
+        self.bytes_read = 0
+        self.records_read = 0
+        self.sample_cache = None
+        self._cache_namespace = ''
+
     def __iter__(self):
         """保持与原版相同的数据加载逻辑"""
+        if not self.shards:
+            return
         while True:
-            yield self._load_next_batch()
\ No newline at end of file
+            yield from self._load_epoch()
+            if not self.repeat:
+                break
+            self.epoch += 1
+            self._cursor = (0, 0)
+
+    def set_sharding(self,
+                     rank: Optional[int] = None,
+                     world_size: Optional[int] = None,
+                     worker_id: Optional[int] = None,
+                     num_workers: Optional[int] = None,
+                     shuffle: bool = False,
+                     seed: int = 0):
+        """
+        设置分布式分片参数，之后每个 epoch 只读取分配给当前消费者的分片
+
+        rank/world_size 缺省时读取 RANK/WORLD_SIZE 环境变量；worker_id/num_workers
+        缺省时在迭代开始时从 torch DataLoader worker 上下文中获取。
+        """
+        env_rank, env_world_size = default_rank()
+        self.sharding = {
+            'rank': env_rank if rank is None else rank,
+            'world_size': env_world_size if world_size is None else world_size,
+            'worker_id': worker_id,
+            'num_workers': num_workers,
+            'shuffle': shuffle,
+            'seed': seed,
+        }
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def set_sample_cache(self, sample_cache, namespace: str = ''):
+        """
+        设置 compose 结果缓存 (SampleCache)
+
+        之后产出的原始样本附带 SAMPLE_KEY_FIELD；已缓存的样本只含 key 与 CACHED_SAMPLE_FIELD（compose 结果），
+        不再解码，每个分片一个样本的后端（local/object）也不再读取对应分片。
+
+        Args:
+            sample_cache: SampleCache，None 关闭
+            namespace: 样本 key 前缀，多个数据源共用一个缓存时区分同名记录
+        """
+        self.sample_cache = sample_cache
+        self._cache_namespace = namespace
+
+    def epoch_shards(self, epoch: Optional[int] = None) -> List[ShardInfo]:
+        """当前消费者在指定 epoch 需要读取的分片（未设置分片参数时为全量）"""
+        if not self.sharding:
+            return self.shards
+        params = dict(self.sharding)
+        params['worker_id'], params['num_workers'] = resolve_worker_info(
+            params['worker_id'], params['num_workers'])
+        return assign_shards(self.shards, epoch=self.epoch if epoch is None else epoch, **params)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """读取进度：epoch 与最后一个已产出记录之后的 (分片下标, 字节偏移)"""
+        return self.state_at(self.epoch, self._cursor)
+
+    @property
+    def cursor(self) -> Tuple[int, int]:
+        """最后一个已产出记录之后的 (分片下标, 字节偏移)"""
+        return self._cursor
+
+    def state_at(self, epoch: int, cursor: Tuple[int, int]) -> Dict[str, Any]:
+        """指定 (epoch, 游标) 对应的 state_dict，供在其他线程中读取的调用方保存已消费位置"""
+        shard_index, offset = cursor
+        shards = self.epoch_shards(epoch)
+        return {
+            'epoch': epoch,
+            'shard_index': shard_index,
+            'offset': offset,
+            'shard_key': shards[shard_index].key if shard_index < len(shards) else None,
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """恢复读取进度，下一次迭代直接从记录的分片和字节偏移处继续"""
+        self.epoch = state['epoch']
+        self._cursor = (state['shard_index'], state['offset'])
+        self._resume = self._cursor
+        shards = self.epoch_shards()
+        if state['shard_key'] is not None and (
+                state['shard_index'] >= len(shards) or shards[state['shard_index']].key != state['shard_key']):
+            raise StorageError(f"分片列表与 checkpoint 不一致，无法从 {state['shard_key']} 恢复")
+
+    def _load_epoch(self) -> Iterator[Dict]:
+        """按分片顺序读取并解码一轮数据"""
+        start, self._resume = self._resume or (0, 0), None
+        shards = self.epoch_shards()
+        if self.sample_cache is not None:
+            yield from self._load_epoch_cached(shards, start)
+            return
+        for pos, next_offset, name, payload in self._iter_records(shards, start):
+            self.bytes_read += len(payload)
+            self.records_read += 1
+            raw_data = decode_record(name, payload)
+            self._cursor = (pos, next_offset)
+            yield raw_data
+
+    def _iter_records(self, shards: List[ShardInfo], start: Tuple[int, int]) -> Iterator[Record]:
+        if self._async_loop is None:
+            return self.backend.iter_records(shards, start)
+        return self._async_loop.iterate(aiter_records(self.backend.aread, shards, start, self.concurrency))
+
+    def _load_epoch_cached(self, shards: List[ShardInfo], start: Tuple[int, int]) -> Iterator[Dict]:
+        """开启样本缓存时的一轮读取：命中的样本直接产出缓存中的 compose 结果"""
+        cache = self.sample_cache
+        if self.backend.one_record_per_shard:
+            records = self._iter_uncached(shards, start)
+        else:
+            # tar 等后端仍需顺序读过整个分片，命中时只省去解码与 compose
+            records = ((pos, next_offset, name, payload, cache.get(self._cache_key(shards[pos], name)))
+                       for pos, next_offset, name, payload in self._iter_records(shards, start))
+        for pos, next_offset, name, payload, sample in records:
+            key = self._cache_key(shards[pos], name)
+            if payload is not None:
+                self.bytes_read += len(payload)
+                self.records_read += 1
+            if sample is None:
+                raw_data = decode_record(name, payload)
+                raw_data[SAMPLE_KEY_FIELD] = key
+            else:
+                raw_data = {SAMPLE_KEY_FIELD: key, CACHED_SAMPLE_FIELD: sample}
+            self._cursor = (pos, next_offset)
+            yield raw_data
+
+    def _cache_key(self, shard: ShardInfo, name: str) -> str:
+        return self._cache_namespace + sample_key(shard, name)
+
+    def _iter_uncached(self, shards: List[ShardInfo],
+                       start: Tuple[int, int]) -> Iterator[Tuple[int, int, str, Any, Optional[Dict]]]:
+        """
+        每个分片一个样本的后端：按窗口检查缓存，只读取未命中的分片（仍保留后端的预读），
+        与命中的分片按原顺序合并，产出 (分片下标, 偏移, 记录名, 内容或 None, 缓存样本或 None)
+        """
+        cache = self.sample_cache
+        first, offset = start
+        if first < len(shards) and offset and offset >= shards[first].nbytes:
+            first += 1
+        for lo in range(first, len(shards), CACHE_LOOKUP_WINDOW):
+            hi = min(lo + CACHE_LOOKUP_WINDOW, len(shards))
+            missing = [pos for pos in range(lo, hi) if self._cache_key(shards[pos], shards[pos].key) not in cache]
+            cache.count_misses(len(missing))
+            missing_set = set(missing)
+            cursor = lo
+            records = self._iter_records([shards[pos] for pos in missing], (0, 0)) if missing else ()
+            for index, next_offset, name, payload in records:
+                pos = missing[index]
+                yield from self._iter_hits(shards, cursor, pos, missing_set)
+                cursor = pos + 1
+                yield pos, next_offset, name, payload, None
+            yield from self._iter_hits(shards, cursor, hi, missing_set)
+
+    def _iter_hits(self, shards: List[ShardInfo], lo: int, hi: int, missing: set):
+        for pos in range(lo, hi):
+            if pos in missing:
+                continue
+            shard = shards[pos]
+            sample = self.sample_cache.get(self._cache_key(shard, shard.key))
+            if sample is not None:
+                yield pos, shard.nbytes, shard.key, None, sample
+                continue
+            # 检查之后被其他进程淘汰，回退为直接读取该分片
+            for next_offset, name, payload in self.backend.iter_shard(shard):
+                yield pos, next_offset, name, payload, None
+
+    def close(self):
+        if self._async_loop is not None:
+            self._async_loop.close(self.backend.aclose)
+        self.backend.close()
@@ -0,0 +1,332 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .constants import DEFAULT_SOURCE_PREFETCH, MIXING_JOIN_TIMEOUT, MIXING_POLL_INTERVAL
+from .load_storage import LoadStorage
+
+logger = logging.getLogger(__name__)
+
+# 数据源读取线程放入队列的结束标记
+_END = object()
+
+# 停止条件
+ALL_EXHAUSTED = 'all_exhausted'
+FIRST_EXHAUSTED = 'first_exhausted'
+
+
+class _Failure:
+    """读取线程中的异常，由消费方重新抛出"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class SourceStats:
+    """单个数据源的读取与消费统计"""
+    __slots__ = ('consumed', 'read_seconds', 'blocked_seconds', 'starved', 'starved_seconds')
+
+    def __init__(self):
+        self.consumed = 0               # 混合输出中来自该数据源的样本数
+        self.read_seconds = 0.0         # 读取线程在存储读取与解码上花费的时间
+        self.blocked_seconds = 0.0      # 读取线程因队列满而等待的时间（数据源快于消费）
+        self.starved = 0                # 轮到该数据源时队列为空的次数
+        self.starved_seconds = 0.0      # 消费方因该数据源队列为空而等待的时间
+
+
+class DataSource:
+    """参与混合的一个数据源：LoadStorage、权重与预取队列"""
+
+    def __init__(self, name: str, storage: Dict, weight: float = 1.0):
+        if weight < 0:
+            raise ValueError(f"数据源 {name} 的权重必须 >= 0, 当前为 {weight}")
+        self.name = name
+        self.loader = LoadStorage(storage)
+        self.weight = float(weight)
+        self.stats = SourceStats()
+        self.queue: Optional[queue.Queue] = None
+        # 最后一个已被混合输出消费的样本之后的位置 (epoch, 游标)
+        self.position = (0, (0, 0))
+
+
+class MultiSourceLoader:
+    """
+    多数据源加权混合读取
+
+    每个数据源一个读取线程，各自按 prefetch 预取到有界队列，互不阻塞；
+    输出顺序由平滑加权轮询 (smooth weighted round-robin) 决定：每一步所有数据源的
+    累计值加上各自权重，取累计值最大者输出并减去权重和，任意长度的输出中各数据源的
+    占比与权重之比的偏差不超过一个样本，且不依赖随机数。
+
+    strict=False（默认）时轮到的数据源队列为空则按累计值顺延给下一个已就绪的数据源，
+    慢数据源的累计值继续增长，就绪后优先补上，长期占比不变；strict=True 时等待该数据源，
+    输出顺序完全确定。接口与 LoadStorage 一致，可直接作为 UVPDataset 的 loader。
+    """
+
+    def __init__(self,
+                 sources: Sequence[Dict],
+                 prefetch: int = DEFAULT_SOURCE_PREFETCH,
+                 strict: bool = False,
+                 stop: str = ALL_EXHAUSTED):
+        """
+        Args:
+            sources: [{'name': ..., 'storage': LoadStorage 配置, 'weight': ...}, ...]，
+                name 缺省为 source{i}；storage 中 repeat=True 的数据源循环读取，不会耗尽
+            prefetch: 每个数据源预取队列的样本数
+            strict: 是否严格按调度顺序输出（数据源未就绪时等待）
+            stop: 'all_exhausted' 所有权重大于 0 的数据源读完后结束（已读完的数据源退出调度）；
+                'first_exhausted' 任一数据源读完即结束
+        """
+        if not sources:
+            raise ValueError("sources 不能为空")
+        if stop not in (ALL_EXHAUSTED, FIRST_EXHAUSTED):
+            raise ValueError(f"stop 只能为 '{ALL_EXHAUSTED}' 或 '{FIRST_EXHAUSTED}', 当前为 {stop}")
+        self.sources: List[DataSource] = [
+            DataSource(config.get('name', f'source{i}'), config['storage'], config.get('weight', 1.0))
+            for i, config in enumerate(sources)]
+        names = [source.name for source in self.sources]
+        if len(set(names)) != len(names):
+            raise ValueError(f"数据源名称重复: {names}")
+        self.prefetch = max(1, prefetch)
+        self.strict = strict
+        self.stop = stop
+        self.epoch = 0
+        # 平滑加权轮询的累计值与本轮已读完的数据源，随 state_dict 保存
+        self._current = {name: 0.0 for name in names}
+        self._exhausted: set = set()
+        self._resuming = False
+        self._ready = threading.Condition()
+        self._start = time.monotonic()
+
+    # ---------- 与 LoadStorage 一致的接口 ----------
+
+    def set_sharding(self, **sharding):
+        for source in self.sources:
+            source.loader.set_sharding(**sharding)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def set_sample_cache(self, sample_cache):
+        # 不同数据源可能有同名记录（如不同桶中的同一 key），按数据源名区分
+        for source in self.sources:
+            source.loader.set_sample_cache(sample_cache, namespace=f'{source.name}:')
+
+    def set_weights(self, weights: Dict[str, float]):
+        """
+        运行时调整混合比例，下一个样本起生效
+
+        Args:
+            weights: {数据源名: 权重}，未列出的数据源保持原权重
+        """
+        by_name = {source.name: source for source in self.sources}
+        for name, weight in weights.items():
+            if name not in by_name:
+                raise ValueError(f"未知的数据源: {name}, 可选: {sorted(by_name)}")
+            if weight < 0:
+                raise ValueError(f"数据源 {name} 的权重必须 >= 0, 当前为 {weight}")
+        for name, weight in weights.items():
+            by_name[name].weight = float(weight)
+
+    @property
+    def weights(self) -> Dict[str, float]:
+        return {source.name: source.weight for source in self.sources}
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(source.loader.bytes_read for source in self.sources)
+
+    @property
+    def records_read(self) -> int:
+        return sum(source.loader.records_read for source in self.sources)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """各数据源已消费的位置（预取但未输出的样本恢复后重新读取）与调度状态"""
+        return {
+            'epoch': self.epoch,
+            'sources': {source.name: source.loader.state_at(*source.position) for source in self.sources},
+            'current': dict(self._current),
+            'exhausted': sorted(self._exhausted),
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.epoch = state['epoch']
+        for source in self.sources:
+            source.loader.load_state_dict(state['sources'][source.name])
+            source.position = (source.loader.epoch, source.loader.cursor)
+        self._current = {source.name: state['current'].get(source.name, 0.0) for source in self.sources}
+        self._exhausted = set(state['exhausted'])
+        self._resuming = True
+
+    def close(self):
+        for source in self.sources:
+            source.loader.close()
+
+    # ---------- 读取 ----------
+
+    def __iter__(self) -> Iterator[Dict]:
+        if not self._resuming:
+            for source in self.sources:
+                source.loader.set_epoch(self.epoch)
+                source.position = (self.epoch, (0, 0))
+            self._current = {source.name: 0.0 for source in self.sources}
+            self._exhausted = set()
+        self._resuming = False
+        stop = threading.Event()
+        threads = []
+        for source in self.sources:
+            source.queue = queue.Queue(maxsize=self.prefetch)
+            if source.name in self._exhausted:
+                continue
+            thread = threading.Thread(target=self._produce, args=(source, stop),
+                                      name=f'uvp-source-{source.name}', daemon=True)
+            thread.start()
+            threads.append(thread)
+        try:
+            yield from self._mix()
+        finally:
+            stop.set()
+            # 清空预取队列，阻塞在 put 上的读取线程可以立即看到停止标记
+            for source in self.sources:
+                while True:
+                    try:
+                        source.queue.get_nowait()
+                    except queue.Empty:
+                        break
+            # 卡在存储读取中的线程不无限等待（daemon 线程，随进程退出）
+            deadline = time.monotonic() + MIXING_JOIN_TIMEOUT
+            for thread in threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+                if thread.is_alive():
+                    logger.warning("数据源读取线程 %s 在 %.1fs 内未退出，可能阻塞在存储读取中",
+                                   thread.name, MIXING_JOIN_TIMEOUT)
+
+    def _produce(self, source: DataSource, stop: threading.Event):
+        """读取线程：按顺序读取数据源并放入预取队列，附带读完该样本后的位置"""
+        stats = source.stats
+        loader = source.loader
+        iterator = iter(loader)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    raw_data = next(iterator)
+                except StopIteration:
+                    item = _END
+                else:
+                    item = (raw_data, loader.epoch, loader.cursor)
+                stats.read_seconds += time.perf_counter() - start
+                if not self._put(source, item, stop) or item is _END:
+                    return
+        except BaseException as e:
+            self._put(source, _Failure(e), stop)
+        finally:
+            iterator.close()
+
+    def _put(self, source: DataSource, item: Any, stop: threading.Event) -> bool:
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                source.queue.put(item, timeout=MIXING_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            source.stats.blocked_seconds += time.perf_counter() - start
+            with self._ready:
+                self._ready.notify()
+            return True
+        return False
+
+    def _active(self) -> List[DataSource]:
+        return [source for source in self.sources
+                if source.weight > 0 and source.name not in self._exhausted]
+
+    def _mix(self) -> Iterator[Dict]:
+        current = self._current
+        while True:
+            active = self._active()
+            if not active:
+                return
+            total = 0.0
+            for source in active:
+                current[source.name] += source.weight
+                total += source.weight
+            # 按累计值从大到小排列，相同时按配置顺序
+            order = sorted(active, key=lambda s: -current[s.name])
+            source, item = self._take(order)
+            current[source.name] -= total
+            # 非 strict 时慢数据源累积的欠账最多补 prefetch 个样本，避免短暂卡顿后集中输出
+            limit = total * self.prefetch
+            for other in active:
+                if current[other.name] > limit:
+                    current[other.name] = limit
+            if item is _END:
+                self._exhausted.add(source.name)
+                if self.stop == FIRST_EXHAUSTED:
+                    return
+                continue
+            if isinstance(item, _Failure):
+                raise item.error
+            raw_data, epoch, cursor = item
+            source.position = (epoch, cursor)
+            source.stats.consumed += 1
+            yield raw_data
+
+    def _take(self, order: List[DataSource]):
+        """从调度顺序中第一个有数据的数据源取出一项；strict 时只取第一个"""
+        first = order[0]
+        candidates = order[:1] if self.strict else order
+        waited = 0.0
+        while True:
+            for source in candidates:
+                try:
+                    item = source.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if source is not first or waited:
+                    first.stats.starved += 1
+                    first.stats.starved_seconds += waited
+                return source, item
+            # 全部未就绪：等待任一读取线程放入数据
+            start = time.perf_counter()
+            with self._ready:
+                if not any(source.queue.qsize() for source in candidates):
+                    self._ready.wait(MIXING_POLL_INTERVAL)
+            waited += time.perf_counter() - start
+
+    # ---------- 统计 ----------
+
+    def source_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各数据源的吞吐与瓶颈指标
+
+        - read_per_sec / read_mb_per_sec: 读取线程自身的读取+解码速度（只计读取耗时），即该存储的能力上限
+        - consumed_per_sec: 实际被混合输出消费的速度；share 为实际占比，target_share 为权重占比
+        - starved / starved_seconds: 轮到该数据源但队列为空的次数与等待时间，持续增长说明它是瓶颈
+        - blocked_seconds: 读取线程因队列已满而等待的时间，越大说明该数据源越富余
+        """
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        total_weight = sum(source.weight for source in self.sources) or 1.0
+        total_consumed = sum(source.stats.consumed for source in self.sources) or 1
+        result = {}
+        for source in self.sources:
+            stats = source.stats
+            read_seconds = max(stats.read_seconds, 1e-9)
+            result[source.name] = {
+                'weight': source.weight,
+                'target_share': source.weight / total_weight,
+                'share': stats.consumed / total_consumed,
+                'consumed': stats.consumed,
+                'consumed_per_sec': stats.consumed / elapsed,
+                'records_read': source.loader.records_read,
+                'bytes_read': source.loader.bytes_read,
+                'read_per_sec': source.loader.records_read / read_seconds,
+                'read_mb_per_sec': source.loader.bytes_read / read_seconds / 2**20,
+                'queue': source.queue.qsize() if source.queue is not None else 0,
+                'starved': stats.starved,
+                'starved_seconds': stats.starved_seconds,
+                'blocked_seconds': stats.blocked_seconds,
+                'exhausted': source.name in self._exhausted,
+            }
+        return result
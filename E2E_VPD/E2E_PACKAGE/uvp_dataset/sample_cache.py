@@ -0,0 +1,421 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .constants import (
+    CACHE_LOCK_DIR,
+    CACHED_SAMPLE_FIELD,
+    DEFAULT_CACHE_BYTES,
+    DEFAULT_CACHE_ENTRY_BYTES,
+    SAMPLE_KEY_FIELD,
+    SHM_ALIGNMENT,
+)
+from .exceptions import SampleCacheError
+from .worker_pool import _align, _packed_size, _shm_arrays, array_layout, pack_arrays, unpack_arrays
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只保证进程内互斥
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = 0x55565043     # 'UVPC'
+_VERSION = 1
+_RECORD_MAGIC = 0x55565052  # 'UVPR'
+_ENTRY = 0
+_PADDING = 1            # 环形区尾部放不下一条记录时的填充
+
+# 段头部字段下标（int64）
+(_H_MAGIC, _H_VERSION, _H_SLOTS, _H_ARENA, _H_HEAD, _H_TAIL, _H_ENTRIES, _H_USED,
+ _H_HITS, _H_MISSES, _H_INSERTS, _H_EVICTIONS, _H_REJECTED) = range(13)
+_HEADER_FIELDS = 16
+_HEADER_BYTES = _HEADER_FIELDS * 8
+# 记录头：magic, 类型, 记录总长, key 哈希, key 长度, 数组区偏移, meta 偏移, meta 长度
+_RECORD = struct.Struct('<IIqqIIII')
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') & 0x7FFFFFFFFFFFFFFF
+
+
+def cache_name(storage_config: Dict, composer_config: Dict) -> str:
+    """由存储与 composer 配置生成缓存名，配置相同的进程（同节点各 rank、各 worker）共用一个缓存"""
+    text = json.dumps({'storage': storage_config, 'composer': composer_config}, sort_keys=True, default=str)
+    return 'uvp_cache_' + hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def compose_with_cache(composer, cache: Optional['SampleCache'], raw_data: Dict) -> Dict:
+    """缓存命中时直接返回缓存结果，否则 compose 并写入缓存"""
+    sample = raw_data.get(CACHED_SAMPLE_FIELD)
+    if sample is not None:
+        return sample
+    sample = composer.compose(raw_data)
+    key = raw_data.get(SAMPLE_KEY_FIELD)
+    if cache is not None and key is not None:
+        cache.put(key, sample)
+    return sample
+
+
+def _open_segment(name: str, create: bool, size: int = 0) -> shared_memory.SharedMemory:
+    """
+    打开不受 resource_tracker 管理的共享内存段
+
+    缓存需要在创建它的进程（如 DataLoader worker）退出后继续存在，
+    默认的 resource_tracker 会在进程树退出时把段删除并报告泄漏。
+    """
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13 没有 track 参数
+        pass
+    segment = shared_memory.SharedMemory(name, create=create, size=size)
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+class SampleCache:
+    """
+    节点级 compose 结果缓存（POSIX 共享内存）
+
+    同一节点上使用相同缓存名的进程（各 rank、各 DataLoader/compose worker）共享一个段：
+    段头部为统计与环形区游标，其后是按样本 key 哈希的开放寻址索引表，最后是环形数据区。
+    每条记录保存 key、对齐排布的数组与 pickle 的其余字段，读取时拷贝出来，
+    之后记录被淘汰也不影响已取出的样本。超出字节预算或索引容量时按写入顺序 (FIFO) 淘汰最旧的记录。
+    所有读写通过 flock 在进程间串行化。
+
+    数据集远大于预算且每个 epoch 顺序相同时，FIFO 淘汰会使每次读取都恰好错过，
+    此时应使用 evict=False：写满后保持已缓存的部分不变，命中率约为 预算 / 数据集大小。
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_bytes: int = DEFAULT_CACHE_BYTES,
+                 entry_bytes: int = DEFAULT_CACHE_ENTRY_BYTES,
+                 evict: bool = True,
+                 persistent: bool = False):
+        """
+        Args:
+            name: 共享内存段名，同节点相同名字的缓存共享内容
+            max_bytes: 段总大小（索引表 + 数据区）；段已存在时以已有段为准
+            entry_bytes: 估算的平均样本大小，索引表按 max_bytes / entry_bytes 条记录分配
+            evict: 空间不足时是否淘汰旧记录；False 时写满后不再写入
+            persistent: 为 False 时创建段的进程退出时删除段；True 时保留给后续任务复用，
+                需要手动调用 unlink
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        self.entry_bytes = max(1, entry_bytes)
+        self.evict = evict
+        self.persistent = persistent
+        # 本进程的命中统计；节点级统计保存在段头部
+        self.hits = 0
+        self.misses = 0
+        lock_dir = CACHE_LOCK_DIR if os.path.isdir(CACHE_LOCK_DIR) else tempfile.gettempdir()
+        self.lock_path = os.path.join(lock_dir, f'{name}.lock')
+        self._shm = None
+        self._lock_fd = None
+        self._pid = None
+        created = self._open()
+        if created and not persistent:
+            atexit.register(self._unlink_at_exit, os.getpid())
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # spawn 方式启动的 worker 按名字重新挂载
+        return {'name': self.name, 'max_bytes': self.max_bytes, 'entry_bytes': self.entry_bytes,
+                'evict': self.evict, 'persistent': True}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(**state)
+
+    # ---------- 段管理 ----------
+
+    def _open(self) -> bool:
+        """挂载或创建共享内存段，返回是否由本进程创建"""
+        created = False
+        with self._locked():
+            try:
+                self._shm = _open_segment(self.name, create=False)
+            except FileNotFoundError:
+                self._shm = _open_segment(self.name, create=True, size=self._segment_bytes())
+                created = True
+            self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._shm.buf)
+            if self._header[_H_MAGIC] != _MAGIC:
+                # 新建的段，或创建者在初始化完成前退出
+                self._init_header()
+            elif self._header[_H_VERSION] != _VERSION:
+                raise SampleCacheError(f"共享内存缓存 {self.name} 版本 {self._header[_H_VERSION]} 不兼容")
+            self._slots = int(self._header[_H_SLOTS])
+            self._arena = int(self._header[_H_ARENA])
+            self._max_entries = self._slots // 2
+            self._table = np.ndarray((self._slots, 2), dtype=np.int64, buffer=self._shm.buf,
+                                     offset=_HEADER_BYTES)
+            self._arena_offset = _align(_HEADER_BYTES + self._table.nbytes)
+        return created
+
+    def _segment_bytes(self) -> int:
+        size = self.max_bytes
+        free = self._free_bytes()
+        if free is not None and size > free:
+            logger.warning("共享内存缓存 %s 预算 %d 字节超过 %s 剩余空间 %d 字节，按剩余空间分配",
+                           self.name, size, CACHE_LOCK_DIR, free)
+            size = free
+        return max(size, _HEADER_BYTES + 4096)
+
+    @staticmethod
+    def _free_bytes() -> Optional[int]:
+        try:
+            stat = os.statvfs(CACHE_LOCK_DIR)
+        except (OSError, AttributeError):
+            return None
+        return stat.f_bavail * stat.f_frsize
+
+    def _init_header(self):
+        size = self._shm.size
+        max_entries = max(16, size // self.entry_bytes)
+        slots = 2 * max_entries
+        # 索引表占用过大时（entry_bytes 设置过小）缩减，至少留一半给数据区
+        slots = min(slots, max(32, size // 2 // 16))
+        table_end = _align(_HEADER_BYTES + slots * 16)
+        arena = (size - table_end) // SHM_ALIGNMENT * SHM_ALIGNMENT
+        if arena <= 0:
+            raise SampleCacheError(f"共享内存缓存 {self.name} 大小 {size} 字节不足以容纳索引表")
+        self._header[:] = 0
+        np.ndarray((slots, 2), dtype=np.int64, buffer=self._shm.buf, offset=_HEADER_BYTES)[:] = 0
+        self._header[_H_VERSION] = _VERSION
+        self._header[_H_SLOTS] = slots
+        self._header[_H_ARENA] = arena
+        # magic 最后写入，作为初始化完成的标记
+        self._header[_H_MAGIC] = _MAGIC
+
+    @contextmanager
+    def _locked(self):
+        """进程内用 Lock，进程间用 flock；fork 出的子进程重新打开锁文件，不与父进程共用文件描述"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread_lock = threading.Lock()
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644) if fcntl else None
+        with self._thread_lock:
+            if self._lock_fd is None:
+                yield
+                return
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def close(self):
+        """解除本进程的挂载，段中内容保留"""
+        if self._shm is None:
+            return
+        # 先释放指向段内存的数组，否则 mmap 无法关闭
+        self._header = self._table = None
+        self._shm.close()
+        self._shm = None
+        if self._lock_fd is not None and self._pid == os.getpid():
+            os.close(self._lock_fd)
+        self._lock_fd = None
+        self._pid = None
+
+    def _unlink_at_exit(self, creator_pid: int):
+        # fork 出的子进程继承了 atexit 登记，只由创建者删除
+        if os.getpid() == creator_pid:
+            self.unlink()
+
+    def unlink(self):
+        """删除共享内存段；已挂载的进程仍可访问到各自关闭为止"""
+        self.close()
+        try:
+            # 普通方式挂载后 unlink，resource_tracker 的登记与注销配对
+            segment = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return
+        segment.close()
+        segment.unlink()
+
+    # ---------- 读写 ----------
+
+    def get(self, key: str) -> Optional[Dict]:
+        """按 key 读取样本（拷贝），未命中返回 None"""
+        key_bytes = key.encode()
+        with self._locked():
+            pos = self._find(_key_hash(key_bytes), key_bytes)
+            if pos is None:
+                self._header[_H_MISSES] += 1
+                self.misses += 1
+                return None
+            base = self._arena_offset + pos % self._arena
+            _, _, _, _, _, data_offset, meta_offset, meta_len = _RECORD.unpack_from(self._shm.buf, base)
+            keys, layout, extras = pickle.loads(
+                self._shm.buf[base + meta_offset:base + meta_offset + meta_len])
+            arrays = unpack_arrays(layout, self._shm.buf[base + data_offset:base + meta_offset])
+            self._header[_H_HITS] += 1
+            self.hits += 1
+        return {key: arrays[key] if key in arrays else extras[key] for key in keys}
+
+    def __contains__(self, key: str) -> bool:
+        """只检查是否存在，不计入命中统计"""
+        key_bytes = key.encode()
+        with self._locked():
+            return self._find(_key_hash(key_bytes), key_bytes) is not None
+
+    def count_misses(self, n: int):
+        """记录 n 次未命中（调用方已用 in 检查过时使用）"""
+        if n:
+            with self._locked():
+                self._header[_H_MISSES] += n
+            self.misses += n
+
+    def put(self, key: str, sample: Dict) -> bool:
+        """
+        写入样本，key 已存在时不覆盖
+
+        Returns:
+            bool: 缓存中是否有该 key（单条记录超过数据区一半、或 evict=False 且空间不足时为 False）
+        """
+        arrays = _shm_arrays(sample)
+        layout = array_layout(arrays)
+        extras = {name: value for name, value in sample.items() if name not in arrays}
+        meta = pickle.dumps((list(sample), layout, extras), protocol=pickle.HIGHEST_PROTOCOL)
+        key_bytes = key.encode()
+        key_hash = _key_hash(key_bytes)
+        data_offset = _align(_RECORD.size + len(key_bytes))
+        meta_offset = data_offset + _packed_size(arrays)
+        size = _align(meta_offset + len(meta))
+        with self._locked():
+            if self._find(key_hash, key_bytes) is not None:
+                return True
+            pos = self._reserve(size) if size <= self._arena // 2 else None
+            if pos is None:
+                self._header[_H_REJECTED] += 1
+                return False
+            base = self._arena_offset + pos % self._arena
+            buf = self._shm.buf
+            _RECORD.pack_into(buf, base, _RECORD_MAGIC, _ENTRY, size, key_hash,
+                              len(key_bytes), data_offset, meta_offset, len(meta))
+            buf[base + _RECORD.size:base + _RECORD.size + len(key_bytes)] = key_bytes
+            pack_arrays(arrays, buf[base + data_offset:base + meta_offset])
+            buf[base + meta_offset:base + meta_offset + len(meta)] = meta
+            # 数据写完后再登记索引与游标
+            self._insert(key_hash, pos)
+            header = self._header
+            header[_H_HEAD] = pos + size
+            header[_H_ENTRIES] += 1
+            header[_H_USED] += size
+            header[_H_INSERTS] += 1
+        return True
+
+    def _reserve(self, size: int) -> Optional[int]:
+        """在环形区末尾分配 size 字节，返回记录的逻辑位置；需要时淘汰最旧的记录"""
+        header = self._header
+        while True:
+            head, tail = int(header[_H_HEAD]), int(header[_H_TAIL])
+            offset = head % self._arena
+            # 记录不跨越环形区末尾，放不下时从头开始
+            skip = self._arena - offset if offset + size > self._arena else 0
+            if head + skip + size - tail <= self._arena and header[_H_ENTRIES] < self._max_entries:
+                break
+            if not self.evict or tail == head:
+                return None
+            self._evict_oldest()
+        if skip:
+            _RECORD.pack_into(self._shm.buf, self._arena_offset + offset, _RECORD_MAGIC, _PADDING,
+                              skip, 0, 0, 0, 0, 0)
+            header[_H_HEAD] = head + skip
+        return head + skip
+
+    def _evict_oldest(self):
+        header = self._header
+        tail = int(header[_H_TAIL])
+        magic, kind, size, key_hash, *_ = _RECORD.unpack_from(
+            self._shm.buf, self._arena_offset + tail % self._arena)
+        if magic != _RECORD_MAGIC:
+            raise SampleCacheError(f"共享内存缓存 {self.name} 在位置 {tail} 处的记录损坏")
+        if kind == _ENTRY:
+            self._remove(key_hash, tail)
+            header[_H_ENTRIES] -= 1
+            header[_H_USED] -= size
+            header[_H_EVICTIONS] += 1
+        header[_H_TAIL] = tail + size
+
+    # ---------- 索引表（线性探测，槽位为 [key 哈希, 逻辑位置 + 1]，0 表示空槽） ----------
+
+    def _key_at(self, pos: int) -> bytes:
+        base = self._arena_offset + pos % self._arena
+        key_len = _RECORD.unpack_from(self._shm.buf, base)[4]
+        return bytes(self._shm.buf[base + _RECORD.size:base + _RECORD.size + key_len])
+
+    def _find(self, key_hash: int, key_bytes: bytes) -> Optional[int]:
+        table = self._table
+        index = key_hash % self._slots
+        while True:
+            slot_hash, slot_pos = table.item(index, 0), table.item(index, 1)
+            if slot_pos == 0:
+                return None
+            # 哈希相同时比较记录中的完整 key
+            if slot_hash == key_hash and self._key_at(slot_pos - 1) == key_bytes:
+                return slot_pos - 1
+            index = (index + 1) % self._slots
+
+    def _insert(self, key_hash: int, pos: int):
+        table = self._table
+        index = key_hash % self._slots
+        while table.item(index, 1) != 0:
+            index = (index + 1) % self._slots
+        table[index] = (key_hash, pos + 1)
+
+    def _remove(self, key_hash: int, pos: int):
+        """删除槽位并把后续探测链上的条目前移，保持无墓碑的线性探测"""
+        table = self._table
+        slots = self._slots
+        index = key_hash % slots
+        while table.item(index, 1) != pos + 1:
+            if table.item(index, 1) == 0:
+                raise SampleCacheError(f"共享内存缓存 {self.name} 索引缺少位置 {pos} 的记录")
+            index = (index + 1) % slots
+        hole = index
+        while True:
+            index = (index + 1) % slots
+            if table.item(index, 1) == 0:
+                break
+            home = table.item(index, 0) % slots
+            # home 不在 (hole, index] 区间内时，该条目可以前移到空位
+            if (hole < index and not hole < home <= index) or (hole > index and index < home <= hole):
+                table[hole] = table[index]
+                hole = index
+        table[hole] = 0
+
+    # ---------- 统计 ----------
+
+    def report(self) -> Dict[str, Any]:
+        """节点级（所有共享进程累计）与本进程的命中统计"""
+        with self._locked():
+            header = [int(value) for value in self._header]
+        lookups = header[_H_HITS] + header[_H_MISSES]
+        local_lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'capacity_bytes': header[_H_ARENA],
+            'used_bytes': header[_H_USED],
+            'entries': header[_H_ENTRIES],
+            'hits': header[_H_HITS],
+            'misses': header[_H_MISSES],
+            'hit_rate': header[_H_HITS] / lookups if lookups else 0.0,
+            'inserts': header[_H_INSERTS],
+            'evictions': header[_H_EVICTIONS],
+            'rejected': header[_H_REJECTED],
+            'local_hits': self.hits,
+            'local_misses': self.misses,
+            'local_hit_rate': self.hits / local_lookups if local_lookups else 0.0,
+        }
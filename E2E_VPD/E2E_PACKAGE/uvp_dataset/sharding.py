@@ -0,0 +1,85 @@
+import heapq
+import os
+import random
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .load_storage import ShardInfo
+
+
+def balance_shards(shards: Sequence['ShardInfo'], num_parts: int) -> List[List['ShardInfo']]:
+    """
+    按字节数把分片均衡划分为 num_parts 份（最长处理时间优先的贪心算法）
+
+    结果只取决于分片列表本身，所有 rank/worker 独立计算也能得到同一划分。
+    """
+    if num_parts < 1:
+        raise ValueError(f"num_parts 必须 >= 1, 当前为 {num_parts}")
+    parts: List[List['ShardInfo']] = [[] for _ in range(num_parts)]
+    heap = [(0, part) for part in range(num_parts)]
+    for shard in sorted(shards, key=lambda s: (-s.nbytes, s.key)):
+        load, part = heapq.heappop(heap)
+        parts[part].append(shard)
+        heapq.heappush(heap, (load + shard.nbytes, part))
+    # 每份内部恢复原始顺序，保持顺序读取的局部性
+    order = {shard.key: i for i, shard in enumerate(shards)}
+    for part in parts:
+        part.sort(key=lambda s: order[s.key])
+    return parts
+
+
+def resolve_worker_info(worker_id: Optional[int] = None,
+                        num_workers: Optional[int] = None) -> Tuple[int, int]:
+    """未显式指定时，从 torch DataLoader 的 worker 上下文中获取 worker id"""
+    if worker_id is not None and num_workers is not None:
+        return worker_id, num_workers
+    try:
+        from torch.utils.data import get_worker_info
+    except ImportError:
+        return worker_id or 0, num_workers or 1
+    info = get_worker_info()
+    if info is None:
+        return worker_id or 0, num_workers or 1
+    return info.id, info.num_workers
+
+
+def assign_shards(shards: Sequence['ShardInfo'],
+                  rank: int = 0,
+                  world_size: int = 1,
+                  worker_id: int = 0,
+                  num_workers: int = 1,
+                  epoch: int = 0,
+                  seed: int = 0,
+                  shuffle: bool = False) -> List['ShardInfo']:
+    """
+    返回 (rank, worker_id) 在给定 epoch 应读取的分片，不同消费者之间互不重叠
+
+    Args:
+        shards: 全量分片列表
+        rank, world_size: 分布式 rank 与总数
+        worker_id, num_workers: 当前 rank 内的 dataloader worker
+        epoch, seed: shuffle=True 时用于确定性重排
+        shuffle: 每个 epoch 重新分配各消费者负责的分片组，并打乱组内顺序
+    """
+    if not 0 <= rank < world_size:
+        raise ValueError(f"rank={rank} 不在 [0, {world_size}) 范围内")
+    if not 0 <= worker_id < num_workers:
+        raise ValueError(f"worker_id={worker_id} 不在 [0, {num_workers}) 范围内")
+    num_parts = world_size * num_workers
+    part = rank * num_workers + worker_id
+    parts = balance_shards(shards, num_parts)
+    if not shuffle:
+        return parts[part]
+
+    # 所有消费者使用相同的 (seed, epoch) 种子，得到同一个置换，保证仍然互不重叠
+    rng = random.Random(seed * 1000003 + epoch)
+    mapping = list(range(num_parts))
+    rng.shuffle(mapping)
+    assigned = list(parts[mapping[part]])
+    random.Random(f"{seed}-{epoch}-{part}").shuffle(assigned)
+    return assigned
+
+
+def default_rank() -> Tuple[int, int]:
+    """从 torchrun/slurm 风格的环境变量中读取 (rank, world_size)"""
+    return int(os.environ.get('RANK', 0)), int(os.environ.get('WORLD_SIZE', 1))
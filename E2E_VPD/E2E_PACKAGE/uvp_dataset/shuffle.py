@@ -0,0 +1,85 @@
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+def estimate_nbytes(raw_data: Any) -> int:
+    """粗略估算原始样本占用的内存（数组与字节串为主，其余忽略）"""
+    if isinstance(raw_data, np.ndarray):
+        return raw_data.nbytes
+    if isinstance(raw_data, (bytes, bytearray, memoryview)):
+        return len(raw_data)
+    if isinstance(raw_data, dict):
+        return sum(estimate_nbytes(value) for value in raw_data.values())
+    if isinstance(raw_data, (list, tuple)):
+        return sum(estimate_nbytes(value) for value in raw_data)
+    return 0
+
+
+class ShuffleBuffer:
+    """
+    流式 shuffle 缓冲（水塘式）
+
+    先填满缓冲，之后每放入一个新样本就随机换出缓冲中的一个样本；数据流结束后
+    把剩余样本打乱输出。缓冲同时受样本数 size 与内存预算 max_bytes 限制，
+    随机数只依赖 (seed, epoch)，结果可复现。
+    """
+
+    def __init__(self, size: int, seed: int = 0, max_bytes: Optional[int] = None):
+        if size < 1:
+            raise ValueError(f"size 必须 >= 1, 当前为 {size}")
+        self.size = size
+        self.seed = seed
+        self.max_bytes = max_bytes
+        self.set_epoch(0)
+
+    def set_epoch(self, epoch: int):
+        """按 (seed, epoch) 重置随机数并清空缓冲"""
+        self.epoch = epoch
+        self.rng = random.Random(f"{self.seed}-{epoch}")
+        self.buffer: List[Any] = []
+        self._sizes: List[int] = []
+        self.buffered_bytes = 0
+
+    def state_dict(self) -> Dict[str, Any]:
+        """随机数状态与缓冲中尚未输出的样本"""
+        return {
+            'epoch': self.epoch,
+            'rng_state': self.rng.getstate(),
+            'buffer': list(self.buffer),
+            'sizes': list(self._sizes),
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.epoch = state['epoch']
+        version, internal, gauss = state['rng_state']
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.buffer = list(state['buffer'])
+        self._sizes = list(state['sizes'])
+        self.buffered_bytes = sum(self._sizes)
+
+    def __call__(self, source: Iterable[Dict]) -> Iterator[Dict]:
+        for item in source:
+            # 先放入缓冲再换出，保证任意时刻已读取的样本要么已输出、要么在缓冲中
+            nbytes = estimate_nbytes(item) if self.max_bytes is not None else 0
+            self.buffer.append(item)
+            self._sizes.append(nbytes)
+            self.buffered_bytes += nbytes
+            while self._over_budget():
+                yield self._pop(self.rng.randrange(len(self.buffer)))
+        while self.buffer:
+            yield self._pop(self.rng.randrange(len(self.buffer)))
+
+    def _over_budget(self) -> bool:
+        if len(self.buffer) > self.size:
+            return True
+        return (self.max_bytes is not None and len(self.buffer) > 1
+                and self.buffered_bytes > self.max_bytes)
+
+    def _pop(self, index: int) -> Any:
+        # 与末尾交换后弹出，O(1) 删除
+        self.buffer[index], self.buffer[-1] = self.buffer[-1], self.buffer[index]
+        self._sizes[index], self._sizes[-1] = self._sizes[-1], self._sizes[index]
+        self.buffered_bytes -= self._sizes.pop()
+        return self.buffer.pop()
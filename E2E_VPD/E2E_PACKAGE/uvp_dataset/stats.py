@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .constants import DEFAULT_STATS_SAMPLE_EVERY
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """单个阶段的计数与抽样耗时"""
+    __slots__ = ('count', 'sampled', 'sampled_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+        self.sampled_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float, count: int = 1):
+        self.count += count
+        self.sampled += count
+        self.sampled_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+
+class GaugeStats:
+    """队列深度等瞬时量：在抽样点读取，记录当前值、均值与最大值"""
+    __slots__ = ('fn', 'current', 'total', 'samples', 'max')
+
+    def __init__(self, fn: Callable[[], int]):
+        self.fn = fn
+        self.current = 0
+        self.total = 0
+        self.samples = 0
+        self.max = 0
+
+    def sample(self):
+        value = self.fn()
+        self.current = value
+        self.total += value
+        self.samples += 1
+        if value > self.max:
+            self.max = value
+
+
+class PipelineStats:
+    """
+    uvp_dataset 流水线的低开销统计
+
+    每个阶段的样本数全部计数，耗时只对每 sample_every 个样本抽样计时，
+    阶段总耗时按抽样均值外推。可选按 log_interval 秒周期性打日志或写 JSON 文件。
+    """
+
+    def __init__(self,
+                 sample_every: int = DEFAULT_STATS_SAMPLE_EVERY,
+                 log_interval: Optional[float] = None,
+                 dump_path: Optional[str] = None):
+        self.sample_every = max(1, sample_every)
+        self.log_interval = log_interval
+        self.dump_path = dump_path
+        self.stages: Dict[str, StageStats] = {}
+        self.gauges: Dict[str, GaugeStats] = {}
+        self.counters: Dict[str, Callable[[], int]] = {}
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    def stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    def should_sample(self, name: str) -> bool:
+        return self.stage(name).count % self.sample_every == 0
+
+    def count(self, name: str, n: int = 1):
+        self.stage(name).count += n
+
+    def record(self, name: str, seconds: float, count: int = 1):
+        """记录一次计时结果，同时在抽样点读取队列深度并检查是否需要周期输出"""
+        self.stage(name).add(seconds, count)
+        for gauge in self.gauges.values():
+            gauge.sample()
+        if self.log_interval is not None and time.monotonic() - self._last_report >= self.log_interval:
+            self.report()
+
+    def observe(self, name: str, seconds: float):
+        """已经计时的事件：抽样点完整记录，其余只计数"""
+        if self.should_sample(name):
+            self.record(name, seconds)
+        else:
+            self.stage(name).count += 1
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        """包装迭代器，对抽样到的 next() 计时"""
+        iterator = iter(iterable)
+        stats = self.stage(name)
+        while True:
+            if stats.count % self.sample_every:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stats.count += 1
+            else:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                self.record(name, time.perf_counter() - start)
+            yield item
+
+    def register_gauge(self, name: str, fn: Callable[[], int]):
+        self.gauges[name] = GaugeStats(fn)
+
+    def register_counter(self, name: str, fn: Callable[[], int]):
+        """注册由其他组件维护的累计量（如读取字节数），在快照时读取"""
+        self.counters[name] = fn
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        stages = {}
+        for name, stats in self.stages.items():
+            mean = stats.sampled_seconds / stats.sampled if stats.sampled else 0.0
+            stages[name] = {
+                'count': stats.count,
+                'per_sec': stats.count / elapsed,
+                'mean_ms': mean * 1e3,
+                'max_ms': stats.max_seconds * 1e3,
+                'est_total_s': mean * stats.count,
+            }
+        counters = {name: fn() for name, fn in self.counters.items()}
+        snapshot = {
+            'elapsed_s': elapsed,
+            'stages': stages,
+            'gauges': {
+                name: {
+                    'current': gauge.current,
+                    'mean': gauge.total / gauge.samples if gauge.samples else 0.0,
+                    'max': gauge.max,
+                }
+                for name, gauge in self.gauges.items()
+            },
+            'counters': counters,
+        }
+        if 'bytes_read' in counters:
+            snapshot['read_mb_per_sec'] = counters['bytes_read'] / elapsed / 2**20
+        if 'samples' in stages:
+            snapshot['samples_per_sec'] = stages['samples']['per_sec']
+        return snapshot
+
+    def report(self) -> Dict[str, Any]:
+        """输出一次统计：写日志，配置了 dump_path 时原子写入 JSON"""
+        self._last_report = time.monotonic()
+        snapshot = self.snapshot()
+        logger.info("uvp_dataset 吞吐: %.1f samples/s, %s", snapshot.get('samples_per_sec', 0.0),
+                    ", ".join(f"{name}={stage['mean_ms']:.3f}ms" for name, stage in snapshot['stages'].items()))
+        if self.dump_path:
+            tmp_path = f"{self.dump_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, self.dump_path)
+        return snapshot
+
+    def reset(self):
+        # 原地清零，已包装的迭代器持有的 StageStats 引用仍然有效
+        for stats in self.stages.values():
+            stats.__init__()
+        for gauge in self.gauges.values():
+            gauge.__init__(gauge.fn)
+        self._start = time.monotonic()
+        self._last_report = self._start
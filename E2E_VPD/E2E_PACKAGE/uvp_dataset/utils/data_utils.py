@@ -0,0 +1,27 @@
+import io
+import json
+import pickle
+from typing import Any, Dict
+
+import numpy as np
+
+from ..exceptions import StorageError
+
+
+def decode_record(name: str, payload) -> Dict[str, Any]:
+    """
+    按文件后缀把存储中读出的字节解码为原始样本字典
+
+    Args:
+        name: 记录名（文件名、tar 成员名或对象 key）
+        payload: bytes 或 memoryview
+    """
+    suffix = name.rsplit('.', 1)[-1].lower()
+    if suffix in ('pkl', 'pickle'):
+        return pickle.loads(payload)
+    if suffix == 'npz':
+        with np.load(io.BytesIO(payload)) as arrays:
+            return {key: arrays[key] for key in arrays.files}
+    if suffix == 'json':
+        return json.loads(bytes(payload))
+    raise StorageError(f"无法识别的记录格式: {name}")
@@ -0,0 +1,277 @@
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .constants import (
+    CACHED_SAMPLE_FIELD,
+    DEFAULT_PREFETCH_FACTOR,
+    DEFAULT_SLOT_BYTES,
+    SAMPLE_KEY_FIELD,
+    SHM_ALIGNMENT,
+    WORKER_POLL_INTERVAL,
+)
+from .data_composer import DataComposer
+from .exceptions import ComposeWorkerError
+from .stats import PipelineStats
+
+# 结果消息中的槽位标记
+_PICKLED = -1     # 结果无法放入共享内存，直接通过队列 pickle 回传
+_FAILED = -2      # compose 抛出异常，payload 为 traceback 字符串
+
+Layout = List[Tuple[str, int, Tuple[int, ...], str]]
+
+
+def _align(offset: int) -> int:
+    return (offset + SHM_ALIGNMENT - 1) // SHM_ALIGNMENT * SHM_ALIGNMENT
+
+
+def _shm_arrays(sample: Dict) -> Dict[str, np.ndarray]:
+    """挑出可以放入共享内存的数组字段（排除 object dtype）"""
+    return {key: value for key, value in sample.items()
+            if isinstance(value, np.ndarray) and not value.dtype.hasobject}
+
+
+def _packed_size(arrays: Dict[str, np.ndarray]) -> int:
+    size = 0
+    for value in arrays.values():
+        size = _align(size) + value.nbytes
+    return size
+
+
+def array_layout(arrays: Dict[str, np.ndarray]) -> Layout:
+    """数组依次对齐排布时的 (key, offset, shape, dtype) 布局"""
+    layout = []
+    offset = 0
+    for key, value in arrays.items():
+        offset = _align(offset)
+        layout.append((key, offset, value.shape, value.dtype.str))
+        offset += value.nbytes
+    return layout
+
+
+def pack_arrays(arrays: Dict[str, np.ndarray], buf) -> Layout:
+    """把数组依次写入 buf，返回 (key, offset, shape, dtype) 布局"""
+    layout = array_layout(arrays)
+    for (_, offset, shape, dtype), value in zip(layout, arrays.values()):
+        np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)[...] = value
+    return layout
+
+
+def unpack_arrays(layout: Layout, buf) -> Dict[str, np.ndarray]:
+    """按布局从 buf 中拷贝出数组（拷贝后即可释放共享内存槽）"""
+    return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset).copy()
+            for key, offset, shape, dtype in layout}
+
+
+def _worker_loop(composer_config: Dict, task_queue, result_queue, free_slots, slots, sample_cache=None):
+    """worker 进程主循环：compose 后把数组写入空闲的共享内存槽，开启样本缓存时同时写入缓存"""
+    composer = DataComposer(composer_config)
+    slot_bytes = slots[0].size if slots else 0
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        seq, raw_data = task
+        start = time.perf_counter()
+        try:
+            sample = composer.compose(raw_data)
+        except Exception:
+            result_queue.put((seq, _FAILED, traceback.format_exc(), 0.0))
+            continue
+        seconds = time.perf_counter() - start
+        if sample_cache is not None and SAMPLE_KEY_FIELD in raw_data:
+            sample_cache.put(raw_data[SAMPLE_KEY_FIELD], sample)
+
+        arrays = _shm_arrays(sample)
+        if not arrays or _packed_size(arrays) > slot_bytes:
+            result_queue.put((seq, _PICKLED, sample, seconds))
+            continue
+
+        slot = free_slots.get()
+        layout = pack_arrays(arrays, slots[slot].buf)
+        extras = {key: value for key, value in sample.items() if key not in arrays}
+        result_queue.put((seq, slot, (list(sample), layout, extras), seconds))
+
+
+class ComposeWorkerPool:
+    """
+    多进程 DataComposer.compose 执行池
+
+    原始数据通过任务队列分发给 N 个 worker；compose 结果中的数组写入预分配的
+    共享内存槽，只有布局描述通过队列回传，避免大数组的 pickle 开销。
+    """
+
+    def __init__(self,
+                 composer_config: Dict,
+                 num_workers: int,
+                 prefetch_factor: int = DEFAULT_PREFETCH_FACTOR,
+                 slot_bytes: int = DEFAULT_SLOT_BYTES,
+                 start_method: Optional[str] = None,
+                 stats: Optional[PipelineStats] = None,
+                 sample_cache=None):
+        """
+        Args:
+            composer_config: 传给每个 worker 中 DataComposer 的配置
+            num_workers: worker 进程数
+            prefetch_factor: 每个 worker 的在途任务数
+            slot_bytes: 单个共享内存槽的大小，超出的结果回退为 pickle 传输
+            start_method: multiprocessing 启动方式，None 为平台默认
+            stats: 可选的统计对象，记录 worker 内 compose 耗时与等待结果的耗时
+            sample_cache: 可选的 SampleCache，worker 把 compose 结果写入缓存，
+                已命中缓存的样本不再分发给 worker
+        """
+        if num_workers < 1:
+            raise ValueError(f"num_workers 必须 >= 1, 当前为 {num_workers}")
+        self.composer_config = composer_config
+        self.num_workers = num_workers
+        self.max_inflight = num_workers * max(1, prefetch_factor)
+        self.slot_bytes = slot_bytes
+        self._ctx = mp.get_context(start_method)
+        self.stats = stats
+        self.sample_cache = sample_cache
+        self._slots: List[shared_memory.SharedMemory] = []
+        self._workers: List[Any] = []
+        self._started = False
+        # 已提交但尚未输出的原始样本，用于 checkpoint 时保存预取进度
+        self._pending_raw: Dict[int, Dict] = {}
+
+    def start(self) -> 'ComposeWorkerPool':
+        if self._started:
+            return self
+        # 槽位数与在途任务数一致，保证 worker 不会因等待空槽而饿死
+        self._slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                       for _ in range(self.max_inflight)]
+        self._task_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._free_slots = self._ctx.Queue()
+        for slot in range(len(self._slots)):
+            self._free_slots.put(slot)
+        for _ in range(self.num_workers):
+            worker = self._ctx.Process(
+                target=_worker_loop,
+                args=(self.composer_config, self._task_queue, self._result_queue,
+                      self._free_slots, self._slots, self.sample_cache),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        self._started = True
+        return self
+
+    def close(self):
+        """停止 worker 并释放共享内存"""
+        if not self._started:
+            return
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=WORKER_POLL_INTERVAL)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for q in (self._task_queue, self._result_queue, self._free_slots):
+            q.cancel_join_thread()
+            q.close()
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._workers = []
+        self._slots = []
+        self._started = False
+
+    def __enter__(self) -> 'ComposeWorkerPool':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def imap(self, raw_iter: Iterable[Dict], ordered: bool = True) -> Iterator[Dict]:
+        """
+        并行 compose raw_iter 中的样本
+
+        Args:
+            raw_iter: 原始样本迭代器（如 LoadStorage）
+            ordered: True 时按输入顺序输出；False 时按完成顺序输出，吞吐更高
+        """
+        self.start()
+        self._pending_raw = {}
+        source = iter(raw_iter)
+        exhausted = False
+        submitted = 0       # 已提交任务数
+        received = 0        # 已收到结果数
+        yielded = 0         # 有序模式下已输出的样本数
+        reorder: Dict[int, Dict] = {}
+        hits: Deque[Tuple[int, Dict]] = deque()    # 命中缓存、无需 compose 的样本
+
+        while True:
+            # 有序模式按窗口限流，避免慢样本导致重排缓冲无限增长
+            in_window = submitted - yielded if ordered else submitted - received
+            while not exhausted and in_window < self.max_inflight:
+                try:
+                    raw_data = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                cached = raw_data.get(CACHED_SAMPLE_FIELD) if self.sample_cache is not None else None
+                if cached is None:
+                    self._task_queue.put((submitted, raw_data))
+                else:
+                    hits.append((submitted, cached))
+                self._pending_raw[submitted] = raw_data
+                submitted += 1
+                in_window += 1
+
+            if received == submitted:
+                return
+
+            seq, sample = hits.popleft() if hits else self._next_result()
+            received += 1
+            if not ordered:
+                del self._pending_raw[seq]
+                yield sample
+                continue
+            reorder[seq] = sample
+            while yielded in reorder:
+                del self._pending_raw[yielded]
+                yield reorder.pop(yielded)
+                yielded += 1
+
+    def pending(self) -> List[Dict]:
+        """已从上游取出但尚未输出的原始样本（按提交顺序）"""
+        return [self._pending_raw[seq] for seq in sorted(self._pending_raw)]
+
+    def inflight(self) -> int:
+        """已提交给 worker 但尚未输出的样本数"""
+        return len(self._pending_raw)
+
+    def _next_result(self) -> Tuple[int, Dict]:
+        wait_start = time.perf_counter()
+        while True:
+            try:
+                seq, slot, payload, seconds = self._result_queue.get(timeout=WORKER_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                dead = [w.exitcode for w in self._workers if not w.is_alive()]
+                if dead:
+                    raise ComposeWorkerError(f"compose worker 异常退出, exitcode={dead}")
+
+        if self.stats is not None:
+            # worker 内每个样本都已计时；父进程等待时间反映 compose 是否为瓶颈
+            self.stats.stage('compose').add(seconds)
+            self.stats.observe('compose_wait', time.perf_counter() - wait_start)
+        if slot == _FAILED:
+            raise ComposeWorkerError(f"样本 {seq} compose 失败:\n{payload}")
+        if slot == _PICKLED:
+            return seq, payload
+
+        keys, layout, extras = payload
+        arrays = unpack_arrays(layout, self._slots[slot].buf)
+        self._free_slots.put(slot)
+        # 恢复与 compose 输出一致的字段顺序
+        return seq, {key: arrays[key] if key in arrays else extras[key] for key in keys}
@@ -0,0 +1,503 @@
+import argparse
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tensor_utils import to_numpy
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# 角点顺序与 mmdet3d 一致: (x0y0z0, x0y0z1, x0y1z1, x0y1z0, x1y0z0, x1y0z1, x1y1z1, x1y1z0)
+BOX_EDGES = np.array([(0, 1), (1, 2), (2, 3), (3, 0),
+                      (4, 5), (5, 6), (6, 7), (7, 4),
+                      (0, 4), (1, 5), (2, 6), (3, 7)])
+_CORNERS_NORM = np.array([[0, 0, 0], [0, 0, 1], [0, 1, 1], [0, 1, 0],
+                          [1, 0, 0], [1, 0, 1], [1, 1, 1], [1, 1, 0]], dtype=np.float64)
+NEAR_PLANE = 0.1                        # 近平面深度(m)，之后的线段被裁掉
+GT_COLOR = (0, 255, 0)                  # BGR
+PRED_COLOR = (0, 0, 255)
+DEFAULT_THUMB_WIDTH = 640
+DEFAULT_SCORE_THR = 0.3
+THUMB_QUALITY = 85
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+RENDER_VERSION = 1                      # 渲染逻辑变化时递增，使旧缩略图缓存失效
+
+
+# ---------- 投影与裁剪 ----------
+
+def box_corners(boxes, origin=(0.5, 0.5, 0.0)):
+    """
+    (N, 7+) 框 (x, y, z, dx, dy, dz, yaw) 的 8 个角点，与 LiDARInstance3DBoxes.corners 一致
+
+    Args:
+        boxes: (N, 7+) 数组
+        origin: 框中心在框内的相对位置，LiDAR 框为底面中心 (0.5, 0.5, 0)
+    Returns:
+        (N, 8, 3) 角点
+    """
+    boxes = np.atleast_2d(np.asarray(boxes, dtype=np.float64))
+    local = boxes[:, None, 3:6] * (_CORNERS_NORM - np.asarray(origin))      # (N, 8, 3)
+    cos, sin = np.cos(boxes[:, 6])[:, None], np.sin(boxes[:, 6])[:, None]
+    x = local[..., 0] * cos - local[..., 1] * sin
+    y = local[..., 0] * sin + local[..., 1] * cos
+    return np.stack([x, y, local[..., 2]], axis=-1) + boxes[:, None, :3]
+
+
+def projection_matrix(proj):
+    """相机内参 K (3, 3)、投影矩阵 (3, 4) 或 lidar2img (4, 4) 统一为 (3, 4)"""
+    proj = np.asarray(proj, dtype=np.float64)
+    if proj.shape == (3, 3):
+        return np.hstack([proj, np.zeros((3, 1))])
+    if proj.shape in ((3, 4), (4, 4)):
+        return proj[:3]
+    raise ValueError(f"不支持的投影矩阵形状: {proj.shape}")
+
+
+def project_edges(corners, proj, near=NEAR_PLANE):
+    """
+    一次性投影所有框的 12 条边，并按近平面裁剪
+
+    线段两端都在近平面之后时丢弃；只有一端在之后时，在齐次坐标中把该端点沿线段
+    移到近平面上（投影是齐次坐标的线性变换，裁剪后的线段仍是原线段可见部分的投影）。
+
+    Args:
+        corners: (N, 8, 3) 角点，与 proj 所用坐标系一致
+        proj: K / (3, 4) / lidar2img
+        near: 近平面深度
+    Returns:
+        segments: (M, 2, 2) 像素坐标线段
+        box_index: (M,) 每条线段所属的框
+    """
+    corners = np.asarray(corners, dtype=np.float64).reshape(-1, 8, 3)
+    matrix = projection_matrix(proj)
+    hom = corners @ matrix[:, :3].T + matrix[:, 3]                          # (N, 8, 3)
+    ends = hom[:, BOX_EDGES].reshape(-1, 2, 3)                              # (N*12, 2, 3)
+    box_index = np.repeat(np.arange(len(corners)), len(BOX_EDGES))
+    depth = ends[..., 2]
+    keep = (depth >= near).any(axis=1)
+    ends, depth, box_index = ends[keep], depth[keep], box_index[keep]
+    for this, other in ((0, 1), (1, 0)):
+        behind = depth[:, this] < near
+        if behind.any():
+            a, b = ends[behind, this], ends[behind, other]
+            t = (near - a[:, 2]) / (b[:, 2] - a[:, 2])
+            ends[behind, this] = a + t[:, None] * (b - a)
+    segments = ends[..., :2] / ends[..., 2:3]
+    return segments, box_index
+
+
+def clip_segments(segments, width, height):
+    """
+    Liang-Barsky 向量化裁剪到图像范围 [0, width-1] x [0, height-1]
+
+    Returns:
+        clipped: (K, 2, 2) 与图像相交部分
+        keep: (M,) 与图像相交的线段掩码
+    """
+    p0 = segments[:, 0]
+    d = segments[:, 1] - p0
+    t0 = np.zeros(len(segments))
+    t1 = np.ones(len(segments))
+    keep = np.ones(len(segments), dtype=bool)
+    for axis, upper in ((0, width - 1), (1, height - 1)):
+        for p, q in ((-d[:, axis], p0[:, axis]), (d[:, axis], upper - p0[:, axis])):
+            parallel = p == 0
+            keep &= ~(parallel & (q < 0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r = q / p
+            entering = ~parallel & (p < 0)
+            leaving = ~parallel & (p > 0)
+            t0 = np.where(entering, np.maximum(t0, r), t0)
+            t1 = np.where(leaving, np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+    p0, d, t0, t1 = p0[keep], d[keep], t0[keep], t1[keep]
+    clipped = np.stack([p0 + t0[:, None] * d, p0 + t1[:, None] * d], axis=1)
+    return clipped, keep
+
+
+# ---------- 批量光栅化 ----------
+
+def rasterize_segments(segments, width, height, thickness=1):
+    """
+    所有线段一次性光栅化 (DDA)：每条线段按最长轴长度取点，全部点在一个数组中计算
+
+    Args:
+        segments: (M, 2, 2) 已裁剪到图像内的线段
+        thickness: 线宽(像素)，>1 时按正方形邻域加粗
+    Returns:
+        flat: 像素在 (height * width) 图像中的展平下标
+        seg: 每个像素所属的线段
+    """
+    if len(segments) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    p0 = segments[:, 0].astype(np.float32)
+    d = (segments[:, 1] - segments[:, 0]).astype(np.float32)
+    counts = np.ceil(np.abs(d).max(axis=1)).astype(np.int64) + 1
+    # 每条线段每步的增量，逐像素只需一次乘加
+    inc = d / np.maximum(counts - 1, 1)[:, None].astype(np.float32)
+    seg = np.repeat(np.arange(len(segments), dtype=np.int32), counts)
+    step = np.arange(len(seg), dtype=np.int32) - np.repeat((np.cumsum(counts) - counts).astype(np.int32), counts)
+    x = np.rint(p0[seg, 0] + step * inc[seg, 0]).astype(np.int64)
+    y = np.rint(p0[seg, 1] + step * inc[seg, 1]).astype(np.int64)
+    if thickness > 1:
+        radius = np.arange(thickness) - (thickness - 1) // 2
+        dx, dy = (v.ravel() for v in np.meshgrid(radius, radius))
+        x = (x[:, None] + dx).ravel()
+        y = (y[:, None] + dy).ravel()
+        seg = np.repeat(seg, len(dx))
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y, seg = x[inside], y[inside], seg[inside]
+    return y * width + x, seg
+
+
+def draw_segments(image, segments, colors, thickness=1):
+    """
+    在 image (H, W, 3) 上原地画线段
+
+    Args:
+        segments: (M, 2, 2) 像素坐标线段（可超出图像范围）
+        colors: (M, 3) 每条线段的颜色，或单个颜色
+    """
+    height, width = image.shape[:2]
+    colors = np.broadcast_to(np.asarray(colors, dtype=image.dtype), (len(segments), 3))
+    clipped, keep = clip_segments(segments, width, height)
+    flat, seg = rasterize_segments(clipped, width, height, thickness)
+    # 相邻线段重叠的像素很多，先按像素记录最后写入的线段，只对去重后的像素写颜色
+    owner = np.full(height * width, -1, dtype=np.int32)
+    owner[flat] = seg
+    pixels = np.flatnonzero(owner >= 0)
+    image.reshape(-1, 3)[pixels] = colors[keep][owner[pixels]]
+    return image
+
+
+def draw_boxes(image, corners, proj, colors, thickness=1, near=NEAR_PLANE):
+    """
+    投影并画出所有 3D 框
+
+    Args:
+        image: (H, W, 3) uint8 图像，原地修改
+        corners: (N, 8, 3) 角点
+        proj: K / (3, 4) / lidar2img
+        colors: (N, 3) 每个框的颜色，或单个颜色
+    """
+    corners = np.asarray(corners)
+    if corners.size == 0:
+        return image
+    segments, box_index = project_edges(corners, proj, near)
+    colors = np.broadcast_to(np.asarray(colors), (len(corners), 3))
+    return draw_segments(image, segments, colors[box_index], thickness)
+
+
+# ---------- Det3DDataSample ----------
+
+def instance_corners(instances, score_thr=None):
+    """InstanceData 中 bboxes_3d 的角点 (N, 8, 3)，score_thr 不为 None 时按 scores_3d 过滤"""
+    if instances is None or 'bboxes_3d' not in instances:
+        return np.zeros((0, 8, 3))
+    bboxes = instances.bboxes_3d
+    corners = getattr(bboxes, 'corners', None)
+    corners = to_numpy(corners) if corners is not None else box_corners(to_numpy(bboxes))
+    if score_thr is not None and 'scores_3d' in instances:
+        corners = corners[to_numpy(instances.scores_3d) >= score_thr]
+    return corners.astype(np.float32)
+
+
+def frame_from_sample(data_sample, camera=0, proj_key='lidar2img', score_thr=DEFAULT_SCORE_THR):
+    """
+    把 Det3DDataSample 转为可 pickle 的渲染帧（只含 numpy 数组），供进程池批量渲染
+
+    Args:
+        data_sample: Det3DDataSample，metainfo 中需要 img_path 与 proj_key 对应的矩阵
+        camera: 多视角样本中使用的相机下标
+        proj_key: 投影矩阵字段，LiDAR 框用 lidar2img，相机框用 cam2img
+        score_thr: 预测框的分数阈值
+    """
+    meta = data_sample.metainfo
+    img_path = meta.get('img_path')
+    proj = np.asarray(meta[proj_key], dtype=np.float64)
+    if isinstance(img_path, (list, tuple)):
+        img_path = img_path[camera]
+    if proj.ndim == 3:
+        proj = proj[camera]
+    img_shape = meta.get('ori_shape') or meta.get('img_shape')
+    if img_shape is not None and isinstance(img_shape[0], (list, tuple)):
+        img_shape = img_shape[camera]
+    return {
+        'id': str(meta.get('sample_idx', os.path.basename(img_path or ''))),
+        'image': img_path,
+        'image_size': tuple(img_shape[:2]) if img_shape is not None else None,
+        'proj': proj,
+        'gt': instance_corners(data_sample.get('gt_instances_3d')),
+        'pred': instance_corners(data_sample.get('pred_instances_3d'), score_thr),
+    }
+
+
+# ---------- 图像读写 ----------
+
+def _read_image(path, min_width=None):
+    """
+    读取 BGR 图像；min_width 不为 None 时利用 JPEG 的降采样解码 (1/2, 1/4, 1/8)，
+    只解码到不小于 min_width 的分辨率，缩略图渲染时省去大部分解码时间
+
+    Returns:
+        (image, 原图 (H, W))
+    """
+    if cv2 is not None:
+        if min_width is not None:
+            # 1/8 解码代价很小，用它估计原图宽度后选择满足 min_width 的最小解码倍率
+            smallest = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)
+            if smallest is not None:
+                for factor, flag in ((8, None), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                    if smallest.shape[1] * 8 // factor >= min_width:
+                        image = smallest if flag is None else cv2.imread(path, flag)
+                        return image, None
+        full = cv2.imread(path, cv2.IMREAD_COLOR)
+        if full is None:
+            raise IOError(f"无法读取图像: {path}")
+        return full, full.shape[:2]
+    if Image is None:
+        raise ImportError("读取图像需要安装 opencv-python 或 Pillow")
+    with Image.open(path) as img:
+        size = img.size
+        if min_width is not None:
+            img.draft('RGB', (min_width, size[1] * min_width // size[0]))
+        image = np.asarray(img.convert('RGB'))[..., ::-1].copy()
+    return image, (size[1], size[0])
+
+
+def _resize(image, width, height):
+    if image.shape[:2] == (height, width):
+        return image
+    if cv2 is not None:
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    rows = (np.arange(height) * image.shape[0] // height)
+    cols = (np.arange(width) * image.shape[1] // width)
+    return image[rows[:, None], cols]
+
+
+def _write_image(path, image, quality=THUMB_QUALITY):
+    """原子写入 JPEG"""
+    tmp_path = f"{path}.tmp.{os.getpid()}.jpg"
+    if cv2 is not None:
+        ok = cv2.imwrite(tmp_path, image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise IOError(f"写入图像失败: {path}")
+    elif Image is not None:
+        Image.fromarray(image[..., ::-1]).save(tmp_path, format='JPEG', quality=quality)
+    else:
+        raise ImportError("写入图像需要安装 opencv-python 或 Pillow")
+    os.replace(tmp_path, path)
+
+
+# ---------- 单帧与批量渲染 ----------
+
+def render_frame(frame, thumb_width=DEFAULT_THUMB_WIDTH, thickness=1,
+                 gt_color=GT_COLOR, pred_color=PRED_COLOR):
+    """
+    渲染一帧：读取图像（无图像时为黑底画布）并缩放到 thumb_width，
+    投影矩阵同步缩放后直接在缩略图上画框，不在原图分辨率上光栅化
+
+    Args:
+        frame: frame_from_sample 的结果，或含 image/image_size/proj/gt/pred 的字典
+        thumb_width: 输出宽度，None 时保持原图大小
+    """
+    size = frame.get('image_size')
+    if frame.get('image'):
+        image, full_size = _read_image(frame['image'], thumb_width if size is not None else None)
+        size = full_size or size
+    elif size is not None:
+        image = np.zeros(tuple(size) + (3,), dtype=np.uint8)
+    else:
+        raise ValueError(f"帧 {frame.get('id')} 既没有图像也没有 image_size")
+    height, width = size
+    if thumb_width is not None and thumb_width < width:
+        out_w, out_h = thumb_width, max(1, round(height * thumb_width / width))
+    else:
+        out_w, out_h = width, height
+    image = np.ascontiguousarray(_resize(image, out_w, out_h))
+    scale = np.diag([out_w / width, out_h / height, 1.0])
+    proj = scale @ projection_matrix(frame['proj'])
+    for key, color in (('gt', gt_color), ('pred', pred_color)):
+        corners = frame.get(key)
+        if corners is not None and len(corners):
+            draw_boxes(image, corners, proj, color, thickness)
+    return image
+
+
+def thumbnail_key(frame, params):
+    """缩略图缓存 key：渲染参数、图像文件 (路径, 大小, 修改时间) 与框/投影矩阵的内容"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((RENDER_VERSION, params, frame.get('image'), frame.get('image_size'))).encode())
+    if frame.get('image'):
+        stat = os.stat(frame['image'])
+        digest.update(repr((stat.st_size, stat.st_mtime_ns)).encode())
+    for key in ('proj', 'gt', 'pred'):
+        value = frame.get(key)
+        if value is not None:
+            value = np.ascontiguousarray(value)
+            digest.update(repr((key, value.shape, value.dtype.str)).encode())
+            digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def _init_worker():
+    if cv2 is not None:
+        # 进程池已按帧并行，避免每个进程再开满线程
+        cv2.setNumThreads(1)
+
+
+def _render_job(job):
+    frame, params, path = job
+    _write_image(path, render_frame(frame, **params))
+    return path
+
+
+def render_frames(frames, cache_dir, workers=DEFAULT_WORKERS, thumb_width=DEFAULT_THUMB_WIDTH,
+                  thickness=1, chunksize=4):
+    """
+    批量渲染缩略图，已缓存的帧直接复用
+
+    缩略图按内容哈希保存在 cache_dir/<key[:2]>/<key>.jpg，图像文件、框或渲染参数变化后自动重新渲染。
+
+    Args:
+        frames: 渲染帧列表（frame_from_sample 的结果）
+        cache_dir: 缩略图缓存目录
+        workers: 渲染进程数，<= 1 时在当前进程渲染
+        chunksize: 每次分发给进程的帧数
+    Returns:
+        (paths, stats): 与 frames 对应的缩略图路径，以及 {'frames', 'cached', 'rendered', 'seconds'}
+    """
+    start = time.perf_counter()
+    params = {'thumb_width': thumb_width, 'thickness': thickness}
+    paths = []
+    jobs = []
+    for frame in frames:
+        key = thumbnail_key(frame, params)
+        path = os.path.join(cache_dir, key[:2], f"{key}.jpg")
+        paths.append(path)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            jobs.append((frame, params, path))
+    if workers <= 1 or len(jobs) <= 1:
+        _init_worker()
+        for job in jobs:
+            _render_job(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            for _ in executor.map(_render_job, jobs, chunksize=chunksize):
+                pass
+    stats = {
+        'frames': len(frames),
+        'cached': len(frames) - len(jobs),
+        'rendered': len(jobs),
+        'seconds': time.perf_counter() - start,
+    }
+    return paths, stats
+
+
+# ---------- 基准测试 ----------
+
+def _synthetic_frame(num_boxes, seed=0, size=(900, 1600)):
+    """前方 5~60m 范围内随机分布的框（含部分跨越近平面的框），相机坐标系 + 内参"""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    boxes = np.column_stack([
+        rng.uniform(-20, 20, num_boxes),            # x (右)
+        rng.uniform(-1, 2, num_boxes),              # y (下)
+        rng.uniform(-2, 60, num_boxes),             # z (前)
+        rng.uniform(1, 5, (num_boxes, 3)),
+        rng.uniform(-np.pi, np.pi, num_boxes),
+    ])
+    corners = box_corners(boxes)
+    K = np.array([[1260.0, 0, width / 2], [0, 1260.0, height / 2], [0, 0, 1]])
+    return {'id': f'synthetic_{seed}', 'image': None, 'image_size': size, 'proj': K,
+            'gt': corners.astype(np.float32), 'pred': (corners + 0.2).astype(np.float32)}
+
+
+def _draw_boxes_loop(image, corners, K, color):
+    """visual.md 中的逐框逐边 cv2.line 写法（含近平面剔除），作为对照"""
+    uv = corners @ K.T
+    for box in range(len(corners)):
+        if (uv[box, :, 2] < NEAR_PLANE).any():
+            continue
+        pts = (uv[box, :, :2] / uv[box, :, 2:3]).astype(int)
+        for i, j in BOX_EDGES:
+            cv2.line(image, tuple(map(int, pts[i])), tuple(map(int, pts[j])), color, 1, cv2.LINE_AA)
+    return image
+
+
+def benchmark(num_boxes, num_frames, workers, thumb_width, cache_dir, write=True):
+    """
+    合成数据的渲染速度
+
+    write=False 时只在内存中渲染缩略图（不编码、不写缓存），不需要 cv2 / Pillow
+    """
+    frame = _synthetic_frame(num_boxes)
+    height, width = frame['image_size']
+    K = frame['proj']
+    corners = np.concatenate([frame['gt'], frame['pred']]).astype(np.float64)
+
+    start = time.perf_counter()
+    draw_boxes(np.zeros((height, width, 3), np.uint8), corners, K, GT_COLOR)
+    vectorized = time.perf_counter() - start
+    print(f"{len(corners)} 个框 (原图 {width}x{height}): 向量化 {vectorized * 1e3:.1f} ms")
+    if cv2 is not None:
+        start = time.perf_counter()
+        _draw_boxes_loop(np.zeros((height, width, 3), np.uint8), corners, K, GT_COLOR)
+        loop = time.perf_counter() - start
+        print(f"    逐边 cv2.line: {loop * 1e3:.1f} ms ({loop / vectorized:.1f}x)")
+
+    frames = [_synthetic_frame(num_boxes, seed) for seed in range(num_frames)]
+    if not write:
+        start = time.perf_counter()
+        for frame in frames:
+            render_frame(frame, thumb_width=thumb_width)
+        seconds = time.perf_counter() - start
+        print(f"内存渲染: {len(frames)} 帧, {seconds:.2f}s, {len(frames) / seconds * 60:.0f} 帧/分钟")
+        return
+    for label in ('首次渲染', '缓存命中'):
+        _, stats = render_frames(frames, cache_dir, workers=workers, thumb_width=thumb_width)
+        print(f"{label}: {stats['frames']} 帧, 渲染 {stats['rendered']}, 命中 {stats['cached']}, "
+              f"{stats['seconds']:.2f}s, {stats['frames'] / stats['seconds'] * 60:.0f} 帧/分钟")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="3D 框批量投影渲染（缩略图）")
+    parser.add_argument("--frames", help="渲染帧列表的 pickle 文件（frame_from_sample 结果的列表）")
+    parser.add_argument("--cache-dir", default="box_thumbnails", help="缩略图缓存目录")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="渲染进程数")
+    parser.add_argument("--thumb-width", type=int, default=DEFAULT_THUMB_WIDTH, help="缩略图宽度")
+    parser.add_argument("--thickness", type=int, default=1, help="线宽(像素)")
+    parser.add_argument("--benchmark", action="store_true", help="用合成数据测试渲染速度")
+    parser.add_argument("--boxes", type=int, default=2000, help="基准测试中每帧的 GT/预测框数")
+    parser.add_argument("--num-frames", type=int, default=200, help="基准测试的帧数")
+    parser.add_argument("--no-write", action="store_true",
+                        help="基准测试只在内存中渲染，不写缩略图（未安装 cv2 / Pillow 时自动启用）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        write = not args.no_write and (cv2 is not None or Image is not None)
+        benchmark(args.boxes, args.num_frames, args.workers, args.thumb_width, args.cache_dir, write=write)
+    elif args.frames:
+        with open(args.frames, 'rb') as f:
+            frames = pickle.load(f)
+        paths, stats = render_frames(frames, args.cache_dir, workers=args.workers,
+                                     thumb_width=args.thumb_width, thickness=args.thickness)
+        print(f"{stats['frames']} 帧: 渲染 {stats['rendered']}, 缓存命中 {stats['cached']}, "
+              f"耗时 {stats['seconds']:.2f}s")
+    else:
+        parser.error("需要 --frames 或 --benchmark")
@@ -1,23 +1,30 @@
 import os
 import json
 import hashlib
-import pickle
 import uuid
 from pathlib import Path
 
+import cache_codec
+
+# 缓存数据压缩方式：'auto' 选择可用的 zstd/lz4，否则用标准库 zlib；None 写普通 pickle
+CACHE_COMPRESSION = 'auto'
+
 def load_annotations(ann_file, num_samples, img_prefix):
     """原始加载标注的函数（示例实现）"""
     # 这里是你的实际加载逻辑
     print(f"执行原始加载函数: {ann_file}, {num_samples}, {img_prefix}")
     return [{"image": f"{img_prefix}/{i}.jpg", "annotation": "data"} for i in range(num_samples)]
 
-def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache"):
+def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache",
+                            compression=CACHE_COMPRESSION, workers=cache_codec.DEFAULT_WORKERS):
     """
     带缓存的加载标注函数
     :param ann_file: 标注文件路径
     :param num_samples: 样本数量
     :param img_prefix: 图像路径前缀
     :param cache_dir: 缓存目录（默认为.cache）
+    :param compression: 新建缓存的压缩方式（'auto'/'zstd'/'lz4'/'zlib'/None），读取时自动识别
+    :param workers: 压缩/解压线程数
     :return: data_infos数据
     """
     # 确保缓存目录存在
@@ -49,8 +56,7 @@ def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache
         
         if pkl_path.exists():
             print(f"命中缓存: {entry['pkl_file']}")
-            with open(pkl_path, 'rb') as f:
-                return pickle.load(f)
+            return cache_codec.load(pkl_path, workers)
     
     # 未命中缓存，执行原始加载
     data_infos = load_annotations(ann_file, num_samples, img_prefix)
@@ -60,13 +66,13 @@ def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache
     pkl_path = Path(cache_dir) / pkl_filename
     
     # 保存数据到pkl
-    with open(pkl_path, 'wb') as f:
-        pickle.dump(data_infos, f)
+    stored = cache_codec.dump(data_infos, pkl_path, compression=compression, workers=workers)
     
     # 更新元数据
     cache_meta[param_hash] = {
         **params,
-        "pkl_file": pkl_filename
+        "pkl_file": pkl_filename,
+        "compression": stored["codec"]
     }
     
     with open(meta_file, 'w') as f:
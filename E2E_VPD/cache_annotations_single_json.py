@@ -1,11 +1,14 @@
 import os
 import json
 import hashlib
-import pickle
 import inspect
 import glob
 from pathlib import Path
 import mono3d  # 导入包含parse_annotation的模块
+import cache_codec
+
+# 缓存数据压缩方式：'auto' 选择可用的 zstd/lz4，否则用标准库 zlib；None 写普通 pickle
+CACHE_COMPRESSION = 'auto'
 
 def load_annotations(ann_file, num_samples, img_prefix):
     """原始加载标注的函数（实际实现应替换为此函数）"""
@@ -30,7 +33,8 @@ def get_code_version():
         print(f"获取代码版本时出错: {e}")
         return "unknown_version"
 
-def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache", return_cache_info=False):
+def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache", return_cache_info=False,
+                            compression=CACHE_COMPRESSION, workers=cache_codec.DEFAULT_WORKERS):
     """
     带缓存信息的加载标注函数
     :param ann_file: 标注文件路径
@@ -38,6 +42,8 @@ def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache
     :param img_prefix: 图像路径前缀
     :param cache_dir: 缓存目录（默认为.cache）
     :param return_cache_info: 是否返回缓存信息
+    :param compression: 新建缓存的压缩方式（'auto'/'zstd'/'lz4'/'zlib'/None），读取时自动识别
+    :param workers: 压缩/解压线程数
     :return: data_infos数据（如果return_cache_info为True，则返回(data, cache_info)）
     """
     # 确保缓存目录存在
@@ -73,9 +79,8 @@ def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache
         cache_info["exists"] = True
         
         try:
-            # 验证缓存有效性
-            with open(pkl_file, 'rb') as f:
-                data = pickle.load(f)
+            # 验证缓存有效性（压缩与未压缩的缓存都可读取）
+            data = cache_codec.load(pkl_file, workers)
                 
             # 加载成功则标记为有效
             cache_info["valid"] = True
@@ -91,18 +96,20 @@ def cached_load_annotations(ann_file, num_samples, img_prefix, cache_dir=".cache
     # 未命中缓存或缓存无效，执行原始加载
     data = load_annotations(ann_file, num_samples, img_prefix)
     
+    # 保存数据（先写数据再写元数据，元数据存在即表示数据完整）
+    stored = cache_codec.dump(data, pkl_file, compression=compression, workers=workers)
+
     # 保存元数据
     with open(meta_file, 'w') as f:
         json.dump({
             **params,
             "pkl_file": pkl_file.name,
-            "param_hash": param_hash
+            "param_hash": param_hash,
+            "compression": stored["codec"],
+            "raw_bytes": stored["raw_bytes"],
+            "stored_bytes": stored["stored_bytes"]
         }, f, indent=2)
     
-    # 保存数据
-    with open(pkl_file, 'wb') as f:
-        pickle.dump(data, f)
-    
     print(f"创建新缓存: {meta_file.name}")
     
     # 更新缓存信息
@@ -146,8 +153,7 @@ def get_cache_info(meta_file_path):
         # 尝试加载数据以验证缓存有效性
         if pkl_file.exists():
             try:
-                with open(pkl_file, 'rb') as f:
-                    pickle.load(f)
+                cache_codec.load(pkl_file)
                 cache_info["valid"] = True
             except Exception as e:
                 cache_info["valid"] = False
@@ -0,0 +1,318 @@
+import argparse
+import io
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# 缓存文件格式：
+#   头部   MAGIC | 版本(B) | 编解码器(B) | 帧数(I) | 原始总长(Q)
+#   帧索引 每帧 (压缩后长度 I, 原始长度 I)
+#   帧数据 各帧依次存放，每帧独立压缩，可在多个线程上并行解压
+# 不压缩时直接写 pickle（旧格式），读取时不以 MAGIC 开头的文件按 pickle 读取
+MAGIC = b'VPDC'
+FORMAT_VERSION = 1
+FRAME_SIZE = 4 << 20                    # 每帧原始大小
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+_HEADER = struct.Struct('<4sBBIQ')
+_FRAME = struct.Struct('<II')
+
+
+class _Codec:
+    def __init__(self, name, codec_id, compress, decompress, level):
+        self.name = name
+        self.id = codec_id
+        self.compress = compress
+        self.decompress = decompress
+        self.level = level
+
+
+def _codecs():
+    codecs = [
+        _Codec('zlib', 1, lambda data, level: zlib.compress(data, level),
+               lambda data, size: zlib.decompress(data, bufsize=size), 1),
+    ]
+    if lz4_frame is not None:
+        codecs.append(_Codec('lz4', 2, lambda data, level: lz4_frame.compress(data, compression_level=level),
+                             lambda data, size: lz4_frame.decompress(data), 0))
+    if zstandard is not None:
+        codecs.append(_Codec(
+            'zstd', 3, lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+            lambda data, size: zstandard.ZstdDecompressor().decompress(data, max_output_size=size), 3))
+    return codecs
+
+
+CODECS = {codec.name: codec for codec in _codecs()}
+_CODECS_BY_ID = {codec.id: codec for codec in CODECS.values()}
+# compression='auto' 时的选择顺序：zstd 压缩率与速度都最好，lz4 解压最快，zlib 为标准库兜底
+AUTO_ORDER = ('zstd', 'lz4', 'zlib')
+
+
+def available_codecs():
+    """当前环境可用的压缩编解码器名"""
+    return list(CODECS)
+
+
+def resolve_codec(compression):
+    """
+    compression 参数 -> 编解码器
+
+    Args:
+        compression: None/'none' 不压缩（返回 None），'auto' 按 AUTO_ORDER 选择可用的，
+            或指定 'zstd' / 'lz4' / 'zlib'
+    """
+    if compression in (None, False, 'none'):
+        return None
+    if compression == 'auto':
+        return next(CODECS[name] for name in AUTO_ORDER if name in CODECS)
+    if compression not in CODECS:
+        raise ValueError(f"不支持的压缩方式 {compression!r}，可用: {available_codecs()}")
+    return CODECS[compression]
+
+
+def dump(obj, path, compression='auto', level=None, frame_size=FRAME_SIZE, workers=DEFAULT_WORKERS):
+    """
+    序列化 obj 并按帧压缩写入 path（先写临时文件再原子替换），不压缩时写普通 pickle
+
+    Args:
+        obj: 任意可 pickle 对象
+        path: 输出路径
+        compression: 见 resolve_codec
+        level: 压缩级别，None 使用编解码器默认值
+        frame_size: 每帧原始字节数
+        workers: 并行压缩线程数
+
+    Returns:
+        dict: codec / raw_bytes / stored_bytes / frames
+    """
+    codec = resolve_codec(compression)
+    payload = memoryview(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    if codec is None:
+        chunks = [payload]
+        info = {'codec': 'none', 'raw_bytes': len(payload), 'stored_bytes': len(payload), 'frames': 0}
+    else:
+        level = codec.level if level is None else level
+        frames = [payload[start:start + frame_size] for start in range(0, len(payload), frame_size)]
+        if len(frames) > 1 and workers > 1:
+            with ThreadPoolExecutor(workers) as pool:
+                compressed = list(pool.map(lambda frame: codec.compress(frame, level), frames))
+        else:
+            compressed = [codec.compress(frame, level) for frame in frames]
+        chunks = [_HEADER.pack(MAGIC, FORMAT_VERSION, codec.id, len(frames), len(payload)),
+                  b''.join(_FRAME.pack(len(data), len(frame)) for data, frame in zip(compressed, frames)),
+                  *compressed]
+        info = {'codec': codec.name, 'raw_bytes': len(payload), 'stored_bytes': sum(map(len, chunks)),
+                'frames': len(frames)}
+
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return info
+
+
+def _read_exact(f, size):
+    # 原始流/网络流的 read 可能只返回部分数据
+    data = f.read(size)
+    if len(data) == size:
+        return data
+    buffer = bytearray(data)
+    while len(buffer) < size:
+        chunk = f.read(size - len(buffer))
+        if not chunk:
+            raise EOFError(f"缓存文件被截断: 需要 {size} 字节，只读到 {len(buffer)}")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _read_all(f, chunk_size=FRAME_SIZE):
+    chunks = []
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def load(path_or_file, workers=DEFAULT_WORKERS):
+    """
+    读取 dump 写出的文件（或旧格式的 pickle 文件）
+
+    帧按顺序读取，每读完一帧立即交给线程池解压并写入预分配的缓冲区，
+    网络文件系统上读取与解压重叠进行；zstd/lz4/zlib 解压时释放 GIL，多帧可并行。
+
+    Args:
+        path_or_file: 文件路径或二进制文件对象
+        workers: 并行解压线程数
+    """
+    if isinstance(path_or_file, (str, os.PathLike)):
+        with open(path_or_file, 'rb') as f:
+            return pickle.loads(read_payload(f, workers))
+    return pickle.loads(read_payload(path_or_file, workers))
+
+
+def read_payload(f, workers=DEFAULT_WORKERS):
+    """读取并解压出 pickle 字节流（load 去掉反序列化的部分）"""
+    head = f.read(_HEADER.size)
+    if not head.startswith(MAGIC):
+        # 旧格式：直接 pickle
+        return head + _read_all(f)
+    if len(head) != _HEADER.size:
+        raise EOFError("缓存文件头部不完整")
+    _, version, codec_id, num_frames, raw_total = _HEADER.unpack(head)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支持的缓存格式版本 {version}")
+    codec = _CODECS_BY_ID.get(codec_id)
+    if codec is None:
+        raise ValueError(f"缓存使用的编解码器 (id={codec_id}) 在当前环境不可用，请安装对应的库")
+    index = list(_FRAME.iter_unpack(_read_exact(f, _FRAME.size * num_frames)))
+    out = bytearray(raw_total)
+    view = memoryview(out)
+
+    def decompress(data, offset, size):
+        raw = codec.decompress(data, size)
+        if len(raw) != size:
+            raise ValueError(f"帧解压后长度 {len(raw)} 与记录的 {size} 不一致")
+        view[offset:offset + size] = raw
+
+    offset = 0
+    if workers <= 1 or num_frames <= 1:
+        for stored, size in index:
+            decompress(_read_exact(f, stored), offset, size)
+            offset += size
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = []
+            for stored, size in index:
+                futures.append(pool.submit(decompress, _read_exact(f, stored), offset, size))
+                offset += size
+            for future in futures:
+                future.result()
+    view.release()
+    return out
+
+
+def is_compressed(path):
+    """文件是否为 dump 写出的分帧格式"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# ===================== 基准测试 =====================
+
+class ThrottledFile(io.RawIOBase):
+    """模拟网络文件系统的读取：每次 read 有固定延迟，并按带宽限速"""
+
+    def __init__(self, path, bandwidth_mb=200.0, latency_ms=2.0, block_size=1 << 20):
+        self._f = open(path, 'rb', buffering=0)
+        self._bandwidth = bandwidth_mb * (1 << 20)
+        self._latency = latency_ms / 1000
+        self._block_size = block_size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # 一次最多读一个块，每个块都付出延迟（对应一次网络请求）
+        n = self._f.readinto(memoryview(buffer)[:self._block_size])
+        time.sleep(self._latency + n / self._bandwidth)
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _synthetic_data_infos(num_samples, seed=0):
+    """与 mmdet3d 风格 data_infos 结构相近的标注：路径字符串、相机参数、框数组与类别"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    classes = np.array(['car', 'truck', 'pedestrian', 'cyclist', 'bus', 'barrier', 'traffic_cone'])
+    infos = []
+    for i in range(num_samples):
+        num = int(rng.integers(5, 40))
+        boxes = np.concatenate([rng.uniform(-50, 50, (num, 3)), rng.uniform(0.5, 8, (num, 3)),
+                                rng.uniform(-np.pi, np.pi, (num, 1))], axis=1).round(2).astype(np.float32)
+        infos.append({
+            'image': f"/scratch/datasets/mono3d/images/seq_{i // 1000:05d}/{i:08d}.jpg",
+            'calib': {'K': np.array([[1266.4, 0.0, 816.3], [0.0, 1266.4, 491.5], [0.0, 0.0, 1.0]],
+                                    dtype=np.float32)},
+            'annotation': {
+                'gt_boxes_3d': boxes,
+                'gt_names': classes[rng.integers(0, len(classes), num)].tolist(),
+                'num_lidar_pts': rng.integers(0, 2000, num).astype(np.int32),
+            },
+        })
+    return infos
+
+
+def benchmark(num_samples=100000, bandwidth_mb=100.0, latency_ms=2.0, workers=DEFAULT_WORKERS, repeat=3):
+    """
+    各编解码器的压缩率、写入时间，以及本地与限速读取路径下的加载时间
+
+    "读取+解压" 为得到 pickle 字节流的时间，"端到端" 另含反序列化（各编解码器相同）
+    """
+    data = _synthetic_data_infos(num_samples)
+    print(f"样本数 {num_samples}，限速读取 {bandwidth_mb}MB/s + 每 MB {latency_ms}ms，解压线程 {workers}")
+    print(f"{'codec':<6} {'大小(MB)':>9} {'压缩率':>7} {'写入(s)':>8} {'本地读取+解压(s)':>16} "
+          f"{'限速读取+解压(s)':>16} {'限速端到端(s)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ['none'] + available_codecs():
+            path = os.path.join(tmp, f"data_{name}.pkl")
+            start = time.perf_counter()
+            info = dump(data, path, compression=name, workers=workers)
+            write_time = time.perf_counter() - start
+            local = min(_timed(lambda: _read_local(path, workers)) for _ in range(repeat))
+            throttled = min(_timed(lambda: _read_throttled(path, bandwidth_mb, latency_ms, workers))
+                            for _ in range(repeat))
+            end_to_end = _timed(lambda: pickle.loads(_read_throttled(path, bandwidth_mb, latency_ms, workers)))
+            print(f"{name:<6} {info['stored_bytes'] / (1 << 20):>9.1f} "
+                  f"{info['raw_bytes'] / info['stored_bytes']:>6.2f}x {write_time:>8.2f} "
+                  f"{local:>16.2f} {throttled:>16.2f} {end_to_end:>13.2f}")
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _read_local(path, workers):
+    with open(path, 'rb') as f:
+        return read_payload(f, workers)
+
+
+def _read_throttled(path, bandwidth_mb, latency_ms, workers):
+    with ThrottledFile(path, bandwidth_mb, latency_ms) as f:
+        return read_payload(f, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="标注缓存压缩基准测试")
+    parser.add_argument("--samples", type=int, default=100000, help="合成标注的样本数")
+    parser.add_argument("--bandwidth", type=float, default=100.0, help="模拟读取带宽(MB/s)")
+    parser.add_argument("--latency", type=float, default=2.0, help="每次读取请求(1MB)的延迟(ms)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="解压线程数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项取最快的一次")
+    args = parser.parse_args()
+    benchmark(args.samples, args.bandwidth, args.latency, args.workers, args.repeat)
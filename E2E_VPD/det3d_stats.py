@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from tensor_utils import to_numpy
+
+
+# 默认分桶（固定边界，内存占用与样本数无关）
+DEFAULT_SIZE_EDGES = np.arange(0.0, 20.5, 0.5)                 # 框尺寸 (m)
+DEFAULT_COUNT_EDGES = np.arange(0, 260, 4)                      # 每帧实例数
+DEFAULT_POINTS_EDGES = np.geomspace(1e3, 1e7, 41)               # 每帧点数
+BOX_SIZE_SLICE = slice(3, 6)                                    # mmdet3d 框 (x, y, z, dx, dy, dz, yaw)
+DEFAULT_QUEUE_SIZE = 16                                         # 待聚合的 batch 摘要数
+
+logger = logging.getLogger(__name__)
+
+
+class RunningMoments:
+    """按列的流式均值/方差/极值（Chan 合并公式，一次处理一批）"""
+
+    def __init__(self, width):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self.min, values.min(axis=0), out=self.min)
+        np.maximum(self.max, values.max(axis=0), out=self.max)
+
+    def to_dict(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'std': np.sqrt(self.m2 / self.count).tolist(),
+            'min': self.min.tolist(),
+            'max': self.max.tolist(),
+        }
+
+
+class FixedHistogram:
+    """固定边界直方图，首尾各带一个越界桶"""
+
+    def __init__(self, edges, width=1):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros((width, len(self.edges) + 1), dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.counts))
+        for column, counts in enumerate(self.counts):
+            counts += np.bincount(np.searchsorted(self.edges, values[:, column], side='right'),
+                                  minlength=len(counts))
+
+    def to_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+
+
+class Det3DStatsCollector:
+    """
+    Det3DDataSample batch 的流式统计
+
+    训练线程调用 submit 时只从 batch 中取出很小的摘要（每帧标签、框尺寸三列、实例数、点数），
+    不持有 batch 本身，点云与显存可以立即释放；摘要放入队列（队列满时丢弃并计数，不阻塞），
+    后台线程把整个 batch 的摘要拼接后做向量化聚合：实例数、框尺寸分布、类别直方图、每帧点数。
+    所有统计量为固定大小的直方图与流式矩，内存恒定。
+    配置 dump_path 时每 interval 秒原子写入一次 JSON 快照。
+
+    用法:
+        with Det3DStatsCollector(dump_path='work_dirs/data_stats.json') as collector:
+            for data_batch in dataloader:
+                collector.submit(data_batch)
+                ...
+    """
+
+    def __init__(self, instances_key='gt_instances_3d', interval=60.0, dump_path=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, size_edges=DEFAULT_SIZE_EDGES, count_edges=DEFAULT_COUNT_EDGES,
+                 points_edges=DEFAULT_POINTS_EDGES):
+        """
+        Args:
+            instances_key (str): 统计的实例字段，如 gt_instances_3d / pred_instances_3d
+            interval (float): 快照间隔（秒）
+            dump_path (str): 快照 JSON 路径，None 时不落盘
+            queue_size (int): 待聚合的 batch 摘要队列容量
+            size_edges / count_edges / points_edges: 各直方图的分桶边界
+        """
+        self.instances_key = instances_key
+        self.interval = interval
+        self.dump_path = dump_path
+        self.samples = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.label_counts = np.zeros(0, dtype=np.int64)
+        self.box_sizes = RunningMoments(3)
+        self.box_size_hist = FixedHistogram(size_edges, width=3)
+        self.instances = RunningMoments(1)
+        self.instances_hist = FixedHistogram(count_edges)
+        self.points = RunningMoments(1)
+        self.points_hist = FixedHistogram(points_edges)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_dump = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='det3d-stats', daemon=True)
+        self._thread.start()
+
+    def submit(self, batch):
+        """
+        提交一个 batch：提取摘要后立即返回，不保留 batch 的引用
+
+        Args:
+            batch: data_samples 列表，或 mmdet3d 的 {'inputs': {'points': [...]}, 'data_samples': [...]}
+        """
+        if self._queue.full():
+            self.dropped += 1
+            return
+        try:
+            summary = self._summarize(batch)
+        except Exception:  # 统计失败不影响训练
+            self._record_failure()
+            return
+        try:
+            self._queue.put_nowait(summary)
+        except queue.Full:
+            self.dropped += 1
+
+    def _summarize(self, batch):
+        """batch -> (样本数, 每帧标签, 每帧框尺寸 (N, 3), 每帧实例数, 每帧点数)，只含小 numpy 数组"""
+        if isinstance(batch, dict):
+            data_samples = batch.get('data_samples') or []
+            points = (batch.get('inputs') or {}).get('points')
+        else:
+            data_samples, points = batch, None
+
+        labels, sizes, counts = [], [], []
+        for data_sample in data_samples:
+            instances = getattr(data_sample, self.instances_key, None)
+            if instances is None:
+                continue
+            sample_labels = to_numpy(getattr(instances, 'labels_3d', None))
+            boxes = getattr(instances, 'bboxes_3d', None)
+            boxes = getattr(boxes, 'tensor', boxes)
+            num_boxes = None
+            if boxes is not None:
+                num_boxes = len(boxes)
+                # 只拷贝尺寸三列，不把整个框张量搬到 CPU
+                if boxes.ndim == 2 and boxes.shape[1] >= BOX_SIZE_SLICE.stop:
+                    sizes.append(to_numpy(boxes[:, BOX_SIZE_SLICE]))
+            if sample_labels is not None:
+                labels.append(sample_labels.reshape(-1).astype(np.int64))
+            counts.append(num_boxes if num_boxes is not None else
+                          len(sample_labels) if sample_labels is not None else 0)
+        num_points = [len(p) for p in points] if points is not None else []
+        return len(data_samples), labels, sizes, counts, num_points
+
+    def _record_failure(self):
+        # submit 与后台线程都可能调用
+        with self._lock:
+            self.failed += 1
+            failed = self.failed
+        logger.warning("Det3DStatsCollector 统计 batch 失败（累计 %d 次）", failed, exc_info=True)
+
+    def _run(self):
+        while True:
+            summary = self._queue.get()
+            if summary is None:
+                return
+            try:
+                self._update(*summary)
+            except Exception:  # 统计失败不影响训练
+                self._record_failure()
+            if self.dump_path and time.monotonic() - self._last_dump >= self.interval:
+                self.dump()
+
+    def _update(self, num_samples, labels, sizes, counts, num_points):
+        # 整个 batch 拼接后一次性聚合
+        labels = np.concatenate(labels) if labels else np.zeros(0, dtype=np.int64)
+        sizes = np.concatenate(sizes) if sizes else np.zeros((0, 3))
+        with self._lock:
+            self.batches += 1
+            self.samples += num_samples
+            if labels.size:
+                label_counts = np.bincount(labels[labels >= 0])
+                if len(label_counts) > len(self.label_counts):
+                    self.label_counts = np.pad(self.label_counts, (0, len(label_counts) - len(self.label_counts)))
+                self.label_counts[:len(label_counts)] += label_counts
+            if len(sizes):
+                self.box_sizes.update(sizes)
+                self.box_size_hist.update(sizes)
+            if counts:
+                self.instances.update(counts)
+                self.instances_hist.update(counts)
+            if num_points:
+                self.points.update(num_points)
+                self.points_hist.update(num_points)
+
+    def snapshot(self):
+        """当前统计的字典形式，可 JSON 序列化"""
+        with self._lock:
+            return {
+                'time': time.time(),
+                'batches': self.batches,
+                'samples': self.samples,
+                'dropped_batches': self.dropped,
+                'failed_batches': self.failed,
+                'pending_batches': self._queue.qsize(),
+                'labels': {str(label): int(count) for label, count in enumerate(self.label_counts) if count},
+                'box_size': {'dims': ['dx', 'dy', 'dz'], **self.box_sizes.to_dict(),
+                             'hist': self.box_size_hist.to_dict()},
+                'instances_per_sample': {**self.instances.to_dict(), 'hist': self.instances_hist.to_dict()},
+                'points_per_sample': {**self.points.to_dict(), 'hist': self.points_hist.to_dict()},
+            }
+
+    def dump(self, path=None):
+        """原子写入快照 JSON，返回快照"""
+        path = path or self.dump_path
+        self._last_dump = time.monotonic()
+        snapshot = self.snapshot()
+        if path:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, path)
+        return snapshot
+
+    def close(self):
+        """处理完队列中剩余的 batch 后停止后台线程，并写入最终快照"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.dump_path:
+            self.dump()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 使用示例
+if __name__ == "__main__":
+    import torch
+    from mmengine.structures import InstanceData
+    from mmdet3d.structures import Det3DDataSample
+    from mmdet3d.structures.bbox_3d import LiDARInstance3DBoxes
+
+    def fake_batch(batch_size=4):
+        data_samples = []
+        for _ in range(batch_size):
+            num = int(torch.randint(1, 50, ()))
+            data_sample = Det3DDataSample()
+            gt_instances_3d = InstanceData()
+            gt_instances_3d.bboxes_3d = LiDARInstance3DBoxes(torch.rand((num, 7)) * 5)
+            gt_instances_3d.labels_3d = torch.randint(0, 10, (num,))
+            data_sample.gt_instances_3d = gt_instances_3d
+            data_samples.append(data_sample)
+        points = [torch.rand((int(torch.randint(10000, 100000, ())), 4)) for _ in range(batch_size)]
+        return {'inputs': {'points': points}, 'data_samples': data_samples}
+
+    with Det3DStatsCollector(interval=1.0, dump_path='det3d_stats.json') as collector:
+        for _ in range(100):
+            collector.submit(fake_batch())
+    print(json.dumps(collector.snapshot()['instances_per_sample'], indent=2))
@@ -1,3 +1,6 @@
+import json
+
+
 def print_det3d_data_sample(data_sample, indent=0):
     """
     递归打印 Det3DDataSample 的结构信息（shape, type）
@@ -99,6 +102,175 @@ def print_nested_data(data, indent=0, prefix=""):
                 print(f"{indent_str}│   │   ├── Shape: {item.shape}")
 
 
+# ---------------------------------------------------------------------------
+# 摘要模式：只读取声明的数据字段，不触发 property、不把张量拷回主机
+# ---------------------------------------------------------------------------
+
+SUMMARY_MAX_ITEMS = 8      # list/dict 最多展开的元素数，其余省略
+SUMMARY_MAX_DEPTH = 6      # 最大展开深度
+SUMMARY_MAX_REPR = 64      # 标量 repr 的最大长度
+
+
+def _is_data_element(value):
+    """mmengine BaseDataElement（Det3DDataSample/InstanceData/PointData 等）"""
+    return hasattr(value, '_data_fields') and hasattr(value, '_metainfo_fields')
+
+
+def _data_field_names(element):
+    keys = getattr(element, 'keys', None)
+    return list(keys()) if callable(keys) else sorted(element._data_fields)
+
+
+def _summarize_array(value, node):
+    # 只读取 shape/dtype/device 等元数据，不访问数据本身，不会引起设备同步
+    node['shape'] = list(value.shape)
+    if hasattr(value, 'dtype'):
+        node['dtype'] = str(value.dtype)
+    if hasattr(value, 'device'):
+        node['device'] = str(value.device)
+    return node
+
+
+def summarize_data(value, max_items=SUMMARY_MAX_ITEMS, max_depth=SUMMARY_MAX_DEPTH, _depth=0):
+    """
+    生成任意数据的结构摘要（dict），可直接 JSON 序列化
+
+    Args:
+        value: 待摘要的数据
+        max_items (int): list/tuple/dict 最多展开的元素数，其余记为 elided
+        max_depth (int): 最大展开深度，超出部分只记录类型
+    """
+    node = {'type': type(value).__name__}
+    if _depth > max_depth:
+        node['elided'] = 'max_depth'
+        return node
+
+    if _is_data_element(value):
+        node['fields'] = {name: summarize_data(getattr(value, name), max_items, max_depth, _depth + 1)
+                          for name in _data_field_names(value)}
+        meta_keys = sorted(value._metainfo_fields)
+        if meta_keys:
+            node['metainfo'] = meta_keys[:max_items]
+            if len(meta_keys) > max_items:
+                node['metainfo_elided'] = len(meta_keys) - max_items
+        return node
+
+    # 3D 框（BaseInstance3DBoxes 等）：只看内部 tensor，避免 dims/volume 等计算型 property
+    inner = getattr(value, '__dict__', {}).get('tensor')
+    if inner is not None and hasattr(inner, 'shape'):
+        return _summarize_array(inner, node)
+    if hasattr(value, 'shape') and not isinstance(value, type):
+        return _summarize_array(value, node)
+
+    if isinstance(value, dict):
+        node['len'] = len(value)
+        node['items'] = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i >= max_items:
+                break
+            node['items'][str(key)] = summarize_data(item, max_items, max_depth, _depth + 1)
+        if len(value) > max_items:
+            node['elided'] = len(value) - max_items
+        return node
+
+    if isinstance(value, (list, tuple)):
+        node['len'] = len(value)
+        node['items'] = [summarize_data(item, max_items, max_depth, _depth + 1)
+                         for item in value[:max_items]]
+        if len(value) > max_items:
+            node['elided'] = len(value) - max_items
+        return node
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        text = value if not isinstance(value, str) or len(value) <= SUMMARY_MAX_REPR \
+            else value[:SUMMARY_MAX_REPR] + '...'
+        node['value'] = text
+    return node
+
+
+def summarize_det3d_data_sample(data_sample, max_items=SUMMARY_MAX_ITEMS, max_depth=SUMMARY_MAX_DEPTH):
+    """
+    Det3DDataSample 的结构摘要
+
+    与 print_det3d_data_sample 不同，只遍历 keys()/_data_fields 声明的数据字段，
+    不调用 dir/getattr 扫描全部属性；张量只读取 shape/dtype/device。
+
+    Args:
+        data_sample (Det3DDataSample): 输入数据样本
+        max_items (int): list/dict 最多展开的元素数
+        max_depth (int): 最大展开深度
+
+    Returns:
+        dict: 可 JSON 序列化的结构摘要
+    """
+    return summarize_data(data_sample, max_items=max_items, max_depth=max_depth)
+
+
+def _node_label(node):
+    parts = [node['type']]
+    if 'shape' in node:
+        parts.append(f"shape={tuple(node['shape'])}")
+        parts.extend(f"{key}={node[key]}" for key in ('dtype', 'device') if key in node)
+    if 'len' in node:
+        parts.append(f"len={node['len']}")
+    if 'value' in node:
+        parts.append(f"value={node['value']!r}")
+    if node.get('elided') == 'max_depth':
+        parts.append('...')
+    return ' '.join(parts)
+
+
+def _render_node(node, prefix, lines):
+    children = []
+    if 'fields' in node:
+        children.extend(node['fields'].items())
+    items = node.get('items')
+    if isinstance(items, dict):
+        children.extend(items.items())
+    elif isinstance(items, list):
+        children.extend((f"[{i}]", item) for i, item in enumerate(items))
+    if isinstance(node.get('elided'), int):
+        children.append((None, f"... {node['elided']} more"))
+    if 'metainfo' in node:
+        more = f" (+{node['metainfo_elided']})" if 'metainfo_elided' in node else ''
+        children.append((None, f"metainfo: {', '.join(node['metainfo'])}{more}"))
+
+    for i, (name, child) in enumerate(children):
+        last = i == len(children) - 1
+        branch = '└── ' if last else '├── '
+        if name is None:
+            lines.append(f"{prefix}{branch}{child}")
+            continue
+        lines.append(f"{prefix}{branch}{name}: {_node_label(child)}")
+        _render_node(child, prefix + ('    ' if last else '│   '), lines)
+
+
+def format_summary(summary):
+    """把 summarize_* 的结果渲染为一个多行字符串（一次性拼接，不逐行 print）"""
+    lines = [_node_label(summary)]
+    _render_node(summary, '', lines)
+    return '\n'.join(lines)
+
+
+def summary_to_json(summary, indent=None):
+    """摘要的 JSON 形式，便于写入日志"""
+    return json.dumps(summary, ensure_ascii=False, indent=indent, default=str)
+
+
+def print_det3d_summary(data_sample, max_items=SUMMARY_MAX_ITEMS, max_depth=SUMMARY_MAX_DEPTH,
+                        as_json=False):
+    """
+    打印 Det3DDataSample 的结构摘要，适合在训练循环中调用
+
+    Args:
+        data_sample (Det3DDataSample): 输入数据样本
+        max_items (int): list/dict 最多展开的元素数
+        max_depth (int): 最大展开深度
+        as_json (bool): 输出单行 JSON 而不是树形文本
+    """
+    summary = summarize_det3d_data_sample(data_sample, max_items, max_depth)
+    print(summary_to_json(summary) if as_json else format_summary(summary))
+
 # 使用示例
 if __name__ == "__main__":
     import torch
@@ -130,4 +302,8 @@ if __name__ == "__main__":
     data_sample.gt_pts_seg = gt_pts_seg
     
     # 打印数据结构
-    print_det3d_data_sample(data_sample)ss
\ No newline at end of file
+    print_det3d_data_sample(data_sample)
+
+    # 摘要模式
+    print_det3d_summary(data_sample)
+    print_det3d_summary(data_sample, as_json=True)
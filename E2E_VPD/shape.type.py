@@ -1,3 +1,6 @@
+import hashlib
+
+
 def print_instance_data(data, indent=0, prefix=""):
     """
     递归打印 InstanceData 的结构信息（shape, type）
@@ -36,6 +39,171 @@ def print_instance_data(data, indent=0, prefix=""):
         for idx, item in enumerate(data):
             print_instance_data(item, indent + 1, f"Index: {idx}")
 
+# ---------------------------------------------------------------------------
+# 结构 schema：可哈希、紧凑，用于按 batch 计算指纹并在结构变化时告警
+#
+#   ('leaf', 类型名)
+#   ('array', 类型名, dtype, shape)            shape 中动态维度记为 '*'
+#   ('map', 类型名, ((key, schema), ...))       dict 与 InstanceData 等数据元素
+#   ('seq', 类型名, 长度, 元素 schema)          同构 list/tuple 折叠为 List[N] of <schema>
+#   ('union', (schema, ...))                    异构序列的元素 schema 集合
+# ---------------------------------------------------------------------------
+
+DYNAMIC = '*'
+SCHEMA_SAMPLE_LIMIT = 64   # 序列元素不是同一标量类型时最多抽查的元素数
+
+# 标量类型的 schema 只取决于类型，按类型缓存
+_LEAF_SCHEMAS = {}
+
+
+def _leaf_schema(tp):
+    schema = _LEAF_SCHEMAS.get(tp)
+    if schema is None:
+        schema = _LEAF_SCHEMAS[tp] = ('leaf', tp.__name__)
+    return schema
+
+
+_LEAF_BASES = (int, float, bool, str, bytes, type(None))
+
+
+def _is_leaf_type(tp):
+    # numpy 标量 (np.float32 等) 虽有 shape 属性，也按标量处理
+    return issubclass(tp, _LEAF_BASES) or (tp.__module__ == 'numpy' and tp.__name__ != 'ndarray')
+
+
+def infer_schema(data, exact=False, sample_limit=SCHEMA_SAMPLE_LIMIT):
+    """
+    推断数据的结构 schema（可哈希的嵌套 tuple）
+
+    :param data: 输入数据（任意嵌套结构）
+    :param exact: False 时数组首维与序列长度记为动态维度 '*'，
+                  实例数不同但结构相同的 batch 得到相同 schema
+    :param sample_limit: 序列元素类型不一致或为容器时，最多均匀抽查的元素数
+    """
+    tp = type(data)
+    if _is_leaf_type(tp):
+        return _leaf_schema(tp)
+
+    if hasattr(data, '_data_fields') and callable(getattr(data, 'keys', None)):
+        # InstanceData/PointData：只看声明的数据字段
+        fields = sorted((str(key), infer_schema(data[key], exact, sample_limit)) for key in data.keys())
+        return ('map', tp.__name__, tuple(fields))
+
+    tensor = getattr(data, '__dict__', {}).get('tensor')
+    shape = getattr(tensor if tensor is not None and hasattr(tensor, 'shape') else data, 'shape', None)
+    if shape is not None and not isinstance(data, type):
+        dims = tuple(int(d) for d in shape)
+        if not exact and dims:
+            dims = (DYNAMIC,) + dims[1:]
+        dtype = getattr(tensor if tensor is not None else data, 'dtype', None)
+        return ('array', tp.__name__, str(dtype), dims)
+
+    if isinstance(data, dict):
+        fields = sorted((str(key), infer_schema(value, exact, sample_limit)) for key, value in data.items())
+        return ('map', tp.__name__, tuple(fields))
+
+    if isinstance(data, (list, tuple)):
+        length = len(data) if exact else DYNAMIC
+        if not data:
+            return ('seq', tp.__name__, length, ('union', ()))
+        types = set(map(type, data))
+        if len(types) == 1 and _is_leaf_type(next(iter(types))):
+            # 百万级标量列表只需一次 C 层面的类型扫描
+            return ('seq', tp.__name__, length, _leaf_schema(types.pop()))
+        step = max(1, len(data) // sample_limit)
+        element_schemas = {infer_schema(item, exact, sample_limit) for item in data[::step][:sample_limit]}
+        if len(element_schemas) == 1:
+            return ('seq', tp.__name__, length, element_schemas.pop())
+        return ('seq', tp.__name__, length, ('union', tuple(sorted(element_schemas, key=repr))))
+
+    return _leaf_schema(tp)
+
+
+_DISPLAY_NAMES = {'dict': 'Dict', 'list': 'List', 'tuple': 'Tuple'}
+
+
+def format_schema(schema):
+    """把 schema 渲染为紧凑的单行字符串，如 Dict{boxes: Tensor[float32](*, 7), ids: List[*] of int}"""
+    kind = schema[0]
+    if kind == 'leaf':
+        return schema[1]
+    if kind == 'array':
+        _, name, dtype, dims = schema
+        return f"{name}[{dtype}]({', '.join(map(str, dims))})"
+    if kind == 'map':
+        _, name, fields = schema
+        return f"{_DISPLAY_NAMES.get(name, name)}{{{', '.join(f'{key}: {format_schema(value)}' for key, value in fields)}}}"
+    if kind == 'seq':
+        _, name, length, element = schema
+        return f"{_DISPLAY_NAMES.get(name, name)}[{length}] of {format_schema(element)}"
+    return f"Union[{' | '.join(format_schema(item) for item in schema[1])}]"
+
+
+def schema_fingerprint(schema):
+    """schema 的短指纹（16 位十六进制），跨进程稳定，可直接写入日志或指标"""
+    return hashlib.blake2b(repr(schema).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def diff_schema(old, new, path='$'):
+    """
+    比较两个 schema，返回差异列表 [(路径, 旧结构, 新结构)]，结构不存在时为 None
+
+    :param old: 旧 schema
+    :param new: 新 schema
+    :param path: 根路径标签
+    """
+    if old == new:
+        return []
+    if old is None or new is None or old[0] != new[0] or old[0] in ('leaf', 'union', 'array'):
+        return [(path, format_schema(old) if old else None, format_schema(new) if new else None)]
+    if old[1] != new[1]:
+        return [(path, format_schema(old), format_schema(new))]
+    if old[0] == 'map':
+        old_fields, new_fields = dict(old[2]), dict(new[2])
+        changes = []
+        for key in sorted(old_fields.keys() | new_fields.keys()):
+            changes.extend(diff_schema(old_fields.get(key), new_fields.get(key), f"{path}.{key}"))
+        return changes
+    # seq：长度与元素结构分别比较
+    changes = []
+    if old[2] != new[2]:
+        changes.append((f"{path}.len", str(old[2]), str(new[2])))
+    changes.extend(diff_schema(old[3], new[3], f"{path}[]"))
+    return changes
+
+
+class SchemaMonitor:
+    """
+    逐 batch 检查结构是否变化：结构不变时只做一次 tuple 比较，变化时返回差异
+
+    用法:
+        monitor = SchemaMonitor()
+        for batch in loader:
+            changes = monitor.update(batch)
+            if changes:
+                logger.warning("batch 结构变化 %s: %s", monitor.fingerprint, changes)
+    """
+
+    def __init__(self, exact=False, sample_limit=SCHEMA_SAMPLE_LIMIT):
+        self.exact = exact
+        self.sample_limit = sample_limit
+        self.schema = None
+        self.fingerprint = None
+        self.changes = 0
+
+    def update(self, data):
+        """返回相对上一次的差异列表；首次调用与结构未变化时返回空列表"""
+        schema = infer_schema(data, self.exact, self.sample_limit)
+        if schema == self.schema:
+            return []
+        previous, self.schema = self.schema, schema
+        self.fingerprint = schema_fingerprint(schema)
+        if previous is None:
+            return []
+        self.changes += 1
+        return diff_schema(previous, schema)
+
+
 # 示例测试
 if __name__ == "__main__":
     # 构造示例数据结构（包含字典、列表、张量等）
@@ -56,4 +224,10 @@ if __name__ == "__main__":
         ]
     }
     
-    print_instance_data(example_data)
\ No newline at end of file
+    print_instance_data(example_data)
+
+    # 结构 schema、指纹与差异
+    schema = infer_schema(example_data)
+    print(format_schema(schema), schema_fingerprint(schema))
+    example_data["nested_dict"]["float_list"].append("oops")
+    print(diff_schema(schema, infer_schema(example_data)))
\ No newline at end of file
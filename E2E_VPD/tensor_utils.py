@@ -0,0 +1,11 @@
+import numpy as np
+
+
+def to_numpy(value):
+    """张量/3D 框（带 .tensor 属性）转为 numpy，None 原样返回"""
+    if value is None:
+        return None
+    value = getattr(value, '__dict__', {}).get('tensor', value)
+    if hasattr(value, 'detach'):
+        value = value.detach().cpu().numpy()
+    return np.asarray(value)
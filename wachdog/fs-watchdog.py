@@ -1,12 +1,20 @@
 #!/usr/bin/env python
 
 import argparse
+import json
 import re
 import socket
 import subprocess
 import sys
 import os
 import platform
+import signal
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # ===================== 配置区域 =====================
 # 分区监控阈值配置
@@ -29,7 +37,53 @@ WORKSF_INODES_LIMIT = 3 * 10**6      # WORKSF inode限制 (3百万)
 
 # 广播配置
 BROADCAST_ENABLED = True            # 是否启用终端广播
+BROADCAST_METHOD = "tty"            # 'tty': 并发非阻塞写终端 (tty_broadcast.py), 'wall': 调用wall命令
+BROADCAST_TIMEOUT = 2.0             # tty 广播时每个终端的写入期限(秒)
 MESSAGE_LANGUAGE = "zh"             # 消息语言: 'zh' 中文, 'en' 英文
+
+# 监控分区 (名称 -> 挂载路径)
+PARTITIONS = {
+    "SCRATCH": "/scratch",
+    "WORKSF": "/worksf",
+    "WORK": "/work",
+    "STORE": "/store",
+}
+STATVFS_TIMEOUT = 5.0               # 单次采集中所有挂载点 statvfs 的总超时(秒)
+
+# 各分区容量上限 (字节, inode)，None 表示使用文件系统总量
+PARTITION_LIMITS = {
+    "SCRATCH": (SCRATCH_QUOTA_LIMIT, None),
+    "WORKSF": (WORKSF_BYTES_LIMIT, WORKSF_INODES_LIMIT),
+    "WORK": (None, None),
+    "STORE": (None, None),
+}
+
+# 各分区使用率警报阈值 (空间, inode)，None 表示不检查
+PARTITION_THRESHOLDS = {
+    "SCRATCH": (SCRATCH_QUOTA_THRESHOLD, None),
+    "WORKSF": (WORKSF_BYTES_THRESHOLD, WORKSF_INODES_THRESHOLD),
+    "WORK": (WORK_BYTES_THRESHOLD, WORK_INODES_THRESHOLD),
+    "STORE": (STORE_BYTES_THRESHOLD, STORE_INODES_THRESHOLD),
+}
+
+# 守护模式配置
+DAEMON_INTERVAL = 60                # 采样间隔(秒)
+HISTORY_SIZE = 360                  # 每个分区保留的历史样本数(环形缓冲)
+PREDICT_MIN_SAMPLES = 5             # 估算增速所需的最少样本数
+PREDICT_WINDOW = 3600               # 估算增速使用的最近历史时长(秒)
+PREDICT_HORIZON = 6 * 3600          # 预计在该时间(秒)内写满时提前警报
+ALERT_HYSTERESIS = 0.02             # 警报解除需低于阈值的使用率差值(占总量比例)
+REALERT_INTERVAL = 3600             # 同一警报持续时的重复广播间隔(秒)
+STATE_SAVE_INTERVAL = 300           # 状态文件最长保存间隔(秒)
+STATE_FILE = "/var/lib/fs-watchdog/state.json"   # 守护模式状态文件（放在只有 root 可写的目录）
+
+# 使用量归因配置（--attribute，见 usage_scanner.py）
+ATTRIBUTION_TOP_N = 5               # 警报中附带的 top-N 用户/目录数
+ATTRIBUTION_TIMEOUT = 300           # 单个分区归因扫描的时间上限(秒)
+ATTRIBUTION_WORKERS = 16            # 并行扫描线程数
+
+# 指标导出配置
+METRICS_PREFIX = "fs_watchdog"      # Prometheus 指标名前缀
 # ===================================================
 
 SLURM_GROUP_NAME = "six"
@@ -41,8 +95,13 @@ def get_message(key):
             "alert_title": "【紧急】文件系统即将满载",
             "scratch_full": "SCRATCH空间使用率: {:.2f}% ({:.2f}TB/{:.2f}TB)",
             "worksf_full": "WORKSF空间使用率: {:.2f}% ({:.2f}GB/{:.2f}GB)",
+            "bytes_full": "{}空间使用率: {:.2f}% ({:.2f}TB/{:.2f}TB)",
             "inode_full": "{} inode使用率: {:.2f}% ({:.2f}K/{:.2f}K)",
             "shared_full": "共享{}分区仅剩 {:.2f}TB",
+            "predict_full": "{} {}预计 {:.1f} 小时后耗尽 (增速 {}/小时)",
+            "metric_bytes": "空间",
+            "metric_inodes": "inode",
+            "resolved": "警报已解除: {}",
             "prompt": "请检查存储使用情况或联系管理员",
             "normal": "所有分区状态正常"
         },
@@ -50,8 +109,13 @@ def get_message(key):
             "alert_title": "【URGENT】File System Approaching Full",
             "scratch_full": "SCRATCH usage: {:.2f}% ({:.2f}TB/{:.2f}TB)",
             "worksf_full": "WORKSF usage: {:.2f}% ({:.2f}GB/{:.2f}GB)",
+            "bytes_full": "{} usage: {:.2f}% ({:.2f}TB/{:.2f}TB)",
             "inode_full": "{} inode usage: {:.2f}% ({:.2f}K/{:.2f}K)",
             "shared_full": "Shared {} only has {:.2f}TB left",
+            "predict_full": "{} {} projected to be exhausted in {:.1f}h (growing {}/h)",
+            "metric_bytes": "space",
+            "metric_inodes": "inodes",
+            "resolved": "Alert resolved: {}",
             "prompt": "Please check storage usage or contact admin",
             "normal": "All partitions are in good standing"
         }
@@ -62,12 +126,30 @@ def broadcast_alert(msg):
     """向所有登录用户的终端发送警报消息"""
     if not BROADCAST_ENABLED:
         return
+
+    text = f"\n\n***** {get_message('alert_title')} *****\n{msg}\n\n{get_message('prompt')}\n"
+    if BROADCAST_METHOD == "tty":
+        try:
+            import tty_broadcast
+        except ImportError:
+            print("未找到 tty_broadcast.py，改用 wall 广播")
+        else:
+            try:
+                reports = tty_broadcast.broadcast(text, timeout=BROADCAST_TIMEOUT, respect_mesg=False)
+            except OSError as e:
+                print(f"广播失败: {e}")
+                return
+            print(f"警报广播结果: {tty_broadcast.summarize(reports)}")
+            for report in reports:
+                if report.status not in ("sent", "skipped"):
+                    print(f"  {report.tty} ({','.join(report.users)}): {report.status} {report.error or ''}")
+            return
         
     # 在Ubuntu上，wall命令用于广播消息
     broadcast_cmd = [
         "wall",
         "-n",  # 不显示标题
-        f"\n\n***** {get_message('alert_title')} *****\n{msg}\n\n{get_message('prompt')}\n"
+        text
     ]
     
     try:
@@ -95,24 +177,6 @@ def check_system_compatibility():
     except FileNotFoundError:
         print("警告：无法确定操作系统类型")
 
-def run_cmd(cmd, check=True):
-    """执行系统命令并返回输出"""
-    try:
-        result = subprocess.run(
-            cmd,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            check=check,
-            encoding="utf-8",
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as exc:
-        print(f"命令执行失败: {' '.join(cmd)}")
-        print(f"错误信息: {exc.stderr}")
-        if check:
-            raise
-        return ""
-
 def get_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser()
@@ -120,182 +184,595 @@ def get_args():
     parser.add_argument("--no-broadcast", action='store_true', help="禁用终端广播")
     parser.add_argument("--lang", choices=["zh", "en"], default=MESSAGE_LANGUAGE, 
                         help="设置消息语言 (zh: 中文, en: 英文)")
+    parser.add_argument("--timeout", type=float, default=STATVFS_TIMEOUT,
+                        help="所有挂载点 statvfs 的总超时(秒)")
+    parser.add_argument("--daemon", action='store_true', help="常驻运行，按间隔采样并预测写满时间")
+    parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL, help="守护模式采样间隔(秒)")
+    parser.add_argument("--state-file", default=None,
+                        help=f"状态文件(历史样本与警报状态)，守护模式默认 {STATE_FILE}；"
+                             "单次运行指定后同样对警报去重")
+    parser.add_argument("--attribute", action='store_true',
+                        help="触发警报时扫描对应分区，附带按用户/顶层目录的 top-N 占用报告")
+    parser.add_argument("--attribute-top", type=int, default=ATTRIBUTION_TOP_N, help="归因报告条目数")
+    parser.add_argument("--attribute-timeout", type=float, default=ATTRIBUTION_TIMEOUT,
+                        help="单个分区归因扫描的时间上限(秒)")
+    parser.add_argument("--textfile", default=None,
+                        help="每次采集后写入 Prometheus 文本格式指标文件 (node_exporter textfile collector)")
+    parser.add_argument("--listen", default=None,
+                        help="守护模式下在 HOST:PORT 提供 /metrics，返回最近一次采集的指标")
     return parser.parse_args()
 
-def main():
-    """主监控逻辑"""
-    
-    # 系统兼容性检查
-    check_system_compatibility()
-    
-    # 解析命令行参数
-    args = get_args()
-    
-    # 设置全局语言
-    global MESSAGE_LANGUAGE
-    MESSAGE_LANGUAGE = args.lang
-    
-    # 设置是否广播
-    global BROADCAST_ENABLED
-    if args.no_broadcast:
-        BROADCAST_ENABLED = False
+# ===================== 分区采集 =====================
 
-    alerts = []
-    
-    def analyse_partition_bytes(partition_name, partition_path, hard_limit_bytes, threshold):
-        """分析分区空间使用情况"""
-        try:
-            # 使用df命令获取更准确的分区使用情况
-            cmd = f"df -B1 --output=used {partition_path}"
-            response = run_cmd(cmd.split(), check=False)
-            
-            # 提取使用量（跳过标题行）
-            size_bytes = int(response.split('\n')[1])
-            
-            if args.debug:
-                print(f"{partition_name} 空间使用量: {size_bytes/2**40:.2f}TB")
-            
-            if size_bytes > hard_limit_bytes * threshold:
-                current_usage_percent = 100 * size_bytes / hard_limit_bytes
-                if partition_name == "SCRATCH":
-                    msg = get_message("scratch_full").format(
-                        current_usage_percent,
-                        size_bytes / 2**40,
-                        hard_limit_bytes / 2**40
-                    )
-                else:
-                    msg = get_message("worksf_full").format(
-                        current_usage_percent,
-                        size_bytes / 2**30,
-                        hard_limit_bytes / 2**30
-                    )
-                alerts.append(msg)
-        except (ValueError, IndexError) as e:
-            print(f"分析{partition_name}空间时出错: {e}")
-
-    def analyse_partition_inodes(partition_name, partition_path, hard_limit_inodes, threshold):
-        """分析分区inode使用情况"""
+# 单个分区的一次采集结果；error 不为空时其余字段无效
+PartitionUsage = namedtuple(
+    "PartitionUsage",
+    ["name", "path", "bytes_total", "bytes_used", "bytes_avail",
+     "inodes_total", "inodes_used", "latency", "error"],
+    defaults=[0, 0, 0, 0, 0, 0.0, None],
+)
+
+# 挂载点 -> (Future, 开始时间)；上一次探测仍阻塞的挂载点不重复创建线程
+_INFLIGHT_PROBES = {}
+
+def _statvfs_probe(path, future):
+    start = time.monotonic()
+    try:
+        future.set_result((os.statvfs(path), time.monotonic() - start))
+    except OSError as e:
+        future.set_exception(e)
+
+def collect_usage(partitions=None, timeout=STATVFS_TIMEOUT):
+    """
+    并发采集各分区的空间与 inode 使用情况
+
+    每个挂载点在独立的守护线程中调用 os.statvfs，所有挂载点共享同一个截止时间：
+    挂起的 Lustre/NFS 挂载点只会被记为超时，不会拖住其他分区，也不会阻止进程退出。
+    """
+    partitions = PARTITIONS if partitions is None else partitions
+    probes = {}
+    for name, path in partitions.items():
+        probe = _INFLIGHT_PROBES.get(path)
+        if probe is None:
+            future = Future()
+            threading.Thread(target=_statvfs_probe, args=(path, future),
+                             name=f"statvfs:{path}", daemon=True).start()
+            probe = _INFLIGHT_PROBES[path] = (future, time.monotonic())
+        probes[name] = (path, probe)
+
+    deadline = time.monotonic() + timeout
+    usage = {}
+    for name, (path, (future, started)) in probes.items():
         try:
-            # 使用df命令获取inode使用情况
-            cmd = f"df -i --output=iused {partition_path}"
-            response = run_cmd(cmd.split(), check=False)
-            
-            # 提取inode使用量（跳过标题行）
-            size_inodes = int(response.split('\n')[1])
-            
-            if args.debug:
-                print(f"{partition_name} Inode使用量: {size_inodes}")
-            
-            if size_inodes > hard_limit_inodes * threshold:
-                current_usage_percent = 100 * size_inodes / hard_limit_inodes
-                msg = get_message("inode_full").format(
+            st, latency = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            usage[name] = PartitionUsage(
+                name, path, latency=time.monotonic() - started,
+                error=f"statvfs 超时 (已阻塞 {time.monotonic() - started:.1f}s)")
+            continue
+        except OSError as e:
+            usage[name] = PartitionUsage(name, path, error=str(e))
+        else:
+            usage[name] = PartitionUsage(
+                name, path,
+                bytes_total=st.f_blocks * st.f_frsize,
+                bytes_used=(st.f_blocks - st.f_bfree) * st.f_frsize,
+                bytes_avail=st.f_bavail * st.f_frsize,
+                inodes_total=st.f_files,
+                inodes_used=st.f_files - st.f_ffree,
+                latency=latency,
+            )
+        _INFLIGHT_PROBES.pop(path, None)
+    return usage
+
+def evaluate_alerts(usage, debug=False, active=()):
+    """
+    根据一次采集结果生成警报列表 [(警报键, 消息)]
+
+    active 中已触发的警报按 ALERT_HYSTERESIS 放宽阈值，避免在阈值附近反复触发/解除
+    """
+    alerts = []
+
+    def analyse_partition_bytes(partition_name, hard_limit_bytes, threshold):
+        """分析分区空间使用情况，hard_limit_bytes 为 None 时使用分区总容量"""
+        u = usage.get(partition_name)
+        if u is None or u.error:
+            return
+        size_bytes = u.bytes_used
+        hard_limit_bytes = hard_limit_bytes or u.bytes_total
+        key = f"{partition_name}:bytes"
+        if key in active:
+            threshold -= ALERT_HYSTERESIS
+        
+        if debug:
+            print(f"{partition_name} 空间使用量: {size_bytes/2**40:.2f}TB")
+        
+        if hard_limit_bytes and size_bytes > hard_limit_bytes * threshold:
+            current_usage_percent = 100 * size_bytes / hard_limit_bytes
+            if partition_name == "SCRATCH":
+                msg = get_message("scratch_full").format(
+                    current_usage_percent,
+                    size_bytes / 2**40,
+                    hard_limit_bytes / 2**40
+                )
+            elif partition_name == "WORKSF":
+                msg = get_message("worksf_full").format(
+                    current_usage_percent,
+                    size_bytes / 2**30,
+                    hard_limit_bytes / 2**30
+                )
+            else:
+                msg = get_message("bytes_full").format(
                     partition_name,
                     current_usage_percent,
-                    size_inodes / 1000,
-                    hard_limit_inodes / 1000
+                    size_bytes / 2**40,
+                    hard_limit_bytes / 2**40
                 )
-                alerts.append(msg)
-        except (ValueError, IndexError) as e:
-            print(f"分析{partition_name} inode时出错: {e}")
+            alerts.append((key, msg))
+
+    def analyse_partition_inodes(partition_name, hard_limit_inodes, threshold):
+        """分析分区inode使用情况，hard_limit_inodes 为 None 时使用分区 inode 总数"""
+        u = usage.get(partition_name)
+        if u is None or u.error:
+            return
+        size_inodes = u.inodes_used
+        hard_limit_inodes = hard_limit_inodes or u.inodes_total
+        key = f"{partition_name}:inodes"
+        if key in active:
+            threshold -= ALERT_HYSTERESIS
+        
+        if debug:
+            print(f"{partition_name} Inode使用量: {size_inodes}")
+        
+        if hard_limit_inodes and size_inodes > hard_limit_inodes * threshold:
+            current_usage_percent = 100 * size_inodes / hard_limit_inodes
+            msg = get_message("inode_full").format(
+                partition_name,
+                current_usage_percent,
+                size_inodes / 1000,
+                hard_limit_inodes / 1000
+            )
+            alerts.append((key, msg))
 
     def analyse_shared_disk(partition_name, threshold_bytes):
-        """分析共享磁盘空间"""
-        try:
-            # 获取分区挂载点
-            cmd = "df -B1 --output=target,avail"
-            response = run_cmd(cmd.split())
-            
-            # 查找目标分区
-            lines = response.splitlines()
-            for line in lines[1:]:  # 跳过标题行
-                parts = line.split()
-                if len(parts) >= 2 and partition_name in parts[0]:
-                    available_bytes = int(parts[1])
-                    
-                    if args.debug:
-                        print(f"{partition_name} 可用空间: {available_bytes/2**40:.2f}TB")
-                    
-                    if available_bytes < threshold_bytes:
-                        msg = get_message("shared_full").format(
-                            partition_name,
-                            available_bytes / 2**40
-                        )
-                        alerts.append(msg)
-                    break
-        except (ValueError, IndexError) as e:
-            print(f"分析共享磁盘{partition_name}时出错: {e}")
+        """分析共享磁盘剩余空间"""
+        u = usage.get(partition_name)
+        if u is None or u.error:
+            return
+        available_bytes = u.bytes_avail
+        key = f"{partition_name}:avail"
+        if key in active:
+            threshold_bytes += ALERT_HYSTERESIS * u.bytes_total
+        
+        if debug:
+            print(f"{u.path} 可用空间: {available_bytes/2**40:.2f}TB")
+        
+        if available_bytes < threshold_bytes:
+            msg = get_message("shared_full").format(
+                u.path,
+                available_bytes / 2**40
+            )
+            alerts.append((key, msg))
 
     # ========================= 监控逻辑 =========================
     
-    # 监控SCRATCH分区
-    analyse_partition_bytes(
-        "SCRATCH", 
-        "/scratch", 
-        SCRATCH_QUOTA_LIMIT, 
-        SCRATCH_QUOTA_THRESHOLD
-    )
-    
-    # 监控全局SCRATCH空间
-    analyse_shared_disk("/scratch", SCRATCH_GLOBAL_THRESHOLD)
+    # 监控SCRATCH分区（配额与全局剩余空间）
+    analyse_partition_bytes("SCRATCH", SCRATCH_QUOTA_LIMIT, SCRATCH_QUOTA_THRESHOLD)
+    analyse_shared_disk("SCRATCH", SCRATCH_GLOBAL_THRESHOLD)
     
     # 监控WORKSF分区
-    analyse_partition_bytes(
-        "WORKSF", 
-        "/worksf", 
-        WORKSF_BYTES_LIMIT, 
-        WORKSF_BYTES_THRESHOLD
-    )
+    analyse_partition_bytes("WORKSF", WORKSF_BYTES_LIMIT, WORKSF_BYTES_THRESHOLD)
+    analyse_partition_inodes("WORKSF", WORKSF_INODES_LIMIT, WORKSF_INODES_THRESHOLD)
     
-    analyse_partition_inodes(
-        "WORKSF", 
-        "/worksf", 
-        WORKSF_INODES_LIMIT, 
-        WORKSF_INODES_THRESHOLD
-    )
+    # 监控WORK分区（空间和inode，上限自动检测）
+    analyse_partition_bytes("WORK", None, WORK_BYTES_THRESHOLD)
+    analyse_partition_inodes("WORK", None, WORK_INODES_THRESHOLD)
     
-    # 监控WORK分区（空间和inode）
-    analyse_partition_bytes(
-        "WORK", 
-        "/work", 
-        None,  # 自动检测
-        WORK_BYTES_THRESHOLD
-    )
-    
-    analyse_partition_inodes(
-        "WORK", 
-        "/work", 
-        None,  # 自动检测
-        WORK_INODES_THRESHOLD
-    )
-    
-    # 监控STORE分区（空间和inode）
-    analyse_partition_bytes(
-        "STORE", 
-        "/store", 
-        None,  # 自动检测
-        STORE_BYTES_THRESHOLD
-    )
-    
-    analyse_partition_inodes(
-        "STORE", 
-        "/store", 
-        None,  # 自动检测
-        STORE_INODES_THRESHOLD
-    )
+    # 监控STORE分区（空间和inode，上限自动检测）
+    analyse_partition_bytes("STORE", None, STORE_BYTES_THRESHOLD)
+    analyse_partition_inodes("STORE", None, STORE_INODES_THRESHOLD)
     
     # ==========================================================
+    return alerts
+
+# ===================== 守护模式 =====================
+
+class WatchdogState:
+    """
+    持久状态：每个分区的使用量环形缓冲与当前已触发的警报
+
+    历史样本为 [时间戳, 已用字节, 已用inode] 的紧凑数组，整体以 JSON 原子写入状态文件，
+    重启后沿用原有历史估算增速，警报去重状态也不会丢失。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.history = {}       # 分区名 -> deque[(时间戳, 已用字节, 已用inode)]
+        self.active = {}        # 警报键 -> {"message", "since", "last_sent"}
+        self.last_save = 0.0
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        state = cls(path)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for name, samples in data.get("history", {}).items():
+                    state.history[name] = deque((tuple(sample) for sample in samples), maxlen=HISTORY_SIZE)
+                state.active = data.get("active", {})
+            except (OSError, ValueError) as e:
+                print(f"读取状态文件 {path} 失败，重新开始记录: {e}")
+        return state
+
+    def save(self):
+        """原子写入状态文件"""
+        if not self.path:
+            return
+        data = {
+            "history": {name: list(samples) for name, samples in self.history.items()},
+            "active": self.active,
+        }
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # 临时文件名不可预测，不会跟随他人预先放置的符号链接
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".fs-watchdog-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"保存状态文件 {self.path} 失败: {e}")
+        self.last_save = time.time()
+        self.dirty = False
+
+    def record(self, usage, now):
+        """把本次采集结果追加到各分区的环形缓冲（采集失败的分区跳过）"""
+        for u in usage.values():
+            if u.error:
+                continue
+            samples = self.history.setdefault(u.name, deque(maxlen=HISTORY_SIZE))
+            samples.append((int(now), u.bytes_used, u.inodes_used))
+
+    def fill_rate(self, name, column, now):
+        """
+        最近 PREDICT_WINDOW 秒内的增速(每秒)，最小二乘拟合；样本不足时返回 None
+
+        column: 1 为已用字节，2 为已用inode
+        """
+        samples = [sample for sample in self.history.get(name, ()) if sample[0] >= now - PREDICT_WINDOW]
+        if len(samples) < PREDICT_MIN_SAMPLES:
+            return None
+        n = len(samples)
+        mean_t = sum(sample[0] for sample in samples) / n
+        mean_v = sum(sample[column] for sample in samples) / n
+        var = sum((sample[0] - mean_t) ** 2 for sample in samples)
+        if var == 0:
+            return None
+        cov = sum((sample[0] - mean_t) * (sample[column] - mean_v) for sample in samples)
+        return cov / var
+
+    def update_alerts(self, alerts, now):
+        """
+        更新警报状态，返回 (需要广播的消息, 已解除的消息)
+
+        新触发的警报立即广播；持续中的警报每 REALERT_INTERVAL 秒最多重复一次。
+        需要广播的警报以 (警报键, 消息) 返回
+        """
+        to_send, resolved = [], []
+        current = dict(alerts)
+        for key in list(self.active):
+            if key not in current:
+                resolved.append(self.active.pop(key)["message"])
+        for key, message in alerts:
+            entry = self.active.get(key)
+            if entry is None:
+                self.active[key] = {"message": message, "since": now, "last_sent": now}
+                to_send.append((key, message))
+            else:
+                entry["message"] = message
+                if now - entry["last_sent"] >= REALERT_INTERVAL:
+                    entry["last_sent"] = now
+                    to_send.append((key, message))
+        if to_send or resolved:
+            self.dirty = True
+        return to_send, resolved
+
+def _format_rate(metric, per_hour):
+    if metric == "bytes":
+        return f"{per_hour / 2**30:.2f}GB"
+    return f"{per_hour / 1000:.1f}K"
+
+def predict_alerts(usage, state, now, debug=False):
+    """按历史增速预测写满时间，PREDICT_HORIZON 内将耗尽的分区生成警报"""
+    alerts = []
+    for name, u in usage.items():
+        if u.error:
+            continue
+        bytes_limit, inodes_limit = PARTITION_LIMITS.get(name, (None, None))
+        capacity = {
+            "bytes": bytes_limit or u.bytes_total,
+            "inodes": inodes_limit or u.inodes_total,
+        }
+        remaining = {
+            # 配额未满时也受分区实际剩余空间限制
+            "bytes": min(capacity["bytes"] - u.bytes_used, u.bytes_avail),
+            "inodes": capacity["inodes"] - u.inodes_used,
+        }
+        for metric, column in (("bytes", 1), ("inodes", 2)):
+            rate = state.fill_rate(name, column, now)
+            if not capacity[metric] or rate is None or rate <= 0:
+                continue
+            time_to_full = max(0, remaining[metric]) / rate
+            key = f"{name}:{metric}:ttf"
+            # 已触发的预测警报在预计时间超过 1.5 倍窗口后才解除
+            horizon = PREDICT_HORIZON * (1.5 if key in state.active else 1.0)
+            if debug:
+                print(f"{name} {metric} 增速 {_format_rate(metric, rate * 3600)}/h, "
+                      f"预计 {time_to_full / 3600:.1f}h 后耗尽")
+            if time_to_full < horizon:
+                msg = get_message("predict_full").format(
+                    name,
+                    get_message(f"metric_{metric}"),
+                    time_to_full / 3600,
+                    _format_rate(metric, rate * 3600)
+                )
+                alerts.append((key, msg))
+    return alerts
+
+def attribution_report(alert_keys, args):
+    """对触发警报的分区做使用量归因，返回 top-N 报告文本"""
+    try:
+        import usage_scanner
+    except ImportError:
+        print("未找到 usage_scanner.py，跳过使用量归因")
+        return ""
+    metrics = {}
+    for key in alert_keys:
+        name, metric = key.split(":")[:2]
+        metrics.setdefault(name, set()).add("inodes" if metric == "inodes" else "bytes")
+    reports = []
+    for name, kinds in sorted(metrics.items()):
+        path = PARTITIONS.get(name)
+        if path is None:
+            continue
+        by = kinds.pop() if len(kinds) == 1 else "both"
+        try:
+            reports.append(usage_scanner.attribute(
+                path, workers=ATTRIBUTION_WORKERS, timeout=args.attribute_timeout,
+                top_n=args.attribute_top, by=by))
+        except OSError as e:
+            print(f"{name}({path}) 使用量归因失败: {e}")
+    return "\n\n".join(reports)
+
+# ===================== 指标导出 =====================
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_metrics(usage, duration, state=None, now=None):
+    """
+    把一次采集结果渲染为 Prometheus 文本格式
+
+    与警报使用同一份采集结果，导出时不会再次访问挂载点
+    """
+    now = time.time() if now is None else now
+    metrics = {}    # 指标名 -> (类型, 说明, [(标签, 值)])
+
+    def add(name, help_text, labels, value, kind="gauge"):
+        entry = metrics.setdefault(name, (kind, help_text, []))
+        entry[2].append((labels, value))
+
+    for name, u in usage.items():
+        labels = {"partition": name, "path": u.path}
+        add("up", "statvfs 是否在超时内成功返回", labels, 0 if u.error else 1)
+        add("collect_latency_seconds", "单个挂载点 statvfs 耗时", labels, u.latency)
+        bytes_limit, inodes_limit = PARTITION_LIMITS.get(name, (None, None))
+        bytes_threshold, inodes_threshold = PARTITION_THRESHOLDS.get(name, (None, None))
+        if bytes_limit:
+            add("bytes_limit", "配额上限(字节)，未配置配额时为分区总容量", labels, bytes_limit)
+        if inodes_limit:
+            add("inodes_limit", "inode 上限，未配置时为分区 inode 总数", labels, inodes_limit)
+        if bytes_threshold is not None:
+            add("bytes_threshold_ratio", "空间使用率警报阈值", labels, bytes_threshold)
+        if inodes_threshold is not None:
+            add("inodes_threshold_ratio", "inode 使用率警报阈值", labels, inodes_threshold)
+        if name == "SCRATCH":
+            add("avail_threshold_bytes", "剩余空间警报阈值(字节)", labels, SCRATCH_GLOBAL_THRESHOLD)
+        if u.error:
+            continue
+        if not bytes_limit:
+            add("bytes_limit", "配额上限(字节)，未配置配额时为分区总容量", labels, u.bytes_total)
+        if not inodes_limit:
+            add("inodes_limit", "inode 上限，未配置时为分区 inode 总数", labels, u.inodes_total)
+        add("bytes_used", "已用空间(字节)", labels, u.bytes_used)
+        add("bytes_avail", "非特权用户可用空间(字节)", labels, u.bytes_avail)
+        add("bytes_total", "分区总容量(字节)", labels, u.bytes_total)
+        add("inodes_used", "已用 inode 数", labels, u.inodes_used)
+        add("inodes_total", "inode 总数", labels, u.inodes_total)
+        if state is not None:
+            for metric, column in (("bytes", 1), ("inodes", 2)):
+                rate = state.fill_rate(name, column, now)
+                if rate is not None:
+                    add(f"{metric}_fill_rate", "最近窗口内的增速(每秒)", labels, rate)
+
+    add("collection_duration_seconds", "一次完整采集的耗时", {}, duration)
+    add("last_collection_timestamp_seconds", "最近一次采集的时间", {}, now)
+    if state is not None:
+        add("alerts_active", "当前已触发的警报数", {}, len(state.active))
+        for key in sorted(state.active):
+            add("alert_active", "已触发的警报", {"alert": key}, 1)
+
+    lines = []
+    for name, (kind, help_text, samples) in metrics.items():
+        full_name = f"{METRICS_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+            lines.append(f"{full_name}{{{label_text}}} {value}" if label_text else f"{full_name} {value}")
+    return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """保存最近一次采集的指标，写入 textfile 并/或通过本地 HTTP 提供"""
+
+    def __init__(self, textfile=None, listen=None):
+        self.textfile = textfile
+        self.text = ""
+        self._server = None
+        if listen:
+            host, _, port = listen.rpartition(":")
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = exporter.text.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"指标服务已启动: http://{host or '127.0.0.1'}:{port}/metrics")
+
+    def update(self, usage, duration, state=None):
+        self.text = render_metrics(usage, duration, state)
+        if self.textfile:
+            # 同目录临时文件 + rename，保证 node_exporter 不会读到写了一半的文件
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.textfile)),
+                                                prefix=".fs-watchdog-", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write(self.text)
+                    os.chmod(tmp_path, 0o644)
+                    os.replace(tmp_path, self.textfile)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            except OSError as e:
+                print(f"写入指标文件 {self.textfile} 失败: {e}")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+def run_check(args, state=None, exporter=None):
+    """
+    执行一次采集与检查并返回采集结果
+
+    state 为空时与原单次运行行为一致；否则记录历史、预测写满时间，并按警报状态去重。
+    exporter 不为空时用同一份采集结果更新指标
+    """
+    collect_started = time.monotonic()
+    usage = collect_usage(PARTITIONS, args.timeout)
+    collect_duration = time.monotonic() - collect_started
+    for u in usage.values():
+        if u.error:
+            print(f"检查{u.name}({u.path})失败: {u.error}")
+        elif args.debug:
+            print(f"{u.name} statvfs 耗时: {u.latency*1000:.1f}ms")
+
+    if state is None:
+        alerts = evaluate_alerts(usage, args.debug)
+    else:
+        now = time.time()
+        state.record(usage, now)
+        keyed = evaluate_alerts(usage, args.debug, state.active) + predict_alerts(usage, state, now, args.debug)
+        alerts, resolved = state.update_alerts(keyed, now)
+        for msg in resolved:
+            print(get_message("resolved").format(msg))
+        if state.dirty or now - state.last_save >= STATE_SAVE_INTERVAL:
+            state.save()
+    if exporter is not None:
+        exporter.update(usage, collect_duration, state)
+    if state is not None and not alerts and keyed:
+        # 警报持续中但在重复广播间隔内
+        return usage
     
     if alerts:
         alert_title = get_message("alert_title")
-        alert_msg = "\n".join(alerts)
+        alert_msg = "\n".join(msg for _, msg in alerts)
+        if args.attribute:
+            report = attribution_report([key for key, _ in alerts], args)
+            if report:
+                alert_msg = f"{alert_msg}\n\n{report}"
         
         print(alert_title)
         print(alert_msg)
         
         # 发送广播警报
         broadcast_alert(alert_msg)
-    else:
+    elif not args.daemon or args.debug:
         print(get_message("normal"))
+    return usage
+
+def run_daemon(args):
+    """常驻运行：按 interval 采样，收到 SIGTERM/SIGINT 后保存状态退出"""
+    state = WatchdogState.load(args.state_file or STATE_FILE)
+    exporter = MetricsExporter(args.textfile, args.listen) if args.textfile or args.listen else None
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    print(f"fs-watchdog 守护模式启动: 采样间隔 {args.interval}s, 状态文件 {state.path}")
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                run_check(args, state, exporter)
+            except Exception as e:
+                print(f"本轮检查出错: {e}")
+            stop.wait(max(0.0, args.interval - (time.monotonic() - started)))
+    finally:
+        state.save()
+        if exporter is not None:
+            exporter.close()
+
+def main():
+    """主监控逻辑"""
+    
+    # 系统兼容性检查
+    check_system_compatibility()
+    
+    # 解析命令行参数
+    args = get_args()
+    
+    # 设置全局语言
+    global MESSAGE_LANGUAGE
+    MESSAGE_LANGUAGE = args.lang
+    
+    # 设置是否广播
+    global BROADCAST_ENABLED
+    if args.no_broadcast:
+        BROADCAST_ENABLED = False
+
+    if args.daemon:
+        run_daemon(args)
+        return
+
+    # 单次运行：指定状态文件时同样记录历史并对警报去重
+    state = WatchdogState.load(args.state_file) if args.state_file else None
+    if args.listen:
+        print("--listen 仅在守护模式下有效，单次运行请使用 --textfile")
+    exporter = MetricsExporter(args.textfile) if args.textfile else None
+    run_check(args, state, exporter)
+    if state is not None:
+        state.save()
 
 if __name__ == "__main__":
     try:
@@ -311,4 +788,12 @@ if __name__ == "__main__":
 # 调试模式（不广播）
 # sudo ./fs-watchdog.py --debug --no-broadcast
 # en
-# sudo ./fs-watchdog.py --lang en
\ No newline at end of file
+# sudo ./fs-watchdog.py --lang en
+# 挂载点无响应时更快超时
+# sudo ./fs-watchdog.py --timeout 2
+# 守护模式（每分钟采样，提前预测写满）
+# sudo ./fs-watchdog.py --daemon --interval 60 --state-file /var/lib/fs-watchdog/state.json
+# 警报附带按用户/目录的占用排行
+# sudo ./fs-watchdog.py --attribute --attribute-top 10
+# 导出 Prometheus 指标（textfile 或本地 HTTP）
+# sudo ./fs-watchdog.py --daemon --textfile /var/lib/node_exporter/textfile/fs_watchdog.prom --listen 127.0.0.1:9781
\ No newline at end of file
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+# 非阻塞终端广播 - 直接读取 utmp，并发写入所有登录终端
+#
+# 示例:
+# sudo ./tty_broadcast.py "维护通知: 22:00 重启存储服务" --timeout 2
+#
+
+import argparse
+import errno
+import os
+import selectors
+import stat
+import struct
+import sys
+import time
+from collections import namedtuple
+
+# ===================== 配置区域 =====================
+UTMP_PATH = "/var/run/utmp"         # 登录记录文件
+BROADCAST_TIMEOUT = 2.0             # 每个终端的写入期限(秒)，所有终端同时开始
+# ===================================================
+
+# glibc x86_64/aarch64 的 struct utmp (384 字节)
+_UTMP_STRUCT = struct.Struct("<hhi32s4s32s256shhiii4i20s")
+_USER_PROCESS = 7
+
+# 登录会话
+Session = namedtuple("Session", ["user", "tty", "pid", "host", "login_time"])
+
+# 单个终端的投递结果；status: sent / timeout / skipped / permission / error
+Delivery = namedtuple("Delivery", ["tty", "users", "status", "bytes_written", "elapsed", "error"])
+
+
+def _decode(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def read_utmp(path=UTMP_PATH, check_alive=True):
+    """
+    解析 utmp，返回当前登录会话列表（替代 who | awk）
+
+    Args:
+        path: utmp 文件路径
+        check_alive: 过滤登录进程已退出的残留记录
+    """
+    sessions = []
+    with open(path, "rb") as f:
+        data = f.read()
+    for offset in range(0, len(data) - _UTMP_STRUCT.size + 1, _UTMP_STRUCT.size):
+        (ut_type, _, pid, line, _, user, host,
+         _, _, _, tv_sec, _, *_rest) = _UTMP_STRUCT.unpack_from(data, offset)
+        if ut_type != _USER_PROCESS:
+            continue
+        tty = _decode(line)
+        if not tty:
+            continue
+        if check_alive and pid > 0:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                continue
+            except PermissionError:
+                pass
+        sessions.append(Session(_decode(user), tty, pid, _decode(host), tv_sec))
+    return sessions
+
+
+def _sanitize(message):
+    """去掉控制字符（防止终端转义序列注入），换行转为 CRLF"""
+    text = "".join(ch for ch in message if ch in "\t\n" or ch.isprintable())
+    return text.replace("\n", "\r\n").encode("utf-8", "replace")
+
+
+def _tty_path(tty):
+    """
+    utmp 中的终端名转为 /dev 下的路径，非法名称返回 None
+
+    utmp 对 utmp 组可写（screen、tmux 等），与 util-linux ttymsg 一样拒绝绝对路径和 ..，
+    避免伪造的记录让 root 写入任意文件。
+    """
+    if tty.startswith("/") or ".." in tty:
+        return None
+    return os.path.join("/dev", tty)
+
+
+def broadcast(message, sessions=None, timeout=BROADCAST_TIMEOUT, respect_mesg=None, utmp_path=UTMP_PATH):
+    """
+    并发向所有登录终端写入消息
+
+    所有终端以 O_NONBLOCK 打开，写不完的部分由同一个 selector 等待可写后继续写，
+    每个终端最多等待 timeout 秒：流控暂停的终端或失联的 SSH 会话只会超时，
+    不会拖慢其他终端，整个广播的耗时不超过 timeout。
+
+    Args:
+        message: 消息内容
+        sessions: 目标会话，None 时读取 utmp
+        timeout: 每个终端的写入期限(秒)
+        respect_mesg: 跳过执行了 mesg n 的终端（组写权限被关闭）；None 时与 wall 一致，root 执行时忽略 mesg n
+        utmp_path: utmp 文件路径
+
+    Returns:
+        list[Delivery]: 每个终端一条投递结果
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    if sessions is None:
+        sessions = read_utmp(utmp_path)
+    payload = _sanitize(message)
+    if respect_mesg is None:
+        respect_mesg = os.geteuid() != 0
+
+    # 同一终端可能有多条记录，只写一次
+    users_by_tty = {}
+    for session in sessions:
+        users_by_tty.setdefault(session.tty, []).append(session.user)
+
+    reports = []
+    selector = selectors.DefaultSelector()
+    pending = {}    # fd -> [tty, 已写字节数]
+    for tty, users in users_by_tty.items():
+        path = _tty_path(tty)
+        if path is None:
+            reports.append(Delivery(tty, users, "error", 0, 0.0, "非法终端名"))
+            continue
+        try:
+            if respect_mesg and not os.stat(path).st_mode & stat.S_IWGRP:
+                reports.append(Delivery(tty, users, "skipped", 0, 0.0, "mesg n"))
+                continue
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK | os.O_NOCTTY)
+        except PermissionError as e:
+            reports.append(Delivery(tty, users, "permission", 0, 0.0, str(e)))
+            continue
+        except OSError as e:
+            reports.append(Delivery(tty, users, "error", 0, 0.0, str(e)))
+            continue
+        # 只写字符设备终端
+        if not (stat.S_ISCHR(os.fstat(fd).st_mode) and os.isatty(fd)):
+            os.close(fd)
+            reports.append(Delivery(tty, users, "error", 0, 0.0, "不是终端设备"))
+            continue
+        pending[fd] = [tty, 0]
+        selector.register(fd, selectors.EVENT_WRITE)
+
+    def finish(fd, status, error=None):
+        tty, written = pending.pop(fd)
+        selector.unregister(fd)
+        os.close(fd)
+        reports.append(Delivery(tty, users_by_tty[tty], status, written, time.monotonic() - start, error))
+
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                fd = key.fd
+                try:
+                    written = os.write(fd, payload[pending[fd][1]:])
+                except BlockingIOError:
+                    continue
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    finish(fd, "error", str(e))
+                    continue
+                pending[fd][1] += written
+                if pending[fd][1] >= len(payload):
+                    finish(fd, "sent")
+    finally:
+        for fd in list(pending):
+            finish(fd, "timeout", f"{timeout}s 内未写完")
+        selector.close()
+    return reports
+
+
+def summarize(reports):
+    """投递结果按状态计数，如 {'sent': 120, 'timeout': 2}"""
+    counts = {}
+    for report in reports:
+        counts[report.status] = counts.get(report.status, 0) + 1
+    return counts
+
+
+def get_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="非阻塞并发地向所有登录终端发送消息")
+    parser.add_argument("message", help="要发送的消息内容")
+    parser.add_argument("--timeout", type=float, default=BROADCAST_TIMEOUT, help="每个终端的写入期限(秒)")
+    parser.add_argument("--force", action="store_true", help="忽略 mesg n 设置")
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印每个终端的投递结果")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    results = broadcast(f"\n{args.message}\n", timeout=args.timeout, respect_mesg=False if args.force else None)
+    if args.verbose:
+        for result in results:
+            print(f"{result.tty:<10} {','.join(result.users):<20} {result.status:<10} "
+                  f"{result.elapsed*1000:7.1f}ms {result.error or ''}", file=sys.stderr)
+    print(summarize(results))
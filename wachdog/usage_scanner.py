@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+#
+# 分区使用量归因扫描 - 按用户和顶层目录统计空间与inode占用
+#
+# 示例:
+# sudo ./usage_scanner.py /scratch --top 20
+#
+
+import argparse
+import marshal
+import os
+import pwd
+import queue
+import stat
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+# ===================== 配置区域 =====================
+SCAN_WORKERS = 16                   # 并行 scandir 线程数
+SCAN_TOP_N = 10                     # 报告中每类列出的条目数
+CACHE_MAX_AGE = 24 * 3600           # 目录缓存的最长有效期(秒)，超过后重新列目录
+CACHE_DIR = "/var/cache/fs-watchdog"     # 目录 mtime 缓存所在目录，必须只有当前用户可写
+# ===================================================
+
+# 单个目录的缓存：目录自身 mtime、该目录直接包含的条目按属主汇总 {uid: [字节, inode]}、子目录名
+DirEntryCache = namedtuple("DirEntryCache", ["mtime_ns", "owners", "subdirs", "scanned_at"])
+
+# 扫描结果：按属主/顶层目录汇总的 {键: [字节, inode]}
+ScanResult = namedtuple(
+    "ScanResult",
+    ["root", "owners", "top_dirs", "dirs_scanned", "dirs_cached", "errors", "elapsed", "complete"],
+)
+
+
+def _cache_path(root, cache_dir):
+    name = root.strip("/").replace("/", "_") or "root"
+    return os.path.join(cache_dir, f"{name}.cache")
+
+
+def _check_cache_dir(cache_dir, create=False):
+    """
+    确认缓存目录属于当前用户且其他用户不可写，否则抛出 PermissionError
+
+    root 会读取该目录中的缓存，若其他用户能预先创建目录或替换文件，就能伪造扫描结果。
+    """
+    if create:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    st = os.lstat(cache_dir)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o022:
+        raise PermissionError(f"缓存目录 {cache_dir} 不是当前用户所有或可被其他用户写入")
+
+
+def load_cache(root, cache_dir=CACHE_DIR):
+    """读取 root 的目录缓存，不存在、损坏或目录不安全时返回空字典"""
+    try:
+        _check_cache_dir(cache_dir)
+        with open(_cache_path(root, cache_dir), "rb") as f:
+            data = marshal.load(f)
+        # marshal 只含基本类型，按 DirEntryCache 结构校验
+        return {path: DirEntryCache(*entry) for path, entry in data.items()}
+    except PermissionError as e:
+        print(f"忽略扫描缓存: {e}")
+        return {}
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def save_cache(root, cache, cache_dir=CACHE_DIR):
+    """原子写入目录缓存（marshal 格式，只含基本类型，不会像 pickle 那样执行代码）"""
+    _check_cache_dir(cache_dir, create=True)
+    path = _cache_path(root, cache_dir)
+    data = {key: tuple(entry) for key, entry in cache.items()}
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".scan-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _disk_bytes(st):
+    # 按实际占用块计算，稀疏文件不会被高估
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def _add(totals, key, nbytes, inodes):
+    entry = totals.get(key)
+    if entry is None:
+        totals[key] = [nbytes, inodes]
+    else:
+        entry[0] += nbytes
+        entry[1] += inodes
+
+
+def scan_usage(root, workers=SCAN_WORKERS, cache=None, timeout=None, max_age=CACHE_MAX_AGE):
+    """
+    并行遍历 root，按属主 uid 和顶层目录汇总空间与 inode
+
+    每个目录先 lstat 取 mtime：与缓存一致且未超过 max_age 时直接复用该目录的汇总和
+    子目录列表，不再 scandir 及逐个 stat 文件（大量小文件的目录开销主要在这里），
+    只继续检查子目录。目录 mtime 只在增删/重命名条目时变化，原地增长的文件字节数
+    要到缓存过期后才会更新，inode 计数不受影响。不跨越挂载点。
+
+    Args:
+        root: 扫描根目录
+        workers: 并行线程数
+        cache: 目录缓存字典（load_cache 的返回值），扫描过程中原地更新；None 时不使用缓存
+        timeout: 扫描时间上限(秒)，到时返回部分结果（complete=False）
+        max_age: 缓存条目的最长有效期(秒)
+    """
+    root = os.path.abspath(root)
+    start = time.monotonic()
+    deadline = start + timeout if timeout else None
+    root_dev = os.lstat(root).st_dev
+    cache = {} if cache is None else cache
+    seen = set()
+    tasks = queue.Queue()
+    lock = threading.Lock()
+    results = []
+    abort = threading.Event()
+
+    def process(path, top, local):
+        st = os.lstat(path)
+        if st.st_dev != root_dev:
+            return
+        now = time.time()
+        cached = cache.get(path)
+        if cached is not None and cached.mtime_ns == st.st_mtime_ns and now - cached.scanned_at < max_age:
+            owners, subdirs = cached.owners, cached.subdirs
+            local["cached"] += 1
+        else:
+            owners = {}
+            subdirs = []
+            # 目录自身也占一个 inode
+            _add(owners, st.st_uid, _disk_bytes(st), 1)
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                            continue
+                        entry_st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        local["errors"] += 1
+                        continue
+                    _add(owners, entry_st.st_uid, _disk_bytes(entry_st), 1)
+            cache[path] = DirEntryCache(st.st_mtime_ns, owners, subdirs, now)
+            local["scanned"] += 1
+        seen.add(path)
+        for uid, (nbytes, inodes) in owners.items():
+            _add(local["owners"], uid, nbytes, inodes)
+            _add(local["top_dirs"], top, nbytes, inodes)
+        for name in subdirs:
+            # 根目录下的直接子目录即为顶层目录
+            tasks.put((os.path.join(path, name), name if top is None else top))
+
+    def worker():
+        local = {"owners": {}, "top_dirs": {}, "scanned": 0, "cached": 0, "errors": 0}
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+            try:
+                if not abort.is_set():
+                    if deadline is not None and time.monotonic() > deadline:
+                        abort.set()
+                    else:
+                        process(item[0], item[1], local)
+            except OSError:
+                local["errors"] += 1
+            finally:
+                tasks.task_done()
+        with lock:
+            results.append(local)
+
+    threads = [threading.Thread(target=worker, name=f"scan-{i}", daemon=True) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    tasks.put((root, None))
+    tasks.join()
+    for _ in threads:
+        tasks.put(None)
+    for thread in threads:
+        thread.join()
+
+    owners, top_dirs = {}, {}
+    dirs_scanned = dirs_cached = errors = 0
+    for local in results:
+        for uid, (nbytes, inodes) in local["owners"].items():
+            _add(owners, uid, nbytes, inodes)
+        for top, (nbytes, inodes) in local["top_dirs"].items():
+            # 根目录自身的直接文件归入 '.'
+            _add(top_dirs, top or ".", nbytes, inodes)
+        dirs_scanned += local["scanned"]
+        dirs_cached += local["cached"]
+        errors += local["errors"]
+
+    complete = not abort.is_set()
+    if complete:
+        # 删除已不存在的目录，避免缓存无限增长
+        for path in [path for path in cache if path not in seen]:
+            del cache[path]
+    return ScanResult(root, owners, top_dirs, dirs_scanned, dirs_cached, errors,
+                      time.monotonic() - start, complete)
+
+
+_USER_NAMES = {}
+
+
+def user_name(uid):
+    name = _USER_NAMES.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _USER_NAMES[uid] = name
+    return name
+
+
+def _format_bytes(nbytes):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if nbytes < 1024 or unit == "TB":
+            return f"{nbytes:.1f}{unit}" if unit != "B" else f"{nbytes}B"
+        nbytes /= 1024
+
+
+def _top(totals, column, n):
+    return sorted(totals.items(), key=lambda item: item[1][column], reverse=True)[:n]
+
+
+def format_report(result, top_n=SCAN_TOP_N, by="both"):
+    """
+    生成 top-N 归因报告文本
+
+    Args:
+        result: scan_usage 的返回值
+        top_n: 每类列出的条目数
+        by: 'bytes' 按空间排序，'inodes' 按inode排序，'both' 两者都列出
+    """
+    status = "" if result.complete else " (扫描超时，结果不完整)"
+    lines = [f"{result.root} 使用量归因{status}: 扫描 {result.dirs_scanned} 个目录, "
+             f"缓存命中 {result.dirs_cached}, 耗时 {result.elapsed:.1f}s"]
+    columns = {"bytes": [0], "inodes": [1], "both": [0, 1]}[by]
+    for column in columns:
+        label = "空间" if column == 0 else "inode"
+        lines.append(f"按用户({label}):")
+        for uid, (nbytes, inodes) in _top(result.owners, column, top_n):
+            lines.append(f"  {user_name(uid):<16} {_format_bytes(nbytes):>10} {inodes:>12,} inodes")
+        lines.append(f"按顶层目录({label}):")
+        for top, (nbytes, inodes) in _top(result.top_dirs, column, top_n):
+            lines.append(f"  {top:<32} {_format_bytes(nbytes):>10} {inodes:>12,} inodes")
+    return "\n".join(lines)
+
+
+def attribute(root, workers=SCAN_WORKERS, timeout=None, cache_dir=CACHE_DIR, top_n=SCAN_TOP_N, by="both"):
+    """读取缓存、扫描、保存缓存并返回报告文本，供 fs-watchdog 在警报时调用"""
+    cache = load_cache(root, cache_dir) if cache_dir else None
+    result = scan_usage(root, workers=workers, cache=cache, timeout=timeout)
+    if cache_dir:
+        try:
+            save_cache(root, cache, cache_dir)
+        except OSError as e:
+            print(f"保存扫描缓存失败: {e}")
+    return format_report(result, top_n, by)
+
+
+def get_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="按用户和顶层目录统计分区的空间与inode占用")
+    parser.add_argument("root", help="扫描根目录（分区挂载点）")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="并行扫描线程数")
+    parser.add_argument("--top", type=int, default=SCAN_TOP_N, help="每类列出的条目数")
+    parser.add_argument("--by", choices=["bytes", "inodes", "both"], default="both", help="排序依据")
+    parser.add_argument("--timeout", type=float, default=None, help="扫描时间上限(秒)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="目录缓存位置，传空字符串禁用缓存")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(attribute(args.root, args.workers, args.timeout, args.cache_dir, args.top, args.by))